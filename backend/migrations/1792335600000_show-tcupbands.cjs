@@ -0,0 +1,17 @@
+exports.up = (pgm) => {
+  pgm.sql(`
+    CREATE TABLE IF NOT EXISTS show_tcupbands (
+      show_id integer NOT NULL REFERENCES shows(id) ON DELETE CASCADE,
+      tcupband_id integer NOT NULL REFERENCES tcupbands(id) ON DELETE CASCADE,
+      matched_at timestamp with time zone DEFAULT now(),
+      PRIMARY KEY (show_id, tcupband_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_show_tcupbands_tcupband_id ON show_tcupbands(tcupband_id);
+  `);
+};
+
+exports.down = (pgm) => {
+  pgm.sql(`
+    DROP TABLE IF EXISTS show_tcupbands;
+  `);
+};
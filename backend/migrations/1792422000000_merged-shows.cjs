@@ -0,0 +1,18 @@
+exports.up = (pgm) => {
+  pgm.sql(`
+    CREATE TABLE IF NOT EXISTS merged_shows (
+      venue_id integer NOT NULL,
+      start timestamp without time zone NOT NULL,
+      keep_id integer NOT NULL REFERENCES shows(id) ON DELETE CASCADE,
+      merged_at timestamp with time zone DEFAULT now(),
+      PRIMARY KEY (venue_id, start)
+    );
+    CREATE INDEX IF NOT EXISTS idx_merged_shows_keep_id ON merged_shows(keep_id);
+  `);
+};
+
+exports.down = (pgm) => {
+  pgm.sql(`
+    DROP TABLE IF EXISTS merged_shows;
+  `);
+};
@@ -1,23 +1,17 @@
 import re
-from datetime import datetime
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from bs4 import BeautifulSoup
-from db_utils import connect_to_db, insert_show, get_venue_id
-
-# Set up Chrome options before initializing WebDriver
-chrome_options = Options()
-chrome_options.add_argument("--headless")  # Enable headless mode
-chrome_options.add_argument("--disable-gpu")  # Disable GPU usage
-chrome_options.add_argument("--no-sandbox")  # Bypass OS security model
-chrome_options.add_argument("--disable-dev-shm-usage")  # Overcome limited resource issues
-
-# Initialize WebDriver with options
+from browser_pool import open_browser
+from parsing import make_soup, only
+from dates import DateResolver
+from normalize import clean_band_name, default_time, normalize_time
+from fingerprints import html_fingerprint, is_unchanged, record_fingerprint
+from db_utils import get_connection, release_connection, upsert_shows, count_statuses, get_venue_id
+
+# Borrow a headless Chrome tab from the shared pool
 print("Starting headless Chrome...")
-driver = webdriver.Chrome(options=chrome_options)
+driver = open_browser()
 print("Chrome initialized successfully")
 url = 'https://331club.com/#calendar'
 print(f"Navigating to {url}")
@@ -44,15 +38,22 @@ except Exception as e:
     driver.quit()
     exit()
 
-# Extract page source and parse with BeautifulSoup
-soup = BeautifulSoup(driver.page_source, 'html.parser')
+# Extract page source and stop early if the calendar hasn't changed
+page_source = driver.page_source
 driver.quit()
+fingerprint = html_fingerprint(page_source)
+if is_unchanged("331 Club", fingerprint):
+    print("331 Club calendar unchanged since the last run; nothing to do.")
+    exit()
+
+# Parse just the event cards
+soup = make_soup(page_source, only('event', tags='div'))
 
 # Find all event cards
 events = soup.find_all("div", class_="event")
 
 # Connect to the database
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
 # Get venue ID for "331 Club"
@@ -60,7 +61,7 @@ try:
     venue_id = get_venue_id(cursor, "331 Club")
 except ValueError as e:
     print(e)
-    conn.close()
+    release_connection(conn)
     exit()
 
 # Counters for added, updated, and skipped events
@@ -68,39 +69,14 @@ added_count = 0
 updated_count = 0
 duplicate_count = 0
 
-# Define a function to calculate the event year
-def get_event_year(month):
-    if month in ["11", "12"]:
-        return 2024
-    return 2025
-
-# Normalize time
-def normalize_time(time_str):
-    """
-    Normalize various time string formats into 'HH:MM PM' format.
-    """
-    try:
-        # Clean the input string
-        time_str = time_str.lower().strip()
-        
-        # Handle cases without minutes (e.g., "9pm" -> "9:00pm")
-        if ':' not in time_str:
-            time_str = re.sub(r'(\d+)(am|pm)', r'\1:00\2', time_str)
-        
-        # Ensure space before am/pm
-        time_str = re.sub(r'(am|pm)', r' \1', time_str)
-        
-        # Parse and normalize
-        return datetime.strptime(time_str, "%I:%M %p").strftime("%I:%M %p")
-    except Exception:
-        return None
-    
-def clean_band_name(name):
-    """
-    Cleans up band names by removing unwanted stop words and extra spaces.
-    """
-    stop_words = ['with', 'and']
-    return ' '.join(word for word in name.split() if word.lower() not in stop_words).strip()
+# Listing dates are "Dec 12" with the set time appended; the year is inferred
+DATES = DateResolver("331 Club", ["%b %d %I:%M %p"])
+
+# Set times in a listing line, e.g. "9pm" or "10:30 PM"
+TIME_PATTERN = re.compile(r'\d{1,2}:?\d{0,2}\s*(?:am|pm)', re.IGNORECASE)
+
+# Shows to upsert once every event card has been parsed
+rows = []
 
 # Loop through each event to extract details
 for event in events:
@@ -109,14 +85,7 @@ for event in events:
     if date_tag:
         month_text = date_tag.find("span", class_="month").get_text(strip=True)
         day_text = date_tag.find("span", class_="date").get_text(strip=True)
-        month_mapping = {
-            "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04", "May": "05",
-            "Jun": "06", "Jul": "07", "Aug": "08", "Sep": "09", "Oct": "10",
-            "Nov": "11", "Dec": "12"
-        }
-        month = month_mapping.get(month_text, "N/A")
-        year = get_event_year(month)
-        date_str = f"{year}-{month}-{int(day_text):02d}"
+        date_str = f"{month_text} {day_text}"
     else:
         date_str = None
 
@@ -130,21 +99,6 @@ for event in events:
     if not columns_div:
         continue
 
-    def get_default_time(bands_str):
-        """
-        Return default time based on event patterns at 331 Club
-        """
-        if any(event in bands_str for event in ["Worker's Playtime", "Movie Music Trivia", "Drinkin' Spelling Bee"]):
-            return "06:00 PM"
-        elif "Harold's House Party" in bands_str:
-            return "04:00 PM"
-        elif "Dr. Sketchy" in bands_str:
-            return "02:00 PM"
-        elif "Conspiracy Series" in bands_str:
-            return "09:00 PM"
-        # Most shows at 331 Club start at 10 PM
-        return "10:00 PM"
-
     # In your main event processing loop:
     for column in columns_div.find_all("div", class_="column"):
         # Extract event details
@@ -157,11 +111,10 @@ for event in events:
         
         # Extract time - it's usually the last text node after the <br> tags
         event_time = None
-        time_pattern = re.compile(r'\d{1,2}:?\d{0,2}\s*(?:am|pm)', re.IGNORECASE)
-        
+
         # Look for time in the contents
         for content in reversed(contents):  # Search from end since time is usually last
-            if time_match := time_pattern.search(content):
+            if time_match := TIME_PATTERN.search(content):
                 time_text = time_match.group().strip()
                 event_time = normalize_time(time_text)
                 break
@@ -169,31 +122,14 @@ for event in events:
         # If no time found, use default based on event type
         if not event_time:
             # Combine all non-time text to check for event patterns
-            full_text = ' '.join(content for content in contents if not time_pattern.search(content))
-            event_time = get_default_time(full_text)
+            full_text = ' '.join(content for content in contents if not TIME_PATTERN.search(content))
+            event_time = default_time("331 Club", full_text)
 
         # Extract bands (everything except the time)
         bands = []
         for content in contents:
-            if not time_pattern.search(content) and content.strip():
-                bands.append(clean_band_name(content))
-
-        # If we still don't have a time but see a raw time string
-        if not event_time:
-            raw_text = p_tag.get_text()
-            time_match = re.search(r'\d{1,2}:\d{2}(?:am|pm)', raw_text.lower())
-            if time_match:
-                event_time = normalize_time(time_match.group())
-            else:
-                # Default time based on event type
-                if any("Worker's Playtime" in band for band in bands):
-                    event_time = "06:00 PM"
-                elif any("Dr. Sketchy" in band for band in bands):
-                    event_time = "02:00 PM"
-                elif any("Conspiracy Series" in band for band in bands):
-                    event_time = "09:00 PM"
-                else:
-                    event_time = "08:00 PM"  # Default evening show time
+            if not TIME_PATTERN.search(content) and content.strip():
+                bands.append(clean_band_name(content, "331 Club"))
 
         # Clean up band list - remove any remaining time strings
         bands = [band for band in bands if not re.search(r'\d{1,2}:\d{2}(?:am|pm)', band.lower())]
@@ -201,13 +137,6 @@ for event in events:
         
         bands_str = ", ".join(bands)
 
-        # Combine date and time
-        try:
-            start = datetime.strptime(f"{date_str} {event_time}", "%Y-%m-%d %I:%M %p")
-        except ValueError as e:
-            print(f"Skipping event due to date/time issue: {bands_str}. Error: {e}")
-            continue
-
         # Extract event link
         event_link = None
         link_tag = column.find("a", href=True)
@@ -217,26 +146,25 @@ for event in events:
         # Extract flyer
         flyer_image = "https://www.mnvibe.com/sites/default/files/styles/max_650x650/public/2022-09/5013409958_17377ca2c1_c.jpg?itok=42M5mkxp"
 
-        # Insert into database
-        try:
-            show_id, was_inserted = insert_show(
-                conn, cursor, venue_id, bands_str, start, event_link, flyer_image
-            )
-            if was_inserted:
-                added_count += 1
-                print(f"Inserted event: {bands_str} at {start}")
-            else:
-                duplicate_count += 1
-            #    print(f"Duplicate event skipped: {bands_str} at {start}")
-        except Exception as e:
-            print(f"Error processing event: {bands_str}. Error: {e}")
-            conn.rollback()
-            continue
+        # The start is resolved for the whole listing at once below
+        rows.append((bands_str, f"{date_str} {event_time}" if date_str else None, event_link, flyer_image))
+
+# Combine date and time, dropping shows whose date couldn't be read
+rows = DATES.resolve_rows(rows)
+
+# Insert or update every show in one statement
+try:
+    counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    added_count = counts['inserted']
+    updated_count = counts['updated']
+    duplicate_count = counts['unchanged']
+    record_fingerprint("331 Club", fingerprint)
+except Exception as e:
+    print(f"Error processing events: {e}")
 
-# Commit and close the database
-conn.commit()
+# Close the database
 cursor.close()
-conn.close()
+release_connection(conn)
 
 # Print summary of added, updated, and skipped events
 print(f"All events processed. Added: {added_count}, Updated: {updated_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
@@ -1,25 +1,16 @@
 import time
 from datetime import datetime
-from selenium import webdriver
 from selenium.webdriver.common.by import By 
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.common.exceptions import TimeoutException
+from browser_pool import open_browser
 from db_utils import connect_to_db, insert_show, get_venue_id
 
 print("Starting Aster Cafe scraper...")
 
-# Initialize WebDriver with additional settings
-chrome_options = Options()
-chrome_options.add_argument("--headless")
-chrome_options.add_argument("--no-sandbox")
-chrome_options.add_argument("--disable-dev-shm-usage")
-chrome_options.add_argument("--window-size=1920,1080")
-# Add JavaScript enabled explicitly
-chrome_options.add_argument("--enable-javascript")
-
-driver = webdriver.Chrome(options=chrome_options)
+# Borrow a headless Chrome tab from the shared pool
+driver = open_browser()
 
 try:
     # Load the calendar page
@@ -0,0 +1,210 @@
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+
+from psycopg2.extras import execute_values
+
+import run_stats
+
+# Link bands as part of upsert_shows (LINK_BANDS=0 leaves show_bands alone)
+LINK_BANDS = os.getenv('LINK_BANDS', '1') != '0'
+
+# Seconds before the cached band names are reloaded
+BAND_INDEX_TTL = float(os.getenv('BAND_INDEX_TTL', '3600'))
+
+# Shows read per batch when backfilling from the command line
+BACKFILL_BATCH_SIZE = 1000
+
+# Placeholders scrapers store when a listing has no lineup
+PLACEHOLDER_NAMES = frozenset({'na', 'tba', 'tbd'})
+
+NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+
+def fold_band_name(name):
+    """
+    Reduce a band name to a comparison key with no case, accents, spaces or
+    punctuation, the way tcupbands slugs are built: "The Del-Viles" and
+    "the del viles" both become "thedelviles".
+    """
+    folded = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    folded = NON_ALPHANUMERIC.sub('', folded.lower().replace('&', 'and'))
+    # Names with no Latin letters would fold to nothing
+    return folded or NON_ALPHANUMERIC.sub('', name.lower())
+
+def show_band_names(bands):
+    """The band names in a shows.bands value (the comma-separated list join_bands writes)."""
+    names = []
+    for name in (bands or '').split(','):
+        name = name.strip()
+        if name and fold_band_name(name) not in PLACEHOLDER_NAMES:
+            names.append(name)
+    return list(dict.fromkeys(names))
+
+class BandIndex:
+    """
+    Name-to-id index of the bands table, loaded once and refreshed after
+    `ttl` seconds. Names match exactly first, then by fold_band_name().
+    Bands that aren't there yet are created under the spelling of their
+    tcupbands profile, when they have one.
+    """
+
+    def __init__(self, ttl=BAND_INDEX_TTL):
+        self.ttl = ttl
+        self._exact = {}
+        self._folded = {}
+        self._tcup_names = {}
+        self._max_id = 0
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _add(self, band_id, band):
+        self._exact.setdefault(band, band_id)
+        self._folded.setdefault(fold_band_name(band), band_id)
+        self._max_id = max(self._max_id, band_id)
+
+    def _load(self, cursor):
+        self._exact, self._folded, self._max_id = {}, {}, 0
+        cursor.execute("SELECT id, band FROM bands WHERE band <> '' ORDER BY id")
+        for band_id, band in cursor.fetchall():
+            self._add(band_id, band)
+        cursor.execute("SELECT name FROM tcupbands WHERE name <> ''")
+        self._tcup_names = {fold_band_name(name): name for name, in cursor.fetchall()}
+        self._loaded_at = time.monotonic()
+
+    def _lookup(self, name):
+        band_id = self._exact.get(name)
+        if band_id is None:
+            band_id = self._folded.get(fold_band_name(name))
+        return band_id
+
+    def resolve(self, cursor, names):
+        """
+        Map band names to bands ids, inserting the bands that don't exist yet
+        in one statement. Returns ({name: id}, number of bands inserted). The
+        caller commits.
+        """
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+                self._load(cursor)
+
+            missing = {}
+            for name in names:
+                if self._lookup(name) is None:
+                    key = fold_band_name(name)
+                    missing.setdefault(key, self._tcup_names.get(key, name))
+
+            if missing:
+                # Scrapers run in parallel: serialize band creation, then pick
+                # up anything another run added since the index was loaded
+                cursor.execute("SELECT pg_advisory_xact_lock(hashtext('bands'))")
+                cursor.execute("SELECT id, band FROM bands WHERE id > %s AND band <> ''", (self._max_id,))
+                for band_id, band in cursor.fetchall():
+                    self._add(band_id, band)
+                missing = {key: name for key, name in missing.items() if key not in self._folded}
+
+            inserted = []
+            if missing:
+                # The lock only keeps other linker runs out; the backend can
+                # still add one of these names first
+                inserted = execute_values(
+                    cursor,
+                    "INSERT INTO bands (band) VALUES %s ON CONFLICT (band) DO NOTHING RETURNING id, band",
+                    [(name,) for name in missing.values()],
+                    page_size=len(missing),
+                    fetch=True,
+                )
+                for band_id, band in inserted:
+                    self._add(band_id, band)
+                taken = [name for name in missing.values() if name not in self._exact]
+                if taken:
+                    cursor.execute("SELECT id, band FROM bands WHERE band = ANY(%s)", (taken,))
+                    for band_id, band in cursor.fetchall():
+                        self._add(band_id, band)
+
+            return {name: self._lookup(name) for name in names}, len(inserted)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+_band_index = BandIndex()
+
+def link_bands(conn, shows):
+    """
+    Point show_bands at each show's current lineup. `shows` is (show_id,
+    bands) pairs with bands as stored in shows.bands; a show's old links are
+    replaced. Missing bands are created, and everything is written in one
+    transaction. Returns {'bands': names read, 'inserted': bands created,
+    'linked': show_bands rows written}.
+    """
+    names_by_show = {show_id: show_band_names(bands) for show_id, bands in shows if show_id is not None}
+    if not names_by_show:
+        return {"bands": 0, "inserted": 0, "linked": 0}
+    names = list(dict.fromkeys(name for show_names in names_by_show.values() for name in show_names))
+
+    try:
+        with conn.cursor() as cursor:
+            ids, inserted = _band_index.resolve(cursor, names)
+            links = sorted({
+                (show_id, ids[name])
+                for show_id, show_names in names_by_show.items()
+                for name in show_names
+            })
+            cursor.execute("DELETE FROM show_bands WHERE show_id = ANY(%s)", (list(names_by_show),))
+            if links:
+                execute_values(
+                    cursor,
+                    "INSERT INTO show_bands (show_id, band_id) VALUES %s ON CONFLICT DO NOTHING",
+                    links,
+                    page_size=len(links),
+                )
+        conn.commit()
+    except Exception as e:
+        print(f"Error linking bands for {len(names_by_show)} shows: {e}")
+        conn.rollback()
+        # Bands created in the rolled-back transaction are in the index
+        _band_index.invalidate()
+        raise
+
+    run_stats.incr("bands_found", len(names))
+    run_stats.incr("bands_inserted", inserted)
+    run_stats.incr("show_bands_linked", len(links))
+    return {"bands": len(names), "inserted": inserted, "linked": len(links)}
+
+UNLINKED_SHOWS_QUERY = """
+    SELECT s.id, s.bands
+      FROM shows s
+     WHERE s.bands <> ''
+       AND s.id > %s
+       AND NOT EXISTS (SELECT 1 FROM show_bands sb WHERE sb.show_id = s.id)
+     ORDER BY s.id
+     LIMIT %s
+"""
+
+def main():
+    """Link every show that has no show_bands rows yet, e.g. shows saved before linking existed."""
+    from db_utils import db_connection  # db_utils imports this module for link_bands
+
+    totals = {"shows": 0, "bands": 0, "inserted": 0, "linked": 0}
+    last_id = 0
+    with db_connection() as conn:
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(UNLINKED_SHOWS_QUERY, (last_id, BACKFILL_BATCH_SIZE))
+                shows = cursor.fetchall()
+            if not shows:
+                break
+            last_id = shows[-1][0]
+            counts = link_bands(conn, shows)
+            totals["shows"] += len(shows)
+            for key, value in counts.items():
+                totals[key] += value
+    print(f"Linked {totals['shows']} shows: {totals['bands']} band names, "
+          f"{totals['inserted']} new bands, {totals['linked']} show_bands rows.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,31 @@
-import re
-import time
 from datetime import datetime
-from dateutil import parser
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-from db_utils import connect_to_db, insert_show, get_venue_id
-
-# Set ChromeDriver path
-CHROMEDRIVER_PATH = '/usr/local/bin/chromedriver'  # Replace with your ChromeDriver path
-
-# Configure Chrome options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-
-chrome_options = Options()
-chrome_options.add_argument('--headless')
-chrome_options.add_argument('--no-sandbox')
-chrome_options.add_argument('--disable-dev-shm-usage')
-
-# Initialize WebDriver
-service = Service(CHROMEDRIVER_PATH)
-print("Starting headless Chrome...")
-driver = webdriver.Chrome(service=service, options=chrome_options)
-print("Chrome initialized successfully")
+from detail_crawler import crawl_details
+from fetch_strategy import load_page
+from parsing import only
+from normalize import split_bands
+from dates import DateResolver
+from db_utils import get_connection, release_connection, upsert_shows, count_statuses, get_venue_id
+
 url = 'https://www.berlinmpls.com/calendar'
-print(f"Navigating to {url}")
-driver.get(url)
-print("Page loaded")
 
-# Wait for event cards to load
-try:
-    WebDriverWait(driver, 10).until(
-        EC.presence_of_all_elements_located((By.CLASS_NAME, 'eventlist-event--upcoming'))
-    )
-    print("Event cards loaded successfully.")
-except Exception as e:
-    print(f"Error waiting for event cards: {e}")
-    driver.quit()
-    exit()
+DATES = DateResolver("Berlin", ["%Y-%m-%d %I:%M %p"])
+print(f"Loading {url}")
 
-# Extract page source and parse with BeautifulSoup
-soup = BeautifulSoup(driver.page_source, 'html.parser')
+# Squarespace renders the calendar server-side; Chrome is only used if it doesn't
+page_source, soup = load_page(
+    url, "article.eventlist-event--upcoming", timeout=10,
+    parse_only=only('eventlist-event--upcoming', tags='article'),
+)
+if soup is None:
+    print("Error waiting for event cards.")
+    exit()
+print("Event cards loaded successfully.")
 
 # Find all event cards
 event_cards = soup.find_all("article", class_="eventlist-event--upcoming")
 
 # Connect to the database
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
 # Get venue ID for Berlin
@@ -57,7 +33,7 @@ try:
     venue_id = get_venue_id(cursor, "Berlin")
 except ValueError as e:
     print(e)
-    conn.close()
+    release_connection(conn)
     exit()
 
 # Counters for added, updated, and skipped events
@@ -65,35 +41,40 @@ added_count = 0
 updated_count = 0
 duplicate_count = 0
 
-# Function to split and clean band names
-def split_band_names(band_string):
-    return [b.strip() for b in re.split(r'\s*(?:,|w/|&|\+)\s*', band_string) if b.strip()]
+# Shows to upsert once every event card has been processed
+rows = []
+
+def card_link(card):
+    """Return (event name, event page URL) from an event card's title."""
+    h1_tag = card.find("h1", class_="eventlist-title")
+    if not h1_tag:
+        return None, None
+    a_tag = h1_tag.find("a", href=True)
+    if not a_tag:
+        return h1_tag.get_text(strip=True), None
+    return a_tag.get_text(strip=True), "https://www.berlinmpls.com" + a_tag['href']
+
+# Fetch every event page at once instead of visiting them one by one
+event_pages = crawl_details(
+    [link for _, link in map(card_link, event_cards) if link],
+    "time.event-time-localized-start, time.event-time-localized",
+    parse_only=only('image-block-wrapper', 'event-time-localized-start', 'event-time-localized'),
+)
 
 # Process each event card
 for card in event_cards:
     # Extract event details
-    event_name = None
     event_date = None
     event_time = None
-    event_link = None
+    start = None
     flyer_image = None
     bands = []
 
-    h1_tag = card.find("h1", class_="eventlist-title")
-    if h1_tag:
-        a_tag = h1_tag.find("a", href=True)
-        if a_tag:
-            event_name = a_tag.get_text(strip=True)
-            event_link = "https://www.berlinmpls.com" + a_tag['href']
-        else:
-            event_name = h1_tag.get_text(strip=True)
-
-    # Navigate to event page for additional details
-    if event_link:
-        driver.get(event_link)
-        time.sleep(2)
-        event_soup = BeautifulSoup(driver.page_source, 'html.parser')
+    event_name, event_link = card_link(card)
 
+    # Use the event page for additional details
+    event_soup = event_pages.get(event_link)
+    if event_soup is not None:
         # Extract flyer image
         image_wrapper = event_soup.find("div", class_="image-block-wrapper")
         if image_wrapper:
@@ -123,12 +104,9 @@ for card in event_cards:
                 # just from text using dateutil.parser
                 combined_str = time_str or date_str
 
-            try:
-                # dateutil.parser can handle many “mixed” formats without you spelling out strptime masks
-                start = parser.parse(combined_str)
-          #      print("Parsed datetime:", start)
-            except ValueError:
-                print("Could not parse time/date:", combined_str)
+            # The usual "2025-01-10 10:15 PM" is read with strptime; anything else
+            # goes through dateutil
+            start = DATES.parse(combined_str)
 
 
     # Extract bands
@@ -136,7 +114,7 @@ for card in event_cards:
         bands.append(event_name)
     support_tag = card.find(class_="vp-support")
     if support_tag:
-        additional_bands = split_band_names(support_tag.get_text(strip=True))
+        additional_bands = split_bands(support_tag.get_text(strip=True), "Berlin")
         bands.extend(additional_bands)
 
     # Remove duplicates and clean band names
@@ -144,26 +122,20 @@ for card in event_cards:
 
   #  print(f"DEBUG: event={event_name}, start={start}, link={event_link}")
 
-    # Process the show
-    try:
-        show_id, was_inserted = insert_show(conn, cursor, venue_id, ", ".join(bands), start, event_link, flyer_image)
-        if was_inserted:
-            added_count += 1
-            print(f"Inserted event: {event_name} on {start}")
-        else:
-            duplicate_count += 1
-          #  print(f"Duplicate event found: {event_name} on {start}")
-    except Exception as e:
-        print(f"Error processing event: {event_name}. Error: {e}")
-        conn.rollback()
-
-# Commit all changes to the database
-conn.commit()
-cursor.close()
-conn.close()
+    rows.append((", ".join(bands), start, event_link, flyer_image))
+
+# Insert or update every show in one statement
+try:
+    counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    added_count = counts['inserted']
+    updated_count = counts['updated']
+    duplicate_count = counts['unchanged']
+except Exception as e:
+    print(f"Error processing events: {e}")
 
-driver.quit()
+cursor.close()
+release_connection(conn)
 
 
 # Print summary
-print(f"All events processed. Added: {added_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
+print(f"All events processed. Added: {added_count}, Updated: {updated_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
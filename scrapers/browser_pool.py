@@ -0,0 +1,216 @@
+import atexit
+import os
+import queue
+import threading
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+# Pool settings, overridable from the environment
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+BROWSER_MAX_PAGES = int(os.getenv('BROWSER_MAX_PAGES', '50'))  # recycle a session after this many page loads
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH')  # None lets Selenium find chromedriver itself
+# Point at a Selenium Grid / standalone-chrome to share warm sessions between scraper processes
+SELENIUM_REMOTE_URL = os.getenv('SELENIUM_REMOTE_URL')
+# host:port of an already running Chrome to open tabs in instead of starting one.
+# run_scrapers.py starts a shared Chrome and sets this for every scraper it runs.
+CHROME_DEBUGGER_ADDRESS = os.getenv('CHROME_DEBUGGER_ADDRESS')
+
+# Flags for every headless Chrome, whether chromedriver or run_scrapers.py starts it
+CHROME_ARGUMENTS = [
+    "--headless=new",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--window-size=1920,1080",
+]
+
+# Requests that never carry event data: web fonts and analytics/ad trackers
+BLOCKED_URL_PATTERNS = [
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*connect.facebook.net*", "*hotjar.com*", "*segment.io*", "*newrelic.com*",
+]
+
+def chrome_options(block_resources=True):
+    """Headless Chrome options shared by every scraper."""
+    options = Options()
+    if CHROME_DEBUGGER_ADDRESS:
+        # Attaching: the shared Chrome was started with its own flags
+        options.debugger_address = CHROME_DEBUGGER_ADDRESS
+        return options
+    for argument in CHROME_ARGUMENTS:
+        options.add_argument(argument)
+    if block_resources:
+        # Image tags stay in the DOM (so src attributes can still be read); the bytes just aren't downloaded
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+    return options
+
+class _Session:
+    """
+    One running Chrome plus the blank tab that keeps it alive. An attached
+    session shares its Chrome with other scraper processes, so it only ever
+    touches tabs it opened itself.
+    """
+
+    def __init__(self, driver, attached=False):
+        self.driver = driver
+        self.attached = attached
+        if attached:
+            driver.switch_to.new_window('tab')
+        self.home_handle = driver.current_window_handle
+        self.pages = 0
+
+class PooledBrowser:
+    """
+    A tab in a pooled Chrome session. Use it like a WebDriver; quit() closes
+    the tab and hands the session back to the pool instead of killing Chrome.
+    """
+
+    def __init__(self, pool, session, handle):
+        self._pool = pool
+        self._session = session
+        self._handle = handle
+
+    def get(self, url):
+        self._session.pages += 1
+        return self._session.driver.get(url)
+
+    def quit(self):
+        if self._session is not None:
+            session, self._session = self._session, None
+            self._pool.release(session, self._handle)
+
+    def __getattr__(self, name):
+        if self._session is None:
+            raise AttributeError(f"browser already returned to the pool (tried to use '{name}')")
+        return getattr(self._session.driver, name)
+
+class BrowserPool:
+    """Keeps up to `size` warm headless Chrome sessions and hands out fresh tabs."""
+
+    def __init__(self, size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES, block_resources=True):
+        self.size = size
+        self.max_pages = max_pages
+        self.block_resources = block_resources
+        self._idle = queue.Queue()
+        self._started = 0
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    def _start_session(self):
+        options = chrome_options(self.block_resources)
+        if SELENIUM_REMOTE_URL:
+            driver = webdriver.Remote(command_executor=SELENIUM_REMOTE_URL, options=options)
+        elif CHROMEDRIVER_PATH:
+            driver = webdriver.Chrome(service=Service(CHROMEDRIVER_PATH), options=options)
+        else:
+            driver = webdriver.Chrome(options=options)
+        session = _Session(driver, attached=bool(CHROME_DEBUGGER_ADDRESS) and not SELENIUM_REMOTE_URL)
+        with self._lock:
+            self._sessions.append(session)
+        return session
+
+    def _stop_session(self, session):
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+            self._started -= 1
+        try:
+            if session.attached:
+                # quit() leaves a Chrome it didn't start running, tabs and all
+                session.driver.switch_to.window(session.home_handle)
+                session.driver.close()
+            session.driver.quit()
+        except Exception as e:
+            print(f"Error shutting down browser session: {e}")
+
+    def _checkout_session(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_start = self._started < self.size
+                if can_start:
+                    self._started += 1
+            if can_start:
+                try:
+                    return self._start_session()
+                except Exception:
+                    with self._lock:
+                        self._started -= 1
+                    raise
+
+            # Every session is busy; wait for one to come back (or to be dropped, freeing a slot)
+            try:
+                return self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+
+    def acquire(self):
+        """Return a PooledBrowser on a fresh tab of a warm session."""
+        session = self._checkout_session()
+
+        if session.pages >= self.max_pages:
+            # Long-lived Chrome sessions slowly leak memory; start a clean one
+            self._stop_session(session)
+            with self._lock:
+                self._started += 1
+            try:
+                session = self._start_session()
+            except Exception:
+                with self._lock:
+                    self._started -= 1
+                raise
+
+        driver = session.driver
+        driver.switch_to.new_window('tab')
+        handle = driver.current_window_handle
+        driver.delete_all_cookies()
+        if self.block_resources and hasattr(driver, "execute_cdp_cmd"):
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+        return PooledBrowser(self, session, handle)
+
+    def release(self, session, handle):
+        """Close the tab a scraper was using and put its session back in the pool."""
+        try:
+            driver = session.driver
+            # A Chrome of our own can lose every stray tab; a shared one only ours
+            for open_handle in [handle] if session.attached else driver.window_handles:
+                if open_handle != session.home_handle and open_handle in driver.window_handles:
+                    driver.switch_to.window(open_handle)
+                    driver.close()
+            driver.switch_to.window(session.home_handle)
+        except Exception as e:
+            print(f"Dropping broken browser session: {e}")
+            self._stop_session(session)
+            return
+        self._idle.put(session)
+
+    def close(self):
+        """Quit every Chrome the pool started."""
+        with self._lock:
+            sessions = list(self._sessions)
+        for session in sessions:
+            self._stop_session(session)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_browser_pool():
+    """Return the process-wide browser pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool()
+            atexit.register(_pool.close)
+    return _pool
+
+def open_browser():
+    """Borrow a headless Chrome tab from the shared pool; call quit() to give it back."""
+    return get_browser_pool().acquire()
@@ -1,68 +1,33 @@
 import re
 import os
-import time
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from bs4 import BeautifulSoup
 import psycopg2
 from datetime import datetime
-from db_utils import connect_to_db, insert_show
-
-# Set ChromeDriver path
-CHROMEDRIVER_PATH = '/usr/local/bin/chromedriver'  # Replace with your ChromeDriver path
-
-# Configure Chrome options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-
-chrome_options = Options()
-chrome_options.add_argument('--headless')
-chrome_options.add_argument('--no-sandbox')
-chrome_options.add_argument('--disable-dev-shm-usage')
-
-# Initialize WebDriver
-service = Service(CHROMEDRIVER_PATH)
-driver = webdriver.Chrome(service=service, options=chrome_options)
+from detail_crawler import crawl_details
+from fetch_strategy import load_page
+from parsing import only
+from normalize import join_bands, split_bands
+from fingerprints import html_fingerprint, is_unchanged, record_fingerprint
+from db_utils import get_connection, release_connection, upsert_shows, count_statuses, get_venue_id
 
 # URL of the event page
 url = 'https://www.thecedar.org/events'
-driver.get(url)
-
-# Function to navigate to the event page
-def navigate_to_event(driver, url, max_retries=3):
-    for attempt in range(max_retries):
-        try:
-            driver.get(url)
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.eventitem-column-meta"))
-            )
-        #    print("Event cards loaded successfully.")
-            return True
-        except TimeoutException:
-            if attempt < max_retries - 1:
-                time.sleep(2)
-                continue
-            print(f"Failed to load page after {max_retries} attempts: {url}")
-            return False
-
-# Wait for event cards to load
-try:
-    WebDriverWait(driver, 20).until(
-        EC.presence_of_all_elements_located((By.CSS_SELECTOR, "article.eventlist-event"))
-    )
-    print("Event cards loaded successfully.")
-except:
+
+# Squarespace renders the event list server-side; Chrome is only used if it doesn't
+page_source, soup = load_page(url, "article.eventlist-event", parse_only=only('eventlist-event', tags='article'))
+if soup is None:
     print("Event cards did not load in time.")
-    driver.quit()
+    exit()
+print("Event cards loaded successfully.")
 
-# Extract page source and parse with BeautifulSoup
-soup = BeautifulSoup(driver.page_source, 'html.parser')
+# Stop early if the event list hasn't changed
+fingerprint = html_fingerprint(page_source)
+if is_unchanged("The Cedar Cultural Center", fingerprint):
+    print("Cedar event list unchanged since the last run; nothing to do.")
+    exit()
 
 # Find all music event cards
 events = soup.select("article.eventlist-event")
+listed_events = []
 events_data = []
 
 # Counters for added, updated, and skipped events
@@ -72,7 +37,7 @@ duplicate_count = 0
 
 # Iterate through events
 for event in events:
-    event_details = {'venue': "The Cedar Cultural Center", 'venue_id': 16}
+    event_details = {'venue': "The Cedar Cultural Center"}
 
     # Get the event URL
     link = event.find("a", href=True)
@@ -108,10 +73,20 @@ for event in events:
         print(f"Error parsing start time: {e}")
         event_details['start'] = None
 
-    # Navigate to individual event page
-    if not navigate_to_event(driver, full_event_url):
+    listed_events.append(event_details)
+
+# Done with the listing; fetch every event page at once
+event_pages = crawl_details(
+    [event['event_link'] for event in listed_events],
+    "div.eventitem-column-meta",
+    parse_only=only('eventitem-column-meta', 'sqs-image-shape-container-element', tags='div'),
+)
+
+for event_details in listed_events:
+    event_soup = event_pages.get(event_details['event_link'])
+    if event_soup is None:
+        print(f"Failed to load page: {event_details['event_link']}")
         continue
-    event_soup = BeautifulSoup(driver.page_source, 'html.parser')
 
     # Extract band names
     meta_div = event_soup.find("div", class_="eventitem-column-meta")
@@ -119,14 +94,7 @@ for event in events:
         title_tag = meta_div.find("h1", class_="eventitem-title")
         if title_tag:
             title_text = title_tag.get_text(strip=True)
-            connectors = [" and ", " + ", " & ", " with ", " featuring "]
-            for connector in connectors:
-                if connector in title_text.lower():
-                    band_names = [band.strip() for band in title_text.split(connector)]
-                    break
-            else:
-                band_names = [title_text.strip()]
-            event_details['bands'] = ", ".join(band_names)
+            event_details['bands'] = join_bands(split_bands(title_text, "The Cedar Cultural Center"))
         else:
             print("Band title not found.")
     else:
@@ -157,45 +125,29 @@ for event in events:
         print(f"Skipped event due to missing critical data: {event_details}")
 
 # Connect to the database
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
-# Fetch existing events to avoid duplicates
-cursor.execute("SELECT venue_id, start FROM shows")
-existing_events = set(cursor.fetchall())
-# print(f"Existing events for venue_id 16: {existing_events}")
-
-
-# Prepare rows for 'shows' table insertion, only if 'bands' is not empty
-for event in events_data:
-    if (event['venue_id'], event['start']) not in existing_events:
-        try:
-            show_id, was_inserted = insert_show(
-                conn, cursor,
-                event['venue_id'],
-                event['bands'],
-                event['start'],
-                event['event_link'],
-                event['flyer_image']
-            )
-            if was_inserted:
-                added_count += 1
-                print(f"Inserted event: {event['bands']} on {event['start']}")
-            else:
-                duplicate_count += 1
-                print(f"Duplicate event found: {event['bands']} on {event['start']}")
-        except Exception as e:
-            print(f"Error processing event: {event['bands']}. Error: {e}")
-            conn.rollback()
+# Insert or update every show in one statement
+rows = [
+    (event['bands'], event['start'], event['event_link'], event['flyer_image'])
+    for event in events_data
+]
+try:
+    venue_id = get_venue_id(cursor, "The Cedar Cultural Center")
+    counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    added_count = counts['inserted']
+    updated_count = counts['updated']
+    duplicate_count = counts['unchanged']
+    record_fingerprint("The Cedar Cultural Center", fingerprint)
+except Exception as e:
+    print(f"Error processing events: {e}")
 
 # Close the database connection
 cursor.close()
 
 # Commit the changes and close the connection
-conn.close()
-
-# Close the WebDriver
-driver.quit()
+release_connection(conn)
 
 # Print summary
-print(f"All events processed. Added: {added_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
+print(f"All events processed. Added: {added_count}, Updated: {updated_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
@@ -0,0 +1,118 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from dateutil import parser
+
+import run_stats
+
+# Venue sites report times in local time; JSON feeds give UTC timestamps
+VENUE_TIMEZONE = ZoneInfo(os.getenv('VENUE_TIMEZONE', 'America/Chicago'))
+
+# Listings only show upcoming shows, so a yearless month/day more than this
+# many days in the past is next year's
+DATE_LOOKBACK_DAYS = int(os.getenv('DATE_LOOKBACK_DAYS', '60'))
+
+# Yearless dates are parsed into a leap year so "Feb 29" survives until the
+# real year is known
+PLACEHOLDER_YEAR = 2000
+YEAR_DIRECTIVES = ('%Y', '%y')
+WHITESPACE = re.compile(r'\s+')
+
+def infer_year(month, day, today=None, lookback_days=DATE_LOOKBACK_DAYS):
+    """
+    The year that puts month/day in the year-long window starting
+    `lookback_days` before today: a December show listed in early January is
+    last year's, a January show listed in December is next year's.
+    """
+    window_start = (today or date.today()) - timedelta(days=lookback_days)
+    for year in (window_start.year, window_start.year + 1):
+        try:
+            if date(year, month, day) >= window_start:
+                return year
+        except ValueError:
+            continue  # Feb 29 outside a leap year
+    return window_start.year + 1
+
+def upcoming_months(count, today=None):
+    """The first day of this month and the `count - 1` months after it."""
+    today = today or date.today()
+    return [
+        date(today.year + (today.month - 1 + i) // 12, (today.month - 1 + i) % 12 + 1, 1)
+        for i in range(count)
+    ]
+
+class DateResolver:
+    """
+    Turns one venue's date strings into datetimes. The strptime format that
+    matched last is tried first, then the venue's other `formats`, and only
+    then dateutil's general parser. Dates without a year get one from
+    infer_year().
+    """
+
+    def __init__(self, venue, formats=(), today=None):
+        self.venue = venue
+        self.formats = list(formats)
+        self.today = today
+        self._last_format = None
+
+    def _with_year(self, parsed):
+        return parsed.replace(year=infer_year(parsed.month, parsed.day, self.today))
+
+    def _strptime(self, text, fmt):
+        if any(directive in fmt for directive in YEAR_DIRECTIVES):
+            return datetime.strptime(text, fmt)
+        return self._with_year(datetime.strptime(f"{PLACEHOLDER_YEAR} {text}", f"%Y {fmt}"))
+
+    def _general(self, text):
+        # Parsing against two default years tells whether the text named one
+        parsed = parser.parse(text, default=datetime(PLACEHOLDER_YEAR, 1, 1))
+        if parser.parse(text, default=datetime(PLACEHOLDER_YEAR - 4, 1, 1)).year == parsed.year:
+            return parsed
+        return self._with_year(parsed)
+
+    def parse(self, text):
+        """The datetime `text` describes, or None if nothing can parse it."""
+        if not text:
+            return None
+        text = WHITESPACE.sub(' ', text).strip()
+        formats = [self._last_format] if self._last_format else []
+        formats += [fmt for fmt in self.formats if fmt != self._last_format]
+        for fmt in formats:
+            try:
+                parsed = self._strptime(text, fmt)
+            except ValueError:
+                continue
+            self._last_format = fmt
+            run_stats.incr("dates_format")
+            return parsed
+        try:
+            parsed = self._general(text)
+        except (ValueError, OverflowError):
+            print(f"{self.venue}: could not parse date '{text}'")
+            run_stats.incr("dates_unparsed")
+            return None
+        run_stats.incr("dates_fallback")
+        return parsed
+
+    def parse_all(self, texts):
+        """parse() for a whole listing at once; repeated strings are parsed once."""
+        texts = list(texts)
+        parsed = {text: self.parse(text) for text in dict.fromkeys(texts)}
+        return [parsed[text] for text in texts]
+
+    def resolve_rows(self, rows):
+        """
+        Replace the date text in the start slot of (bands, start, event_link,
+        flyer_image) rows with its datetime in one parse_all() call. Rows whose
+        date can't be read are dropped.
+        """
+        starts = self.parse_all(row[1] for row in rows)
+        resolved = []
+        for (bands, date_text, event_link, flyer_image), start in zip(rows, starts):
+            if start is None:
+                print(f"Skipping event due to date/time issue: {bands} ({date_text})")
+                continue
+            resolved.append((bands, start, event_link, flyer_image))
+        return resolved
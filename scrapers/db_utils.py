@@ -1,38 +1,202 @@
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 import json
+import re
+import time
+import unicodedata
+import atexit
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import os
 from pathlib import Path
+import run_stats
+from band_linker import LINK_BANDS, link_bands
+from show_index import SHOW_INDEX_ENABLED, ShowIndex
+from tcup_matcher import TCUP_MATCHING, link_tcupbands
 
 backend_dir = Path(__file__).parents[1] / 'backend'
 load_dotenv(backend_dir / '.env')
 env = os.getenv('NODE_ENV', 'development')
 load_dotenv(backend_dir / f'.env.{env}')
 
-def connect_to_db():
-    """Establish a connection to the database."""
-    conn = psycopg2.connect(
+DB_SCHEMA = os.getenv('DB_SCHEMA', 'development')
+
+# Connection pool settings (DB_POOL_* in the backend .env files)
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '5'))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))  # seconds
+
+# Seconds before the cached venue list is reloaded
+VENUE_CACHE_TTL = float(os.getenv('VENUE_CACHE_TTL', '3600'))
+
+# Names venue sites use that don't fold to the name in the venues table
+VENUE_ALIASES = {
+    "Cedar": "The Cedar Cultural Center",
+    "Cedar Cultural Center": "The Cedar Cultural Center",
+    "Eagles Club": "Eagles 34",
+    "Eagles Club #34": "Eagles 34",
+    "Palmers": "Palmer's Bar",
+    "First Ave": "First Avenue",
+    "First Avenue Mainroom": "First Avenue",
+    "Hook and Ladder Theater": "Hook & Ladder",
+    "The Hook and Ladder Theater & Lounge": "Hook & Ladder",
+    "Zhora Darling Bar": "Zhora Darling",
+    "Green Room MPLS": "Green Room",
+    "331": "331 Club",
+}
+
+def connection_params():
+    """Connection settings shared by connect_to_db and the pool."""
+    return dict(
         dbname=os.getenv('DB_NAME'),
         user=os.getenv('DB_USER'),
         password=os.getenv('DB_PASSWORD'),
         host=os.getenv('DB_HOST'),
         port=os.getenv('DB_PORT'),
-        sslmode='require'
+        sslmode='require',
+        # Set the search path during the handshake instead of a separate
+        # SET statement, so it also survives a rollback.
+        options=f'-c search_path={DB_SCHEMA}',
     )
-    
-    # Set the search path to the development schema
-    with conn.cursor() as cur:
-        cur.execute("SET search_path TO development")
-    
+
+def connect_to_db():
+    """Establish a connection to the database."""
+    return psycopg2.connect(**connection_params())
+
+_pool = None
+_pool_lock = threading.Lock()
+_last_used = {}
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **connection_params())
+            atexit.register(close_pool)
+    return _pool
+
+def close_pool():
+    """Close every pooled connection."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _last_used.clear()
+
+def get_connection():
+    """
+    Borrow a connection from the pool with the schema already set.
+    Hand it back with release_connection (or use db_connection instead).
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+
+    # Connections idle past the timeout may have been dropped by the server,
+    # so replace them rather than failing on first use.
+    while conn.closed or time.monotonic() - _last_used.get(conn, time.monotonic()) > DB_POOL_IDLE_TIMEOUT:
+        _last_used.pop(conn, None)
+        pool.putconn(conn, close=True)
+        conn = pool.getconn()
+
     return conn
 
+def release_connection(conn):
+    """Return a borrowed connection to the pool, rolling back anything uncommitted."""
+    if not conn.closed:
+        conn.rollback()
+    _last_used[conn] = time.monotonic()
+    get_pool().putconn(conn)
+
+@contextmanager
+def db_connection():
+    """
+    Borrow a pooled connection for the duration of a with-block.
+    Anything left uncommitted when the block exits is rolled back.
+    """
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        release_connection(conn)
+
+_show_index = None
+
+def get_show_index():
+    """
+    Return the local index of shows already sent to this database, or None
+    when SHOW_INDEX=0. Entries are scoped to the host, database and schema.
+    """
+    global _show_index
+    with _pool_lock:
+        if _show_index is None and SHOW_INDEX_ENABLED:
+            params = connection_params()
+            target = f"{params['host']}:{params['port']}/{params['dbname']}/{DB_SCHEMA}"
+            _show_index = ShowIndex(target=target)
+            atexit.register(_show_index.close)
+    return _show_index
+
+def fold_venue_name(name):
+    """Reduce a venue name to a comparison key: no case, accents, punctuation or leading 'The'."""
+    name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode()
+    name = name.lower().replace('&', ' and ')
+    name = re.sub(r"[^\w\s]", '', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    return re.sub(r'^the ', '', name)
+
+class VenueRegistry:
+    """
+    Name-to-id index of the venues table, loaded once and refreshed after
+    `ttl` seconds. Matching ignores case and punctuation and knows the
+    aliases in VENUE_ALIASES.
+    """
+
+    def __init__(self, ttl=VENUE_CACHE_TTL, aliases=VENUE_ALIASES):
+        self.ttl = ttl
+        self.aliases = aliases
+        self._ids = {}
+        self._missing = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _load(self, cursor):
+        cursor.execute("SELECT id, venue FROM venues")
+        ids = {fold_venue_name(venue): venue_id for venue_id, venue in cursor.fetchall() if venue}
+        for alias, venue in self.aliases.items():
+            if fold_venue_name(venue) in ids:
+                ids.setdefault(fold_venue_name(alias), ids[fold_venue_name(venue)])
+        self._ids = ids
+        self._missing = set()
+        self._loaded_at = time.monotonic()
+
+    def lookup(self, cursor, venue_name):
+        key = fold_venue_name(venue_name)
+        with self._lock:
+            stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+            if stale:
+                self._load(cursor)
+            if key not in self._ids and key not in self._missing and not stale:
+                # The venue may have been added since the list was loaded
+                self._load(cursor)
+            venue_id = self._ids.get(key)
+            if venue_id is None:
+                self._missing.add(key)
+        if venue_id is None:
+            raise ValueError(f"Venue '{venue_name}' not found in the venues table.")
+        return venue_id
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+_venue_registry = VenueRegistry()
+
 def get_venue_id(cursor, venue_name):
-    """Fetch the venue_id for a given venue name."""
-    cursor.execute("SELECT id FROM venues WHERE venue = %s", (venue_name,))
-    venue_row = cursor.fetchone()
-    if not venue_row:
-        raise ValueError(f"Venue '{venue_name}' not found in the venues table.")
-    return venue_row[0]
+    """Fetch the venue_id for a given venue name from the process-wide venue registry."""
+    return _venue_registry.lookup(cursor, venue_name)
 
 def insert_show(conn, cursor, venue_id, bands, start, event_link, flyer_image):
     """
@@ -130,4 +294,278 @@ def insert_show(conn, cursor, venue_id, bands, start, event_link, flyer_image):
         print(f"Query parameters: venue_id={venue_id}, bands={bands}, "
               f"start={start}, event_link={event_link}, flyer_image={flyer_image}")
         conn.rollback()
-        raise
\ No newline at end of file
+        raise
+
+UPSERT_SHOWS_QUERY = """
+    WITH incoming (venue_id, bands, start, event_link, flyer_image, ord) AS (
+        VALUES %s
+    ),
+    {merged_cte},
+    old AS (
+        SELECT s.id, s.start, s.bands, s.event_link, s.flyer_image
+          FROM shows s
+          JOIN incoming i ON s.venue_id = i.venue_id AND s.start = i.start
+    ),
+    upserted AS (
+        INSERT INTO shows (venue_id, bands, start, event_link, flyer_image)
+        SELECT venue_id, bands, start, event_link, flyer_image FROM incoming
+         WHERE start NOT IN (SELECT start FROM merged)
+        ON CONFLICT ON CONSTRAINT unique_show DO UPDATE
+        SET
+            bands = EXCLUDED.bands,
+            event_link = EXCLUDED.event_link,
+            flyer_image = CASE
+                WHEN shows.flyer_image IS NULL OR shows.flyer_image = ''
+                     THEN EXCLUDED.flyer_image
+                ELSE shows.flyer_image
+            END,
+            -- A show delete_shows marked deleted is listed again
+            is_deleted = FALSE
+        WHERE shows.bands IS DISTINCT FROM EXCLUDED.bands
+           OR shows.event_link IS DISTINCT FROM EXCLUDED.event_link
+           OR ((shows.flyer_image IS NULL OR shows.flyer_image = '')
+               AND shows.flyer_image IS DISTINCT FROM EXCLUDED.flyer_image)
+           OR shows.is_deleted
+        RETURNING id, start, xmax = 0 AS was_inserted, bands, event_link, flyer_image
+    )
+    SELECT i.ord,
+           COALESCE(m.keep_id, u.id, o.id),
+           u.was_inserted,
+           m.keep_id IS NOT NULL,
+           o.bands, o.event_link, o.flyer_image,
+           u.bands, u.event_link, u.flyer_image
+      FROM incoming i
+      LEFT JOIN old o ON o.start = i.start
+      LEFT JOIN upserted u ON u.start = i.start
+      LEFT JOIN merged m ON m.start = i.start
+     ORDER BY i.ord
+"""
+
+# Starts dedupe_shows.py merged into another show, so they aren't re-created
+MERGED_CTE = """merged AS (
+        SELECT m.start, m.keep_id
+          FROM merged_shows m
+          JOIN incoming i ON m.venue_id = i.venue_id AND m.start = i.start
+    )"""
+# ...or nothing, where the merged_shows migration hasn't been applied
+NO_MERGED_CTE = """merged (start, keep_id) AS (
+        SELECT NULL::timestamp, NULL::integer WHERE false
+    )"""
+
+SHOW_FIELDS = ("bands", "event_link", "flyer_image")
+
+_merged_shows_available = None
+
+def merged_shows_available(cursor):
+    """
+    True if the merged_shows table exists. Checked once per process, so a
+    database without the dedupe migration still takes every upsert.
+    """
+    global _merged_shows_available
+    if _merged_shows_available is None:
+        cursor.execute("SELECT to_regclass('merged_shows') IS NOT NULL")
+        _merged_shows_available = cursor.fetchone()[0]
+        if not _merged_shows_available:
+            print("merged_shows table not found; shows merged by dedupe_shows.py can't be skipped.")
+    return _merged_shows_available
+
+def index_matches_db(conn, venue_id, starts):
+    """
+    True if Postgres still has a live show (or a merge tombstone) at each of
+    the venue's `starts`, the shows the show index is about to skip. One
+    count, so a show deleted directly in Postgres can't stay skipped.
+    """
+    with conn.cursor() as cursor:
+        tombstone = ""
+        if merged_shows_available(cursor):
+            tombstone = "OR EXISTS (SELECT 1 FROM merged_shows m WHERE m.venue_id = s.venue_id AND m.start = s.start)"
+        cursor.execute(
+            f"""
+            SELECT count(*)
+              FROM shows s
+             WHERE s.venue_id = %s
+               AND s.start = ANY(%s::timestamp[])
+               AND (NOT COALESCE(s.is_deleted, false) {tombstone})
+            """,
+            (venue_id, starts),
+        )
+        count = cursor.fetchone()[0]
+    conn.commit()
+    return count == len(starts)
+
+def upsert_shows(conn, venue_id, rows):
+    """
+    Insert or update a whole scrape of shows for one venue in a single statement.
+
+    `rows` is an iterable of (bands, start, event_link, flyer_image) tuples, in the
+    same order insert_show takes them. Returns one dict per show with its id,
+    start, status ('inserted', 'updated' or 'unchanged') and, for updates, a
+    {field: (old, new)} dict of what changed. Shows that only differ in fields
+    the upsert wouldn't touch are left alone, so unchanged rows cost no write.
+
+    Shows whose scraped fields match what the local show index says was last
+    sent are not sent at all; they come back as 'unchanged' with id None.
+    Shows dedupe_shows.py merged away (see merged_shows, when that table
+    exists) are not re-created or restored; they come back as 'unchanged'
+    with the id of the show they were merged into.
+
+    New shows, and shows whose bands changed, then get their show_bands links
+    and TCUP member matches (see band_linker and tcup_matcher).
+    """
+    # The unique_show constraint can only be hit once per statement, so keep
+    # the last row scraped for each start time (same result as calling
+    # insert_show in a loop). Rows without a start can never match an existing
+    # show and would insert a duplicate every run, so they're skipped.
+    by_start = {}
+    for bands, start, event_link, flyer_image in rows:
+        run_stats.incr("events_parsed")
+        if start is None:
+            run_stats.incr("skipped")
+            print(f"[SKIP] Show without a start time: bands={bands}, event_link={event_link}")
+            continue
+        by_start[start] = (bands, start, event_link, flyer_image)
+
+    if not by_start:
+        return []
+
+    # Only send shows that are new or changed since they were last sent
+    results = []
+    pending = list(by_start.values())
+    index = get_show_index()
+    if index is not None:
+        pending = index.changed(venue_id, pending)
+        pending_starts = {row[1] for row in pending}
+        skipped = [start for start in by_start if start not in pending_starts]
+        if skipped and not index_matches_db(conn, venue_id, skipped):
+            # Shows were deleted or merged in Postgres behind the index's back
+            print(f"Show index out of date for venue_id={venue_id}; sending every show.")
+            run_stats.incr("index_resets")
+            index.forget_venue(venue_id)
+            pending = list(by_start.values())
+            pending_starts = set(by_start)
+        for start in by_start:
+            if start not in pending_starts:
+                run_stats.incr("unchanged")
+                run_stats.incr("index_skipped")
+                results.append({"id": None, "start": start, "status": "unchanged", "changes": {}})
+        if not pending:
+            return results
+
+    values = [
+        (venue_id, bands, start, event_link, flyer_image, ord)
+        for ord, (bands, start, event_link, flyer_image) in enumerate(pending)
+    ]
+
+    try:
+        with conn.cursor() as cursor:
+            merged_cte = MERGED_CTE if merged_shows_available(cursor) else NO_MERGED_CTE
+            result_rows = execute_values(
+                cursor,
+                UPSERT_SHOWS_QUERY.format(merged_cte=merged_cte),
+                values,
+                template="(%s::integer, %s::text, %s::timestamp, %s::text, %s::text, %s::integer)",
+                page_size=len(values),
+                fetch=True,
+            )
+        conn.commit()
+    except Exception as e:
+        print(f"Error upserting {len(values)} shows for venue_id={venue_id}: {e}")
+        conn.rollback()
+        raise
+
+    if index is not None:
+        index.record(venue_id, pending)
+
+    relink = []
+    for ord, show_id, was_inserted, was_merged, *fields in sorted(result_rows):
+        old_row, new_row = fields[:3], fields[3:]
+        start = values[ord][2]
+        changes = {}
+
+        if was_merged:
+            status = "unchanged"
+            run_stats.incr("merged_skipped")
+        elif was_inserted:
+            status = "inserted"
+            print(f"[INSERT] New show with ID={show_id}")
+        elif was_inserted is None:
+            status = "unchanged"
+        else:
+            status = "updated"
+            changes = {
+                field: (old, new)
+                for field, old, new in zip(SHOW_FIELDS, old_row, new_row)
+                if old != new
+            }
+            if not changes:
+                # Nothing but is_deleted was different (see UPSERT_SHOWS_QUERY)
+                changes = {"is_deleted": (True, False)}
+            print(f"[UPDATE] Show ID={show_id} updated. Changes: "
+                  + ", ".join(f"{field}: '{old}' -> '{new}'" for field, (old, new) in changes.items()))
+
+        run_stats.incr(status)
+        results.append({"id": show_id, "start": start, "status": status, "changes": changes})
+        if status == "inserted" or "bands" in changes:
+            relink.append((show_id, values[ord][1]))
+
+    # The shows are saved either way; `python band_linker.py` links any left out
+    if relink and LINK_BANDS:
+        try:
+            link_bands(conn, relink)
+        except Exception as e:
+            print(f"Could not link bands for venue_id={venue_id}: {e}")
+    # ...and `python tcup_matcher.py` rescans upcoming shows
+    if relink and TCUP_MATCHING:
+        try:
+            link_tcupbands(conn, relink)
+        except Exception as e:
+            print(f"Could not match TCUP bands for venue_id={venue_id}: {e}")
+
+    return results
+
+def delete_shows(conn, venue_id, starts):
+    """
+    Mark a venue's shows at the given start times deleted (is_deleted, like
+    mark_venue_shows_deleted), e.g. events the venue cancelled, and drop them
+    from the show index. The rows stay, so user_shows and show_bands keep
+    pointing at them. Returns the number of shows newly marked deleted.
+    """
+    starts = list(dict.fromkeys(starts))
+    if not starts:
+        return 0
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE shows
+                   SET is_deleted = TRUE
+                 WHERE venue_id = %s
+                   AND start = ANY(%s::timestamp[])
+                   AND NOT COALESCE(is_deleted, false)
+                RETURNING id
+                """,
+                (venue_id, starts),
+            )
+            deleted = [show_id for show_id, in cursor.fetchall()]
+        conn.commit()
+    except Exception as e:
+        print(f"Error marking {len(starts)} shows deleted for venue_id={venue_id}: {e}")
+        conn.rollback()
+        raise
+
+    index = get_show_index()
+    if index is not None:
+        index.forget(venue_id, starts)
+
+    for show_id in deleted:
+        print(f"[DELETE] Show ID={show_id} marked deleted")
+    run_stats.incr("deleted", len(deleted))
+    return len(deleted)
+
+def count_statuses(results):
+    """Tally upsert_shows results into {'inserted': n, 'updated': n, 'unchanged': n}."""
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return counts
@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import re
+import sys
+import unicodedata
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+
+from psycopg2.extras import execute_values
+
+from db_utils import db_connection, fold_venue_name
+
+# Shows at the same venue starting within this many hours of each other are compared
+DEDUPE_WINDOW_HOURS = float(os.getenv('DEDUPE_WINDOW_HOURS', '3'))
+
+# Minimum Jaccard similarity of two shows' band words to report them
+DEDUPE_THRESHOLD = float(os.getenv('DEDUPE_THRESHOLD', '0.6'))
+
+# Confirmed merges applied per transaction
+MERGE_BATCH_SIZE = int(os.getenv('MERGE_BATCH_SIZE', '200'))
+
+DEFAULT_CANDIDATES_PATH = Path(__file__).parent / 'dedupe_candidates.jsonl'
+
+# Rooms whose shows are listed by one promoter and can turn up under more
+# than one of them (First Avenue's listings span all of these)
+VENUE_GROUPS = {
+    "First Avenue": ["First Avenue", "7th St Entry", "Fine Line", "Palace Theatre", "Turf Club", "The Fitzgerald Theater"],
+}
+
+NON_ALPHANUMERIC = re.compile(r'[\W_]+')
+STOP_WORDS = frozenset({'the', 'and', 'with', 'w', 'featuring', 'feat', 'ft', 'plus', 'special', 'guest', 'guests'})
+
+def band_tokens(bands):
+    """The words of a shows.bands value, without case, accents, punctuation or filler words."""
+    text = unicodedata.normalize('NFKD', bands or '').encode('ascii', 'ignore').decode().lower()
+    return frozenset(word for word in NON_ALPHANUMERIC.split(text.replace('&', ' and ')) if word and word not in STOP_WORDS)
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 0.0
+
+def venue_blocks(cursor):
+    """Lists of venue ids whose shows are compared with each other: one per venue, or per VENUE_GROUPS entry."""
+    cursor.execute("SELECT id, venue FROM venues")
+    ids_by_name = {fold_venue_name(venue): venue_id for venue_id, venue in cursor.fetchall() if venue}
+    grouped = set()
+    blocks = []
+    for rooms in VENUE_GROUPS.values():
+        block = [ids_by_name[fold_venue_name(room)] for room in rooms if fold_venue_name(room) in ids_by_name]
+        grouped.update(block)
+        blocks.append(block)
+    blocks.extend([venue_id] for venue_id in sorted(ids_by_name.values()) if venue_id not in grouped)
+    return [block for block in blocks if block]
+
+def block_candidates(shows, window, threshold):
+    """
+    Near-duplicate pairs among one block's shows, read in start order. Each
+    show is compared with every show still inside the time window, never with
+    the whole block; a window holds a handful of shows, so exact Jaccard is
+    cheap and no true pair is missed.
+    """
+    in_window = deque()  # (start, show_id) in start order
+    details = {}
+    for show_id, venue_id, start, bands in shows:
+        while in_window and start - in_window[0][0] > window:
+            _, old_id = in_window.popleft()
+            details.pop(old_id, None)
+
+        tokens = band_tokens(bands)
+        if not tokens:
+            continue
+        current = {"show": {"venue_id": venue_id, "start": start.isoformat(), "bands": bands}, "tokens": tokens}
+        for other_id, other in sorted(details.items()):
+            similarity = jaccard(tokens, other["tokens"])
+            if similarity >= threshold:
+                # The older row is kept, as resolve_merges() does for chains
+                keep, drop = sorted([(other_id, other), (show_id, current)])
+                yield {
+                    "keep": keep[0],
+                    "drop": drop[0],
+                    "similarity": round(similarity, 3),
+                    "keep_show": keep[1]["show"],
+                    "drop_show": drop[1]["show"],
+                    "confirmed": False,
+                }
+
+        details[show_id] = current
+        in_window.append((start, show_id))
+
+def find_candidates(conn, output_path, window_hours=DEDUPE_WINDOW_HOURS, threshold=DEDUPE_THRESHOLD, since=None):
+    """Write every near-duplicate pair in the show history to `output_path` as JSON lines; returns the count."""
+    window = timedelta(hours=window_hours)
+    with conn.cursor() as cursor:
+        blocks = venue_blocks(cursor)
+
+    count = 0
+    with open(output_path, "w") as output:
+        for venue_ids in blocks:
+            # Server-side cursor: the full history is streamed, not loaded at once
+            with conn.cursor(name="dedupe_shows") as cursor:
+                cursor.itersize = 5000
+                cursor.execute(
+                    """
+                    SELECT id, venue_id, start, bands
+                      FROM shows
+                     WHERE venue_id = ANY(%s)
+                       AND start IS NOT NULL
+                       AND NOT COALESCE(is_deleted, false)
+                       AND (%s::timestamp IS NULL OR start >= %s::timestamp)
+                     ORDER BY start, id
+                    """,
+                    (venue_ids, since, since),
+                )
+                for candidate in block_candidates(cursor, window, threshold):
+                    output.write(json.dumps(candidate) + "\n")
+                    count += 1
+            conn.rollback()  # end the read-only transaction the named cursor opened
+    return count
+
+def read_confirmed(path):
+    """(keep, drop) pairs marked "confirmed": true in a candidates file."""
+    pairs = []
+    with open(path) as candidates:
+        for line in candidates:
+            if line.strip():
+                candidate = json.loads(line)
+                if candidate.get("confirmed") is True:
+                    pairs.append((candidate["keep"], candidate["drop"]))
+    return pairs
+
+def resolve_merges(pairs):
+    """
+    Collapse chains of pairs (A~B, B~C) so every duplicate points straight
+    at the oldest show of its group. Returns {drop_id: keep_id}.
+    """
+    parent = {}
+
+    def root(show_id):
+        parent.setdefault(show_id, show_id)
+        while parent[show_id] != show_id:
+            parent[show_id] = parent[parent[show_id]]
+            show_id = parent[show_id]
+        return show_id
+
+    for a, b in pairs:
+        ra, rb = root(a), root(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return {show_id: root(show_id) for show_id in parent if root(show_id) != show_id}
+
+# Move everything that points at a duplicate to the show being kept, then mark it deleted
+MERGE_STATEMENTS = [
+    # Keep the duplicate's link and flyer when the kept show has none
+    """
+    UPDATE shows k
+       SET event_link = COALESCE(NULLIF(k.event_link, ''), d.event_link),
+           flyer_image = COALESCE(NULLIF(k.flyer_image, ''), d.flyer_image)
+      FROM merge_pairs p
+      JOIN shows d ON d.id = p.drop_id
+     WHERE k.id = p.keep_id
+    """,
+    """
+    INSERT INTO show_bands (show_id, band_id)
+    SELECT p.keep_id, sb.band_id FROM merge_pairs p JOIN show_bands sb ON sb.show_id = p.drop_id
+    ON CONFLICT DO NOTHING
+    """,
+    """
+    INSERT INTO show_tcupbands (show_id, tcupband_id)
+    SELECT p.keep_id, st.tcupband_id FROM merge_pairs p JOIN show_tcupbands st ON st.show_id = p.drop_id
+    ON CONFLICT DO NOTHING
+    """,
+    # One row per user, however many copies they saved
+    """
+    INSERT INTO user_shows (user_id, show_id, created_at)
+    SELECT u.user_id, p.keep_id, min(u.created_at)
+      FROM merge_pairs p JOIN user_shows u ON u.show_id = p.drop_id
+     GROUP BY u.user_id, p.keep_id
+    ON CONFLICT DO NOTHING
+    """,
+    "DELETE FROM user_shows u USING merge_pairs p WHERE u.show_id = p.drop_id",
+    "UPDATE bands b SET show_id = p.keep_id FROM merge_pairs p WHERE b.show_id = p.drop_id",
+    # Earlier merges into a show that is now a duplicate itself
+    "UPDATE merged_shows m SET keep_id = p.keep_id FROM merge_pairs p WHERE m.keep_id = p.drop_id",
+]
+
+# Mark the duplicates deleted (the rows stay, so nothing that references
+# them breaks) and leave a tombstone at each one's venue and start, so
+# upsert_shows doesn't bring it back while the venue still lists it
+DELETE_DUPLICATES_QUERY = """
+    WITH dropped AS (
+        UPDATE shows s
+           SET is_deleted = TRUE
+          FROM merge_pairs p
+         WHERE s.id = p.drop_id
+     RETURNING s.venue_id, s.start, p.keep_id
+    )
+    INSERT INTO merged_shows (venue_id, start, keep_id)
+    SELECT venue_id, start, keep_id FROM dropped WHERE venue_id IS NOT NULL AND start IS NOT NULL
+    ON CONFLICT (venue_id, start) DO UPDATE SET keep_id = EXCLUDED.keep_id, merged_at = now()
+    RETURNING venue_id
+"""
+
+def apply_merges(conn, merges, batch_size=MERGE_BATCH_SIZE):
+    """
+    Merge each duplicate into its kept show, `batch_size` pairs per
+    transaction. A failed batch is rolled back and skipped. Returns the
+    number of shows marked deleted.
+    """
+    pairs = sorted(merges.items())
+    deleted = 0
+    for offset in range(0, len(pairs), batch_size):
+        batch = [(keep_id, drop_id) for drop_id, keep_id in pairs[offset:offset + batch_size]]
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("CREATE TEMP TABLE merge_pairs (keep_id integer, drop_id integer PRIMARY KEY) ON COMMIT DROP")
+                execute_values(cursor, "INSERT INTO merge_pairs (keep_id, drop_id) VALUES %s", batch, page_size=len(batch))
+                for statement in MERGE_STATEMENTS:
+                    cursor.execute(statement)
+                cursor.execute(DELETE_DUPLICATES_QUERY)
+                removed = cursor.fetchall()
+            conn.commit()
+        except Exception as e:
+            print(f"Error merging shows {batch[0][1]}..{batch[-1][1]}: {e}")
+            conn.rollback()
+            continue
+
+        # The show index keeps their fingerprints: an unchanged listing is
+        # still skipped locally, and a changed one stops at the tombstone
+        deleted += len(removed)
+        print(f"Merged {len(removed)} duplicate shows ({offset + len(batch)}/{len(pairs)}).")
+    return deleted
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and merge near-duplicate shows.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    find = commands.add_parser("find", help="write merge candidates to a JSON lines file")
+    find.add_argument("--output", type=Path, default=DEFAULT_CANDIDATES_PATH)
+    find.add_argument("--window-hours", type=float, default=DEDUPE_WINDOW_HOURS,
+                      help="compare shows starting this close together")
+    find.add_argument("--threshold", type=float, default=DEDUPE_THRESHOLD,
+                      help="minimum band-word similarity (0-1)")
+    find.add_argument("--since", help="only shows starting on or after this date (YYYY-MM-DD)")
+
+    merge = commands.add_parser("merge", help='apply the candidates marked "confirmed": true')
+    merge.add_argument("candidates", type=Path, nargs="?", default=DEFAULT_CANDIDATES_PATH)
+    merge.add_argument("--batch-size", type=int, default=MERGE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        if args.command == "find":
+            count = find_candidates(conn, args.output, args.window_hours, args.threshold, args.since)
+            print(f"Wrote {count} merge candidates to {args.output}. "
+                  'Set "confirmed": true on the ones to merge, then run the merge command.')
+        else:
+            merges = resolve_merges(read_confirmed(args.candidates))
+            print(f"Merging {len(merges)} duplicate shows...")
+            deleted = apply_merges(conn, merges, args.batch_size)
+            print(f"Marked {deleted} duplicate shows deleted.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import os
+import queue
+import threading
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from browser_pool import BROWSER_POOL_SIZE, open_browser
+from fetch import fetch_soups
+from parsing import make_soup
+
+# Browser tabs loading detail pages at once; each one holds a pooled Chrome session
+DETAIL_BROWSER_WORKERS = int(os.getenv('DETAIL_BROWSER_WORKERS', str(BROWSER_POOL_SIZE)))
+DETAIL_PAGE_TIMEOUT = int(os.getenv('DETAIL_PAGE_TIMEOUT', '30'))  # seconds to wait for `selector`
+DETAIL_PAGE_RETRIES = int(os.getenv('DETAIL_PAGE_RETRIES', '2'))
+
+def _browser_worker(pending, pages, selector, timeout, retries, parse_only):
+    browser = open_browser()
+    try:
+        while True:
+            try:
+                url = pending.get_nowait()
+            except queue.Empty:
+                return
+            for attempt in range(retries + 1):
+                try:
+                    browser.get(url)
+                    WebDriverWait(browser, timeout).until(
+                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                    )
+                    pages[url] = make_soup(browser.page_source, parse_only)
+                    print(f"Loaded event page: {url}")
+                    break
+                except TimeoutException:
+                    print(f"Attempt {attempt + 1} timed out loading {url}")
+                except Exception as e:
+                    print(f"Error loading {url}: {e}")
+                    break
+    finally:
+        browser.quit()
+
+def crawl_in_browser(urls, selector, workers=DETAIL_BROWSER_WORKERS, timeout=DETAIL_PAGE_TIMEOUT,
+                     retries=DETAIL_PAGE_RETRIES, parse_only=None):
+    """
+    Load pages that need JavaScript across several pooled browser sessions at
+    once. Returns {url: soup}, without the pages that never showed `selector`.
+    """
+    pending = queue.Queue()
+    for url in dict.fromkeys(urls):
+        pending.put(url)
+
+    pages = {}
+    threads = [
+        threading.Thread(target=_browser_worker, args=(pending, pages, selector, timeout, retries, parse_only))
+        for _ in range(min(workers, pending.qsize()))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return pages
+
+def crawl_details(urls, selector, render=False, parse_only=None):
+    """
+    Fetch event detail pages concurrently and return {url: soup}; pages that
+    could not be loaded are left out. Pages are fetched over HTTP first and
+    only the ones where the CSS `selector` isn't in the server HTML are loaded
+    in the browser (all of them when render=True). A `parse_only` strainer
+    must keep the elements `selector` matches.
+    """
+    urls = list(dict.fromkeys(urls))
+    pages = {}
+    if not render:
+        print(f"Fetching {len(urls)} event pages over HTTP...")
+        for url, soup in fetch_soups(urls, parse_only=parse_only).items():
+            if soup is not None and soup.select_one(selector) is not None:
+                pages[url] = soup
+
+    needs_browser = [url for url in urls if url not in pages]
+    if needs_browser:
+        print(f"Loading {len(needs_browser)} event pages in the browser...")
+        pages.update(crawl_in_browser(needs_browser, selector, parse_only=parse_only))
+    return pages
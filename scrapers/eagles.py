@@ -6,8 +6,10 @@ from google.auth.transport.requests import Request
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from datetime import datetime, timedelta
-from db_utils import connect_to_db, insert_show
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from db_utils import db_connection, upsert_shows, delete_shows, count_statuses, get_venue_id
+from fingerprints import gcal_fingerprint, is_unchanged, record_fingerprint
 
 # If modifying access, you'll need to authenticate
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
@@ -15,6 +17,10 @@ SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 # Token file that stores user's access and refresh tokens
 token_path = 'token.json'
 
+# Calendar sync token and the events it covers, kept between runs
+SYNC_STATE_PATH = Path(os.getenv('EAGLES_SYNC_STATE', Path(__file__).parent / '.eagles_sync.json'))
+SYNC_WINDOW_DAYS = 180  # only shows in the next six months are saved
+
 # Load credentials (if available)
 def get_credentials():
     creds = None
@@ -32,60 +38,147 @@ def get_credentials():
             token.write(creds.to_json())
     return creds
 
-# Function to get events within the next 6 months
-def get_events(calendar_id):
-    creds = get_credentials()
+# Fields the scraper reads; everything else is left out of the responses
+EVENT_FIELDS = "items(id,status,summary,htmlLink,start),nextPageToken,nextSyncToken,etag"
+
+_service = None
+
+def get_service():
+    """Build the Calendar API client once and reuse it."""
+    global _service
+    if _service is None:
+        _service = build('calendar', 'v3', credentials=get_credentials(), cache_discovery=False)
+    return _service
+
+def load_sync_state(calendar_id):
+    """The sync token and local copy of the calendar's events from the last successful run."""
+    try:
+        state = json.loads(SYNC_STATE_PATH.read_text())
+    except (OSError, ValueError):
+        state = {}
+    if state.get('calendar_id') != calendar_id:
+        state = {'calendar_id': calendar_id, 'sync_token': None, 'events': {}}
+    return state
+
+def save_sync_state(state):
+    tmp_path = SYNC_STATE_PATH.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps(state))
+    os.replace(tmp_path, SYNC_STATE_PATH)
+
+def list_events(service, calendar_id, sync_token=None):
+    """
+    Page through events.list, returning (items, next sync token, etag). With a
+    sync token only events changed since it was issued come back, cancelled
+    ones included (status 'cancelled'); without one the whole calendar is listed.
+    """
+    params = dict(calendarId=calendar_id, singleEvents=True, maxResults=2500, fields=EVENT_FIELDS)
+    if sync_token:
+        params['syncToken'] = sync_token
+    items = []
+    etag = None
+    page_token = None
+    while True:
+        events_result = service.events().list(pageToken=page_token, **params).execute()
+        items.extend(events_result.get('items', []))
+        etag = etag or events_result.get('etag')
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return items, events_result.get('nextSyncToken'), etag
+
+# Parse an event's start into the datetime stored on the show
+def parse_start(event):
+    start_time = event['start'].get('dateTime', event['start'].get('date'))  # Time or Date
+    if not start_time:
+        return None
     try:
-        service = build('calendar', 'v3', credentials=creds)
-
-        # Get the current date and time
-        now = datetime.utcnow().isoformat() + 'Z'  # 'Z' indicates UTC time
-
-        # Calculate the time 6 months from now
-        six_months_later = (datetime.utcnow() + timedelta(days=180)).isoformat() + 'Z'  # 6 months ahead
-
-        events_data = []
-
-        # Get the first batch of events (only for the next 6 months)
-        events_result = service.events().list(
-            calendarId=calendar_id,
-            timeMin=now,  # Start from the current time
-            timeMax=six_months_later,  # End at 6 months from now
-            singleEvents=True,
-            orderBy='startTime',
-        ).execute()
-
-        events_data.extend(events_result.get('items', []))  # Add the first batch of events
-
-        # Paginate through all events if there are more
-        while 'nextPageToken' in events_result:
-            page_token = events_result['nextPageToken']
-            events_result = service.events().list(
-                calendarId=calendar_id,
-                pageToken=page_token,
-                timeMin=now,
-                timeMax=six_months_later,  # Ensure the pagination still respects the 6-month range
-                singleEvents=True,
-                orderBy='startTime',
-            ).execute()
-            events_data.extend(events_result.get('items', []))  # Add the next batch of events
-
-        if not events_data:
-            print('No upcoming events found.')
-        return events_data
+        return datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S%z")  # datetime format for events
+    except ValueError as e:
+        try:
+            return datetime.strptime(start_time, "%Y-%m-%d")  # Date-only format
+        except ValueError:
+            print(f"Error parsing event time: {e}")
+            return None
 
+def in_window(start, now, days=SYNC_WINDOW_DAYS):
+    """True if `start` falls between now and `days` from now."""
+    if start.tzinfo is None:
+        now = now.replace(tzinfo=None)  # date-only events
+    return now <= start <= now + timedelta(days=days)
+
+# Function to get events within the next 6 months
+def get_events(calendar_id, state):
+    """
+    Bring the local copy of the calendar in `state` up to date, fetching only
+    what changed since the saved sync token. Returns the events starting in
+    the next six months, the list etag, and the start times of upcoming
+    events that were cancelled or moved.
+    """
+    service = get_service()
+    events = state['events']
+    old_starts = {parse_start(event) for event in events.values()}
+    try:
+        try:
+            items, sync_token, etag = list_events(service, calendar_id, state['sync_token'])
+        except HttpError as error:
+            # 410 Gone: the sync token expired, so start over with a full listing
+            if error.resp.status != 410:
+                raise
+            print("Calendar sync token expired; re-listing every event.")
+            events.clear()
+            items, sync_token, etag = list_events(service, calendar_id)
     except HttpError as error:
         print(f'An error occurred: {error}')
-        return []
+        return None, None, []
+
+    print(f"Calendar returned {len(items)} new, changed or cancelled events.")
+    for item in items:
+        if item.get('status') == 'cancelled':
+            events.pop(item['id'], None)
+        else:
+            events[item['id']] = item
+    state['sync_token'] = sync_token
+
+    # Keep only upcoming events; ones already over will never be saved again
+    now = datetime.now(timezone.utc)
+    starts = {}
+    for event_id, event in list(events.items()):
+        start = parse_start(event)
+        if start is None or start < (now if start.tzinfo else now.replace(tzinfo=None)):
+            del events[event_id]
+        else:
+            starts[event_id] = start
+
+    # Upcoming shows whose event was cancelled or moved to another time
+    removed_starts = [
+        start for start in old_starts - set(starts.values())
+        if start is not None and in_window(start, now)
+    ]
+    upcoming = [events[event_id] for event_id, start in starts.items() if in_window(start, now)]
+    if not upcoming:
+        print('No upcoming events found.')
+    return upcoming, etag, removed_starts
 
 # Extract the calendar events using the calendar ID
 calendar_id = 'teflgutelllvla7r6vfcmjdjjo@group.calendar.google.com'  # Use the specific calendar ID
 
-events = get_events(calendar_id)
+sync_state = load_sync_state(calendar_id)
+events, etag, removed_starts = get_events(calendar_id, sync_state)
+if events is None:
+    exit()
+# Cancellations a previous run couldn't mark deleted
+removed_starts += [datetime.fromisoformat(start) for start in sync_state.pop('pending_deletes', [])]
+
+# Nothing to do if the calendar hasn't changed since the last successful run
+fingerprint = gcal_fingerprint(etag, events)
+if not removed_starts and is_unchanged("Eagles 34", fingerprint):
+    print("Eagles 34 calendar unchanged since the last run; nothing to do.")
+    save_sync_state(sync_state)
+    exit()
 
 # Initialize counters
 shows_added = 0
 shows_skipped = 0
+shows_deleted = 0
 bands_added = 0
 bands_skipped = 0
 
@@ -124,7 +217,7 @@ default_flyer_image = "https://res.cloudinary.com/dsll3ms2c/image/upload/v173487
 # Process the events and insert them into the database
 for event in events:
     event_details = {}
-    event_name = event['summary']
+    event_name = event.get('summary', '')
 
     # Skip event if it contains any excluded word
     if is_event_excluded(event_name):
@@ -132,43 +225,11 @@ for event in events:
         continue  # Skip the rest of the loop for this event
 
     event_link = event.get('htmlLink', 'No link available')
-    start_time = event['start'].get('dateTime', event['start'].get('date'))  # Time or Date
-    start_time_parsed = None
-
-    # Try to parse the date and time to a datetime object (if available)
-    if start_time:
-        try:
-            start_time_parsed = datetime.strptime(start_time, "%Y-%m-%dT%H:%M:%S%z")  # datetime format for events
-        except ValueError as e:
-            try:
-                start_time_parsed = datetime.strptime(start_time, "%Y-%m-%d")  # Date-only format
-            except ValueError:
-                print(f"Error parsing event time: {e}")
-                continue
+    start_time_parsed = parse_start(event)
 
     # Default flyer image (if no flyer is found)
     flyer_image = default_flyer_image  # Default to the default flyer image
 
-    conn = connect_to_db()
-
-    # Update all existing events in the database with the new default flyer image if necessary
-    def update_flyer_images_with_default(new_default_image, conn):
-        try:
-            cursor = conn.cursor()
-            # Update all rows in the `shows` table with the new default flyer image
-            update_query = """
-                UPDATE shows
-                SET flyer_image = %s
-            """
-            cursor.execute(update_query, (new_default_image,))
-            conn.commit()
-            print(f"Updated {cursor.rowcount} events with the new default flyer image.")
-        except Exception as e:
-            print(f"Error updating flyer images: {e}")
-            conn.rollback()
-        finally:
-            cursor.close()
-
     # Prepare the event details for your database
     event_details = {
         'bands': event_name,  # Now using 'bands' field instead of 'event_name'
@@ -180,36 +241,35 @@ for event in events:
     # Add event details to the list
     events_data.append(event_details)
 
-# Now, insert the events into your database
-conn = connect_to_db()
-cursor = conn.cursor()
-
-# Directly assign the correct venue_id
-venue_id = 20  # Correct venue ID
-
-for event_details in events_data:
-    try:
-        # Insert or update the show
-        show_id, was_inserted = insert_show(
-            conn, cursor,
-            venue_id=venue_id,  # Use the correct venue_id directly
-            bands=event_details['bands'],  # Use 'bands' here
-            start=event_details['start_time'],
-            event_link=event_details['event_link'],
-            flyer_image=event_details['flyer_image'],  # Use the flyer image here
-        )
-        if was_inserted:
-            shows_added += 1
-        else:
-            shows_skipped += 1
-    except Exception as e:
-        print(f"Error processing event: {event_details['bands']}. Error: {e}")
-        conn.rollback()
+rows = [
+    (
+        event_details['bands'],  # Use 'bands' here
+        event_details['start_time'],
+        event_details['event_link'],
+        event_details['flyer_image'],  # Use the flyer image here
+    )
+    for event_details in events_data
+]
 
-# Commit all changes and close the connection
-conn.commit()
-cursor.close()
-conn.close()
+# Now, insert or update every show in one statement
+try:
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            venue_id = get_venue_id(cursor, "Eagles 34")
+        counts = count_statuses(upsert_shows(conn, venue_id, rows))
+        # The upserts are committed, so the new sync token must be saved even
+        # if this fails; the starts are kept and retried on the next run
+        try:
+            shows_deleted = delete_shows(conn, venue_id, removed_starts)
+        except Exception as e:
+            print(f"Could not mark {len(removed_starts)} cancelled shows deleted; retrying next run: {e}")
+            sync_state['pending_deletes'] = [start.isoformat() for start in removed_starts]
+    save_sync_state(sync_state)
+    record_fingerprint("Eagles 34", fingerprint)
+    shows_added = counts['inserted']
+    shows_skipped = counts['updated'] + counts['unchanged']
+except Exception as e:
+    print(f"Error processing events: {e}")
 
 # Print summary
-print(f"Events processed. Added: {shows_added}, Updated: {shows_skipped}.")
\ No newline at end of file
+print(f"Events processed. Added: {shows_added}, Updated: {shows_skipped}, Deleted: {shows_deleted}.")
\ No newline at end of file
@@ -0,0 +1,223 @@
+import asyncio
+import atexit
+import os
+import random
+import threading
+from urllib.parse import urlsplit
+
+import httpx
+import run_stats
+from parsing import make_soup
+from http_cache import HTTP_CACHE_ENABLED, HttpCache
+
+try:
+    import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+# Fetch settings, overridable from the environment
+FETCH_PER_HOST = int(os.getenv('FETCH_PER_HOST', '6'))  # concurrent requests per host
+FETCH_RETRIES = int(os.getenv('FETCH_RETRIES', '3'))
+FETCH_BACKOFF = float(os.getenv('FETCH_BACKOFF', '1.0'))  # seconds, doubled on each retry
+FETCH_TIMEOUT = float(os.getenv('FETCH_TIMEOUT', '30'))
+
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Parsed pages for this run, keyed by (url, strainer), so a URL is downloaded and parsed at most once
+_documents = {}
+
+# URLs whose body is the same version a previous run already processed
+_unchanged = set()
+
+_cache = None
+
+def get_cache():
+    """Return the on-disk HTTP cache, or None when it is disabled."""
+    global _cache
+    if _cache is None and HTTP_CACHE_ENABLED:
+        _cache = HttpCache()
+        atexit.register(_cache.prune)
+    return _cache
+
+# One event loop (on its own thread) and one client for the whole process, so
+# a scraper's sequential fetch() calls reuse the connections earlier ones opened
+_loop = None
+_loop_lock = threading.Lock()
+_async_client = None
+_semaphores = {}  # host -> semaphore, only touched on the loop thread
+
+def _client():
+    return httpx.AsyncClient(
+        http2=HTTP2,
+        timeout=FETCH_TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=FETCH_PER_HOST * 4, max_keepalive_connections=FETCH_PER_HOST * 4),
+    )
+
+def _shared_client():
+    """The process-wide client; only call this from the loop thread."""
+    global _async_client
+    if _async_client is None:
+        _async_client = _client()
+    return _async_client
+
+def _run(coro):
+    """Run a coroutine on the fetch loop, starting it on first use, and wait for its result."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="fetch-loop", daemon=True).start()
+            atexit.register(_close_loop)
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+def _close_loop():
+    global _loop, _async_client
+    with _loop_lock:
+        if _loop is None:
+            return
+        if _async_client is not None:
+            asyncio.run_coroutine_threadsafe(_async_client.aclose(), _loop).result()
+            _async_client = None
+        _loop.call_soon_threadsafe(_loop.stop)
+        _loop = None
+
+def _retry_delay(attempt, response=None):
+    retry_after = response.headers.get('Retry-After') if response is not None else None
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return FETCH_BACKOFF * 2 ** attempt + random.uniform(0, FETCH_BACKOFF)
+
+def _through_cache(url, response, cached):
+    """
+    Reconcile a response with the disk cache. A 304 is answered with the stored
+    body; either way the response gets a `not_modified` flag that is True when
+    a previous run already processed exactly this body.
+    """
+    cache = get_cache()
+    response.not_modified = False
+    if cache is None:
+        return response
+
+    if response.status_code == 304 and cached:
+        run_stats.incr("http_cache_hits")
+        body = cache.body(url)
+        response = httpx.Response(200, headers=cached["headers"], content=body, request=response.request)
+        response.not_modified = cached["processed"]
+    elif response.status_code == 200:
+        meta, changed = cache.store(url, response.status_code, response.headers, response.content)
+        run_stats.incr("http_cache_misses" if changed else "http_cache_hits")
+        response.not_modified = meta["processed"]
+    else:
+        return response
+
+    if response.not_modified:
+        _unchanged.add(url)
+    return response
+
+async def _fetch(client, url):
+    """GET one URL, retrying transport errors and retryable statuses with backoff."""
+    semaphore = _semaphores.setdefault(urlsplit(url).netloc, asyncio.Semaphore(FETCH_PER_HOST))
+    cache = get_cache()
+    cached = cache.lookup(url) if cache else None
+    headers = cache.validators(cached) if cache else {}
+    for attempt in range(FETCH_RETRIES + 1):
+        response = None
+        try:
+            async with semaphore:
+                response = await client.get(url, headers=headers)
+            if response.status_code not in RETRY_STATUSES or attempt == FETCH_RETRIES:
+                return _through_cache(url, response, cached)
+            reason = f"status {response.status_code}"
+        except httpx.TransportError as e:
+            if attempt == FETCH_RETRIES:
+                raise
+            reason = str(e) or type(e).__name__
+
+        delay = _retry_delay(attempt, response)
+        print(f"Retrying {url} in {delay:.1f}s ({reason})")
+        await asyncio.sleep(delay)
+
+async def fetch_all_async(urls):
+    """Fetch every URL concurrently over shared keep-alive connections."""
+    urls = list(dict.fromkeys(urls))
+    client = _shared_client()
+    responses = await asyncio.gather(
+        *(_fetch(client, url) for url in urls),
+        return_exceptions=True,
+    )
+
+    results = {}
+    for url, response in zip(urls, responses):
+        if isinstance(response, Exception):
+            print(f"Failed to fetch {url}: {response}")
+            response = None
+        results[url] = response
+    return results
+
+def fetch_all(urls):
+    """
+    Fetch URLs concurrently. Returns {url: response}, with None for URLs that
+    could not be fetched. Each response carries the cache's `not_modified` flag.
+    """
+    return _run(fetch_all_async(urls))
+
+def fetch(url):
+    """Fetch a single URL with retries; transport errors are raised."""
+    async def run():
+        return await _fetch(_shared_client(), url)
+    return _run(run())
+
+def fetch_text(url):
+    """Fetch a URL and return its body, raising on an error status."""
+    response = fetch(url)
+    response.raise_for_status()
+    return response.text
+
+def unchanged(url):
+    """True if the last fetch of `url` returned a body a previous run already processed."""
+    return url in _unchanged
+
+def mark_processed(*urls):
+    """Record that the current version of these pages is in the database, so the next run can skip them."""
+    cache = get_cache()
+    if cache is not None:
+        for url in urls:
+            cache.mark_processed(url)
+
+def get_soup(url, skip_unchanged=False, parse_only=None):
+    """
+    Return the parsed page at `url`, fetching it only the first time it is asked
+    for. With skip_unchanged, returns None instead of parsing an unchanged page.
+    `parse_only` is a strainer limiting the parse to part of the page.
+    """
+    key = (url, parse_only)
+    if key not in _documents:
+        response = fetch(url)
+        response.raise_for_status()
+        if skip_unchanged and response.not_modified:
+            return None
+        _documents[key] = make_soup(response.content, parse_only)
+    return _documents[key]
+
+def fetch_soups(urls, skip_unchanged=False, parse_only=None):
+    """
+    Fetch and parse many pages concurrently. Returns {url: soup}, with None for
+    pages that failed (or, with skip_unchanged, were unchanged; see unchanged()).
+    `parse_only` is a strainer limiting each parse to part of the page.
+    Parsed pages are cached for the rest of the run.
+    """
+    missing = [url for url in dict.fromkeys(urls) if (url, parse_only) not in _documents]
+    if missing:
+        for url, response in fetch_all(missing).items():
+            if response is None:
+                continue
+            if response.status_code != 200:
+                print(f"Failed to retrieve {url}. Status code: {response.status_code}")
+                continue
+            if skip_unchanged and response.not_modified:
+                continue
+            _documents[(url, parse_only)] = make_soup(response.content, parse_only)
+    return {url: _documents.get((url, parse_only)) for url in urls}
@@ -0,0 +1,115 @@
+import html
+import os
+from datetime import datetime
+from urllib.parse import urljoin
+
+import httpx
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+import run_stats
+from browser_pool import open_browser
+from dates import VENUE_TIMEZONE
+from fetch import fetch
+from parsing import make_soup
+
+BROWSER_WAIT = int(os.getenv('BROWSER_WAIT', '20'))  # seconds to wait for a selector when rendering
+
+def _get(url):
+    try:
+        return fetch(url)
+    except httpx.HTTPError as e:
+        print(f"HTTP request for {url} failed: {e}")
+        return None
+
+def load_page(url, selector, timeout=BROWSER_WAIT, parse_only=None):
+    """
+    Return (html, soup) for a page, using plain HTTP when the CSS `selector`
+    is already in the server response and a pooled browser only when it isn't.
+    Returns (None, None) if neither produces the selector. A `parse_only`
+    strainer must keep the elements `selector` matches.
+    """
+    response = _get(url)
+    if response is not None and response.status_code == 200:
+        soup = make_soup(response.text, parse_only)
+        if soup.select_one(selector) is not None:
+            print(f"Loaded {url} over HTTP.")
+            run_stats.incr("pages_http")
+            return response.text, soup
+
+    print(f"'{selector}' not in the server HTML for {url}; rendering it in the browser.")
+    browser = open_browser()
+    try:
+        browser.get(url)
+        WebDriverWait(browser, timeout).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+        )
+        page_source = browser.page_source
+    except TimeoutException:
+        print(f"'{selector}' never appeared on {url}.")
+        return None, None
+    finally:
+        browser.quit()
+    run_stats.incr("pages_browser")
+    return page_source, make_soup(page_source, parse_only)
+
+def _json(url):
+    response = _get(url)
+    if response is None or response.status_code != 200 or 'json' not in response.headers.get('content-type', ''):
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+def squarespace_events(collection_url):
+    """
+    Upcoming events from a Squarespace events collection's ?format=json view,
+    as dicts with title, start, event_link and flyer_image. Returns None when
+    the site doesn't serve the JSON view, so callers can fall back to HTML.
+    """
+    separator = '&' if '?' in collection_url else '?'
+    data = _json(f"{collection_url}{separator}format=json")
+    if not isinstance(data, dict) or "upcoming" not in data:
+        return None
+
+    events = []
+    for item in data["upcoming"]:
+        start = item.get("startDate")
+        events.append({
+            "title": html.unescape(item.get("title", "")).strip(),
+            # startDate is epoch milliseconds; shows are stored in venue-local time
+            "start": datetime.fromtimestamp(start / 1000, VENUE_TIMEZONE).replace(tzinfo=None) if start else None,
+            "event_link": urljoin(collection_url, item["fullUrl"]) if item.get("fullUrl") else None,
+            "flyer_image": item.get("assetUrl") or None,
+        })
+    run_stats.incr("pages_json")
+    return events
+
+def tribe_events(site_url, per_page=50):
+    """
+    Upcoming events from The Events Calendar (WordPress) REST API, as dicts
+    with title, start, event_link and flyer_image. Returns None when the API
+    isn't available, so callers can fall back to HTML.
+    """
+    url = f"{site_url.rstrip('/')}/wp-json/tribe/events/v1/events?per_page={per_page}"
+    events = []
+    while url:
+        data = _json(url)
+        if not isinstance(data, dict) or "events" not in data:
+            # Only give up on the API if its first page is missing
+            return events or None
+        for item in data["events"]:
+            image = item.get("image") or {}
+            events.append({
+                "title": html.unescape(item.get("title", "")).strip(),
+                # start_date is already in the site's local time
+                "start": datetime.strptime(item["start_date"], "%Y-%m-%d %H:%M:%S") if item.get("start_date") else None,
+                "event_link": item.get("url"),
+                "flyer_image": image.get("url") or None,
+            })
+        url = data.get("next_rest_url")
+        run_stats.incr("pages_json")
+    return events
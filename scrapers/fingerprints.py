@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+import run_stats
+
+# Fingerprint settings, overridable from the environment
+FINGERPRINTS_ENABLED = os.getenv('FINGERPRINTS', '1') != '0'
+FINGERPRINT_DIR = Path(os.getenv('FINGERPRINT_DIR', Path(__file__).parent / '.fingerprints'))
+FINGERPRINT_MAX_AGE = int(os.getenv('FINGERPRINT_MAX_AGE', str(7 * 24 * 3600)))  # seconds; force a full run at least this often
+
+# Markup that changes on every request without the events changing
+VOLATILE_HTML = [
+    re.compile(r'<script\b.*?</script\s*>', re.IGNORECASE | re.DOTALL),
+    re.compile(r'<style\b.*?</style\s*>', re.IGNORECASE | re.DOTALL),
+    re.compile(r'<noscript\b.*?</noscript\s*>', re.IGNORECASE | re.DOTALL),
+    re.compile(r'<!--.*?-->', re.DOTALL),
+    re.compile(r'\s(?:nonce|integrity|data-[\w-]*(?:token|nonce|crumb)[\w-]*)="[^"]*"', re.IGNORECASE),
+    re.compile(r'<meta\b[^>]*name="csrf[^"]*"[^>]*>', re.IGNORECASE),
+]
+WHITESPACE = re.compile(r'\s+')
+BETWEEN_TAGS = re.compile(r'>\s+<')
+
+ICS_FOLDED_LINE = re.compile(r'\r?\n[ \t]')
+ICS_EVENT = re.compile(r'BEGIN:VEVENT\r?\n.*?END:VEVENT', re.DOTALL)
+# DTSTAMP is the time the feed was generated, so it differs on every download
+ICS_VOLATILE_LINE = re.compile(r'^DTSTAMP[;:].*$', re.MULTILINE)
+
+def _digest(text):
+    return hashlib.sha256(text.encode()).hexdigest()
+
+def html_fingerprint(markup):
+    """Hash of a page's markup with scripts, styles, comments, nonces and whitespace runs removed."""
+    for pattern in VOLATILE_HTML:
+        markup = pattern.sub('', markup)
+    return _digest(WHITESPACE.sub(' ', BETWEEN_TAGS.sub('><', markup)).strip())
+
+def ics_fingerprint(ics_text):
+    """Hash of an ICS feed's VEVENT blocks, ignoring DTSTAMP and event order."""
+    unfolded = ICS_FOLDED_LINE.sub('', ics_text)
+    events = sorted(ICS_VOLATILE_LINE.sub('', block).strip() for block in ICS_EVENT.findall(unfolded))
+    return _digest('\n'.join(events))
+
+def gcal_fingerprint(etag, events):
+    """
+    Google Calendar's list etag changes whenever any event does; the event ids
+    catch events moving into or out of the requested time window.
+    """
+    if not etag:
+        return None
+    return _digest(etag + '\n' + '\n'.join(sorted(event['id'] for event in events)))
+
+def _path(venue):
+    slug = re.sub(r'[^a-z0-9]+', '-', venue.lower()).strip('-')
+    return FINGERPRINT_DIR / f"{slug}.json"
+
+def is_unchanged(venue, fingerprint):
+    """
+    True when `fingerprint` matches the one recorded after the venue's last
+    successful run, and that run is recent enough to trust.
+    """
+    if not FINGERPRINTS_ENABLED or not fingerprint:
+        return False
+    try:
+        stored = json.loads(_path(venue).read_text())
+    except (OSError, ValueError):
+        return False
+    if stored.get("fingerprint") != fingerprint or time.time() - stored.get("recorded_at", 0) > FINGERPRINT_MAX_AGE:
+        return False
+    run_stats.incr("fingerprint_unchanged")
+    return True
+
+def record_fingerprint(venue, fingerprint):
+    """Remember `fingerprint` for the venue. Call only after its shows are committed."""
+    if not FINGERPRINTS_ENABLED or not fingerprint:
+        return
+    FINGERPRINT_DIR.mkdir(parents=True, exist_ok=True)
+    path = _path(venue)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(json.dumps({"venue": venue, "fingerprint": fingerprint, "recorded_at": time.time()}))
+    os.replace(tmp_path, path)
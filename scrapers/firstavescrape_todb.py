@@ -1,41 +1,31 @@
-import requests
 import json
-from bs4 import BeautifulSoup
 from datetime import datetime
-from db_utils import connect_to_db, get_venue_id, insert_show
+from fetch import fetch_soups, unchanged, mark_processed
+from parsing import only
+from normalize import to_24_hour
+from dates import DateResolver, upcoming_months
+from db_utils import get_connection, release_connection, get_venue_id, upsert_shows, count_statuses
 
 # Database connection
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
-# Counters for added and skipped events
+# Counters for added, updated and unchanged events
 added_count = 0
+updated_count = 0
 skipped_count = 0
 
-# Function to convert time to 24-hour format
-def convert_time_to_24_hour_format(time_str):
-    try:
-        if 'AM' in time_str or 'PM' in time_str:
-            time_str = time_str.strip().upper()
-            if ':' in time_str:
-                hour, minute = time_str[:-2].split(':')
-            else:
-                hour = time_str[:-2]
-                minute = '00'
-            hour = int(hour) % 12
-            if 'PM' in time_str:
-                hour += 12
-            return f"{hour:02}:{minute}"
-        return '00:00'
-    except Exception as e:
-        print(f"Error converting time '{time_str}': {e}")
-        return '00:00'
-
-def get_event_details(event_url):
-    print(f"Fetching event details from: {event_url}")
-    response = requests.get(event_url)
-    if response.status_code == 200:
-        event_soup = BeautifulSoup(response.content, 'html.parser')
+# Listing dates are "Dec 12"; the year is inferred
+DATES = DateResolver("First Avenue", ["%b %d"])
+
+# Shows collected across every month, grouped by venue (First Avenue lists several rooms)
+shows_by_venue = {}
+# Event pages behind those shows, marked as processed once their venue is saved
+event_urls_by_venue = {}
+
+def get_event_details(event_url, event_soup):
+    print(f"Reading event details from: {event_url}")
+    if event_soup is not None:
         show_details = event_soup.find('div', class_='show_details text-center')
         event_time = None
         age_restriction = None
@@ -48,7 +38,7 @@ def get_event_details(event_url):
                     if "Show Starts" in header_text:
                         time_tag = item.find('h2')
                         event_time = (
-                            convert_time_to_24_hour_format(time_tag.get_text(strip=True))
+                            to_24_hour(time_tag.get_text(strip=True)) or '00:00'
                             if time_tag else '00:00'
                         )
             
@@ -65,7 +55,7 @@ def get_event_details(event_url):
 
         return event_time, age_restriction, flyer_image
     else:
-        print(f"Failed to fetch event details from {event_url}. Status code: {response.status_code}")
+        print(f"No event page available for {event_url}")
         return None, None, None
 
 # Function to fetch and extract social media links for a specific band
@@ -91,13 +81,11 @@ def get_links_for_band(band_element):
     return links
 
 # Function to get band names from the event page
-def get_bands_from_event_page(event_url):
+def get_bands_from_event_page(event_url, event_soup):
     bands = []
-    print(f"Fetching band names from: {event_url}")
-    response = requests.get(event_url)
+    print(f"Reading band names from: {event_url}")
 
-    if response.status_code == 200:
-        event_soup = BeautifulSoup(response.content, 'html.parser')
+    if event_soup is not None:
         performer_items = event_soup.find_all('div', class_='performer_list_item')
 
         for item in performer_items:
@@ -109,95 +97,120 @@ def get_bands_from_event_page(event_url):
                     bands.append(band_name)
                     print(f"Band found: {band_name}")
     else:
-        print(f"Failed to retrieve band data from {event_url}. Status code: {response.status_code}")
+        print(f"No band data available for {event_url}")
 
     return bands
 
-# Function to fetch and process events from the given URL
-def fetch_and_process_events(url):
-    global added_count, skipped_count
-
-    print(f"Sending request to {url}...")
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        print("Request successful. Parsing shows...")
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        for show in soup.find_all('div', class_='show_list_item'):
-            date_container = show.find('div', class_='date_container')
-            month = date_container.find(class_='month').get_text(strip=True) if date_container.find(class_='month') else 'N/A'
-            day = date_container.find(class_='day').get_text(strip=True) if date_container.find(class_='day') else 'N/A'
-
-            month_mapping = {
-                "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04", "May": "05",
-                "Jun": "06", "Jul": "07", "Aug": "08", "Sep": "09", "Oct": "10",
-                "Nov": "11", "Dec": "12"
-            }
-            month_number = month_mapping.get(month, "N/A")
-            year = 2024 if month_number in ["11", "12"] else 2025
-
-            event_date = f"{year}-{month_number}-{int(day):02d}"
-            print(f"Extracted date: {event_date}")
-
-            venue_name = show.find('div', class_='venue_name').get_text(strip=True) if show.find('div', class_='venue_name') else 'N/A'
-            venue_id = get_venue_id(cursor, venue_name)
-
-            event_link = show.find('a')['href'] if show.find('a') else None
-            event_url = event_link if event_link and event_link.startswith('http') else f"https://first-avenue.com{event_link}" if event_link else 'N/A'
-
-            event_time, flyer_image = get_event_details(event_url)
-            try:
-                start_datetime = datetime.strptime(f"{event_date} {event_time}", "%Y-%m-%d %H:%M")
-                print(f"Combined start datetime: {start_datetime}")
-            except ValueError as e:
-                print(f"Error combining date and time: {e}")
-                start_datetime = None
-
-            # Extract band names from the event page
-            band_names = get_bands_from_event_page(event_url)
-            bands = ", ".join(band_names)
-
-            # Insert the show into the database
-            try:
-                show_id, was_inserted = insert_show(conn, cursor, venue_id, bands, start_datetime, event_link, flyer_image)
-
-                if was_inserted:
-                    added_count += 1
-                else:
-                    skipped_count += 1
-
-                print(f"Processed show ID: {show_id} (New: {was_inserted})")
-
-            except Exception as e:
-                print(f"Error processing show at {event_link}: {e}")
-
-        conn.commit()  # Commit after processing all shows for the current URL
-
-    else:
-        print(f"Failed to retrieve data from {url}. Status code: {response.status_code}")
-
-# List of URLs for different months
+# Function to collect the shows listed on one month's page
+def parse_listing_page(soup):
+    listings = []
+    date_texts = []
+    for show in soup.find_all('div', class_='show_list_item'):
+        date_container = show.find('div', class_='date_container')
+        month = date_container.find(class_='month').get_text(strip=True) if date_container.find(class_='month') else 'N/A'
+        day = date_container.find(class_='day').get_text(strip=True) if date_container.find(class_='day') else 'N/A'
+        date_texts.append(f"{month} {day}")
+
+        venue_name = show.find('div', class_='venue_name').get_text(strip=True) if show.find('div', class_='venue_name') else 'N/A'
+        venue_id = get_venue_id(cursor, venue_name)
+
+        event_link = show.find('a')['href'] if show.find('a') else None
+        event_url = event_link if event_link and event_link.startswith('http') else f"https://first-avenue.com{event_link}" if event_link else 'N/A'
+
+        listings.append((venue_id, event_link, event_url))
+
+    # Resolve the page's dates in one batch; the year is inferred from today
+    event_dates = [f"{d:%Y-%m-%d}" if d else None for d in DATES.parse_all(date_texts)]
+    for event_date in event_dates:
+        print(f"Extracted date: {event_date}")
+    return [(venue_id, event_date, event_link, event_url)
+            for (venue_id, event_link, event_url), event_date in zip(listings, event_dates)]
+
+# Function to build a show from its event page, parsed once for both details and bands
+def process_event(venue_id, event_date, event_link, event_url, event_soup):
+    event_time, age_restriction, flyer_image = get_event_details(event_url, event_soup)
+    try:
+        start_datetime = datetime.strptime(f"{event_date} {event_time}", "%Y-%m-%d %H:%M")
+        print(f"Combined start datetime: {start_datetime}")
+    except (TypeError, ValueError) as e:
+        print(f"Error combining date and time: {e}")
+        start_datetime = None
+
+    # Extract band names from the event page
+    band_names = get_bands_from_event_page(event_url, event_soup)
+    bands = ", ".join(band_names)
+
+    # Queue the show for the bulk upsert
+    shows_by_venue.setdefault(venue_id, []).append((bands, start_datetime, event_link, flyer_image))
+    if event_soup is not None:
+        event_urls_by_venue.setdefault(venue_id, []).append(event_url)
+
+# Only the parts of each page the parsers above read
+LISTING_ITEMS = only('show_list_item', tags='div')
+EVENT_SECTIONS = only('show_details', 'gig_poster', 'performer_list_item')
+
+# Listing pages for this month and the six after it
 urls = [
-    'https://first-avenue.com/shows/?post_type=event&start_date=20250201',  # URL for February
-    'https://first-avenue.com/shows/?post_type=event&start_date=20250301',  # URL for March
-    'https://first-avenue.com/shows/?post_type=event&start_date=20250401',  # URL for April
-    'https://first-avenue.com/shows/?post_type=event&start_date=20250501',  # URL for May
-    'https://first-avenue.com/shows/?post_type=event&start_date=20250601',  # URL for June
-    'https://first-avenue.com/shows/?post_type=event&start_date=20250701',  # URL for July
-    'https://first-avenue.com/shows/?post_type=event&start_date=20250801',  # URL for August
+    f'https://first-avenue.com/shows/?post_type=event&start_date={month:%Y%m%d}'
+    for month in upcoming_months(7)
 ]
 
-# Process each URL
-for url in urls:
+# Fetch every month's listing page at once
+print(f"Sending requests for {len(urls)} listing pages...")
+listings = []
+failed = False
+for url, soup in fetch_soups(urls, parse_only=LISTING_ITEMS).items():
+    if soup is None:
+        print(f"Failed to retrieve data from {url}.")
+        failed = True
+        continue
     try:
-        fetch_and_process_events(url)
+        print(f"Parsing shows from {url}...")
+        listings.extend((url, *listing) for listing in parse_listing_page(soup))
     except Exception as e:
         print(f"Error processing URL {url}: {e}")
         conn.rollback()  # Rollback if any error occurs
+        failed = True
+
+# Then every event page, sharing connections to first-avenue.com. Pages listed on an
+# unchanged month only need parsing if the event page itself changed.
+event_urls = {listing[-1] for listing in listings if listing[-1] != 'N/A'}
+must_parse = {listing[-1] for listing in listings if not unchanged(listing[0])}
+print(f"Fetching {len(event_urls)} event pages...")
+event_soups = fetch_soups(event_urls - must_parse, skip_unchanged=True, parse_only=EVENT_SECTIONS)
+event_soups.update(fetch_soups(event_urls & must_parse, parse_only=EVENT_SECTIONS))
+
+for listing_url, venue_id, event_date, event_link, event_url in listings:
+    if unchanged(listing_url) and unchanged(event_url):
+        # Same listing and event page as a run that already saved this show
+        skipped_count += 1
+        continue
+    try:
+        process_event(venue_id, event_date, event_link, event_url, event_soups.get(event_url))
+    except Exception as e:
+        print(f"Error processing event {event_url}: {e}")
+
+# Insert or update every collected show, one statement per venue
+for venue_id, rows in shows_by_venue.items():
+    try:
+        results = upsert_shows(conn, venue_id, rows)
+    except Exception as e:
+        print(f"Error processing shows for venue_id {venue_id}: {e}")
+        failed = True
+        continue
+
+    mark_processed(*event_urls_by_venue.get(venue_id, []))
+    counts = count_statuses(results)
+    added_count += counts['inserted']
+    updated_count += counts['updated']
+    skipped_count += counts['unchanged']
+
+# Listing pages only count as processed when every show on them was saved
+if not failed:
+    mark_processed(*urls)
 
 # Close the database connection
 cursor.close()
-conn.close()
+release_connection(conn)
 
-print(f"All events processed. Added: {added_count}, Skipped: {skipped_count}.")
\ No newline at end of file
+print(f"All events processed. Added: {added_count}, Updated: {updated_count}, Skipped: {skipped_count}.")
\ No newline at end of file
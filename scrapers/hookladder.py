@@ -1,19 +1,19 @@
 import re
 from datetime import datetime
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-from db_utils import connect_to_db, insert_show, get_venue_id
-
-# Initialize WebDriver
-driver = webdriver.Chrome()
+from fetch_strategy import load_page, tribe_events
+from ics_venues import sync_ics_venue
+from normalize import join_bands, split_bands
+from db_utils import get_connection, release_connection, upsert_shows, count_statuses, get_venue_id
+
+# The iCal feed is the cheapest source (conditional GET, nothing to render);
+# only scrape the events API or list pages when it can't be read
+if sync_ics_venue("Hook & Ladder") is not None:
+    exit()
+
 base_url = 'https://thehookmpls.com/upcoming-events/'
-driver.get(base_url)
 
 # Connect to the database
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
 # Get venue ID for "The Hook and Ladder"
@@ -21,7 +21,7 @@ try:
     venue_id = get_venue_id(cursor, "Hook & Ladder")
 except ValueError as e:
     print(e)
-    conn.close()
+    release_connection(conn)
     exit()
 
 # Counters for added, updated, and skipped events
@@ -29,9 +29,11 @@ added_count = 0
 updated_count = 0
 duplicate_count = 0
 
+# Shows collected across every page, upserted once at the end
+rows = []
+
 # Function to process a page of events
 def process_event_page(soup):
-    global added_count, updated_count, duplicate_count
 
     # Find all event rows
     event_rows = soup.find_all(class_='tribe-events-calendar-list__event-row')
@@ -62,7 +64,7 @@ def process_event_page(soup):
         # Extract bands (split and clean band names)
         bands = []
         if event_name:
-            bands = [band.strip() for band in re.split(r',|\band\b|\bwith\b|\b&\b', event_name, flags=re.IGNORECASE) if band.strip()]
+            bands = split_bands(event_name, "Hook & Ladder")
 
         # Extract flyer image
         flyer_section = event.find('div', class_='col medium-7 small-12 large-7')
@@ -84,57 +86,56 @@ def process_event_page(soup):
         if not flyer_image:
             flyer_image = None
 
-        # Clean and join bands into a comma-separated string
-        bands = list(dict.fromkeys(bands))  # Remove duplicates
-        bands_str = ", ".join(bands)
+        # Join bands into a comma-separated string
+        bands_str = join_bands(bands)
 
         # Log extracted data
         print(f"Event: {event_name}, Bands: {bands_str}, Start: {start}, Link: {event_link}, Flyer: {flyer_image}")
 
-        # Process the show
-        try:
-            show_id, was_inserted = insert_show(conn, cursor, venue_id, bands_str, start, event_link, flyer_image)
-            if was_inserted:
-                added_count += 1
-                print(f"Inserted event: {event_name} on {start}")
-            else:
-                if flyer_image:
-                    updated_count += 1
-                    print(f"Updated event with flyer: {event_name} on {start}")
-                else:
-                    duplicate_count += 1
-                    print(f"Duplicate event found (no update needed): {event_name} on {start}")
-        except Exception as e:
-            print(f"Error processing event: {event_name}. Error: {e}")
-            conn.rollback()
-            continue
+        rows.append((bands_str, start, event_link, flyer_image))
 
-# Process all pages
-while True:
-    # Parse the current page
-    soup = BeautifulSoup(driver.page_source, 'html.parser')
-    process_event_page(soup)
-
-    # Check for the "Next Events" link
-    next_link = soup.find('a', class_='tribe-events-c-nav__next')
-    if next_link and next_link.has_attr('href'):
-        next_page_url = next_link['href']
-        print(f"Moving to next page: {next_page_url}")
-        driver.get(next_page_url)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CLASS_NAME, 'tribe-events-calendar-list__event-row'))
-        )
-    else:
-        print("No more pages to process.")
-        break
-
-# Commit all changes to the database
-conn.commit()
+# The Events Calendar's REST API lists every upcoming event without rendering
+# the list view; fall back to walking the HTML pages when it's unavailable
+api_events = tribe_events("https://thehookmpls.com")
+if api_events is not None:
+    print(f"Loaded {len(api_events)} events from the events API.")
+    for event in api_events:
+        if event['start'] is None:
+            print(f"Missing start time for event '{event['title']}'")
+            continue
+        bands_str = join_bands(split_bands(event['title'], "Hook & Ladder"))
+        rows.append((bands_str, event['start'], event['event_link'], event['flyer_image']))
+else:
+    page_url = base_url
+    while page_url:
+        # Parse the current page
+        page_source, soup = load_page(page_url, ".tribe-events-calendar-list__event-row", timeout=10)
+        if soup is None:
+            print(f"No events found on {page_url}")
+            break
+        process_event_page(soup)
+
+        # Check for the "Next Events" link
+        next_link = soup.find('a', class_='tribe-events-c-nav__next')
+        if next_link and next_link.has_attr('href'):
+            page_url = next_link['href']
+            print(f"Moving to next page: {page_url}")
+        else:
+            print("No more pages to process.")
+            page_url = None
+
+# Insert or update every show in one statement
+try:
+    counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    added_count = counts['inserted']
+    updated_count = counts['updated']
+    duplicate_count = counts['unchanged']
+except Exception as e:
+    print(f"Error processing events: {e}")
 
 # Close the database connection
 cursor.close()
-conn.close()
-driver.quit()
+release_connection(conn)
 
 # Print summary of added, updated, and skipped events
 print(f"All events processed. Added: {added_count}, Updated: {updated_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
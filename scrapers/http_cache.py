@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+# Cache settings, overridable from the environment
+HTTP_CACHE_ENABLED = os.getenv('HTTP_CACHE', '1') != '0'
+HTTP_CACHE_DIR = Path(os.getenv('HTTP_CACHE_DIR', Path(__file__).parent / '.http_cache'))
+HTTP_CACHE_TTL = int(os.getenv('HTTP_CACHE_TTL', str(7 * 24 * 3600)))  # seconds before a body is re-downloaded unconditionally
+HTTP_CACHE_MAX_BYTES = int(os.getenv('HTTP_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Response headers kept with the body so a 304 can be answered from disk
+KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+class HttpCache:
+    """
+    On-disk cache of response bodies keyed by URL. Each entry is a .body file
+    plus a .json file holding the validators (ETag / Last-Modified), a hash of
+    the body and whether a scraper has finished processing that version.
+    """
+
+    def __init__(self, directory=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / f"{key}.json", self.directory / f"{key}.body"
+
+    def _write_meta(self, meta_path, meta):
+        tmp_path = meta_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(meta))
+        os.replace(tmp_path, meta_path)
+
+    def lookup(self, url):
+        """Return the stored entry for `url`, or None if there is none or it has expired."""
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if not body_path.exists() or time.time() - meta.get("stored_at", 0) > self.ttl:
+            self.delete(url)
+            return None
+        return meta
+
+    def validators(self, meta):
+        """Conditional request headers for a stored entry."""
+        headers = {}
+        if meta:
+            if meta["headers"].get("etag"):
+                headers["If-None-Match"] = meta["headers"]["etag"]
+            if meta["headers"].get("last-modified"):
+                headers["If-Modified-Since"] = meta["headers"]["last-modified"]
+        return headers
+
+    def body(self, url):
+        _, body_path = self._paths(url)
+        body = body_path.read_bytes()
+        os.utime(body_path)  # mark as recently used for eviction
+        return body
+
+    def store(self, url, status_code, headers, content):
+        """
+        Save a freshly downloaded body. Returns the entry and whether the body
+        differs from the stored one; an identical body keeps its processed flag.
+        """
+        meta_path, body_path = self._paths(url)
+        content_hash = hashlib.sha256(content).hexdigest()
+        previous = self.lookup(url)
+        changed = previous is None or previous["content_hash"] != content_hash
+
+        meta = {
+            "url": url,
+            "status_code": status_code,
+            "headers": {name: headers[name] for name in KEPT_HEADERS if name in headers},
+            "content_hash": content_hash,
+            "stored_at": time.time() if changed else previous["stored_at"],
+            "processed": False if changed else previous["processed"],
+        }
+        if changed:
+            tmp_path = body_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, body_path)
+        else:
+            os.utime(body_path)
+        self._write_meta(meta_path, meta)
+        return meta, changed
+
+    def mark_processed(self, url):
+        """Record that the stored version of `url` made it into the database."""
+        meta_path, _ = self._paths(url)
+        meta = self.lookup(url)
+        if meta and not meta["processed"]:
+            meta["processed"] = True
+            self._write_meta(meta_path, meta)
+
+    def delete(self, url):
+        for path in self._paths(url):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Evict least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for body_path in self.directory.glob("*.body"):
+            meta_path = body_path.with_suffix(".json")
+            try:
+                stat = body_path.stat()
+                size = stat.st_size + (meta_path.stat().st_size if meta_path.exists() else 0)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, size, body_path, meta_path))
+            total += size
+
+        for _, size, body_path, meta_path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
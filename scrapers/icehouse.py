@@ -1,46 +1,45 @@
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
 import re
-from db_utils import connect_to_db, get_venue_id, insert_show
+import sys
+import run_stats
+from fetch import fetch, mark_processed
+from parsing import make_soup, only
+from normalize import split_bands
+from dates import DateResolver
+from fingerprints import html_fingerprint, is_unchanged, record_fingerprint
+from db_utils import get_connection, release_connection, get_venue_id, upsert_shows, count_statuses
 
 # URL of the new venue's event page
 venue_url = "https://icehouse.turntabletickets.com/"
 
 DEFAULT_IMAGE_URL = "https://icehouse.turntabletickets.com/default_image.jpg"  # Update as needed
 
-# Fetch the HTML content of the venue page
-response = requests.get(venue_url)
-response.raise_for_status()  # Check if the download was successful
-html_content = response.text
-soup = BeautifulSoup(html_content, 'html.parser')
+DATES = DateResolver("Icehouse", ["%a, %b %d %I:%M%p", "%a, %b %d %I%p"])
 
-# Connect to the PostgreSQL database
-conn = connect_to_db()
+# Fetch the venue page and only parse it if the events could have changed
+response = fetch(venue_url)
+response.raise_for_status()  # Check if the download was successful
+fingerprint = html_fingerprint(response.text)
+if response.not_modified or is_unchanged("Icehouse", fingerprint):
+    print("Icehouse page unchanged since the last run; nothing to do.")
+    sys.exit(0)
+soup = make_soup(response.content, only('details', tags='div'))
+
+# Borrow a pooled connection to the PostgreSQL database
+conn = get_connection()
 cursor = conn.cursor()
 
 # Counters for tracking results
 show_count = 0
 inserted_shows = 0
 skipped_shows = 0
-band_count = 0
-inserted_bands = 0
-linked_bands = 0
 
 try:
     # Get the venue ID for "Icehouse"
     venue_id = get_venue_id(cursor, "Icehouse")
 
-    def split_band_names(band_string):
-        # First, handle the case of "Brunch with"
-        band_string = band_string.replace("Brunch with", "").strip()  # Remove "Brunch with"
+    # Shows to upsert once the whole page has been parsed
+    rows = []
 
-        # Now, handle "w/", "and", "&", and "+" as separators between bands
-        bands = re.split(r'\s+(w/|and|\+|\&)\s+', band_string)  # Split by these separators with optional spaces around them
-        
-        # Clean up extra spaces around each band name
-        return [b.strip() for b in bands if b.strip() and b.strip().lower() not in ['w/', 'and', '+', '&', 'with']]  # Clean unwanted separators
-    
     # Loop through each event on the page
     events = soup.find_all('div', class_="details flex flex-col gap-2 md:flex-row border-b last:border-b-0 border-linear-g-primary py-12 px-4 md:px-0 md:py-16 md:gap-10")
     for event in events:
@@ -55,7 +54,7 @@ try:
             # Get the show details
             performance_div = event.find('div', class_="performances whitespace-pre-line w-full md:w-3/4")
             bands_tag = performance_div.find('h3')
-            bands = split_band_names(bands_tag.text) if bands_tag else []
+            bands = split_bands(bands_tag.text, "Icehouse") if bands_tag else ()
 
             # Extract the date from the h4 tag with class "day-of-week"
             date_tag = performance_div.find('h4', class_="day-of-week")
@@ -77,34 +76,9 @@ try:
                         doors_time = time_match.group(1).lower()  # Convert to lowercase for consistency
                         print(f"First Time Found: {doors_time}")  # Log the found time
                         
-                    # Extract the year from the event URL or another source
-                    event_date = show_date_text.strip()  # Use the extracted show date text directly
-                    month = datetime.strptime(event_date, "%a, %b %d").month  # Extract the month from event date text
-
-                    # Determine the year based on the month
-                    if month == 12:  # If the event is in December
-                        year = 2024
-                    else:  # Otherwise, it will be in 2025
-                        year = 2025
-
-                    # Format the full date correctly (ensure the format matches datetime's expectations)
-                    formatted_date = f"{year} {event_date}"
-
-                    # Combine the formatted date with the time
-                    full_date = f"{formatted_date} {doors_time}"
-
-                    # Try parsing the combined string into a datetime object
-                    try:
-                        # If the time has minutes, use "%I:%M%p"; otherwise use "%I%p"
-                        if ":" in doors_time:
-                            show_start_time = datetime.strptime(full_date, "%Y %a, %b %d %I:%M%p")
-                        else:
-                            show_start_time = datetime.strptime(full_date, "%Y %a, %b %d %I%p")
-                        
-                        print(f"Parsed Start Time: {show_start_time}")  # Log the parsed datetime
-                    except ValueError as e:
-                        print(f"Error parsing date and time: {e}")
-                        show_start_time = None
+                    # Combine the date ("Sat, Dec 14") with the time; the year is inferred
+                    show_start_time = DATES.parse(f"{show_date_text} {doors_time}")
+                    print(f"Parsed Start Time: {show_start_time}")  # Log the parsed datetime
                 else:
                     print("No time span found in the performance div.")
                     show_start_time = None
@@ -128,39 +102,37 @@ try:
             print(f"Event Link: {event_link}")
 
             # Print out the parsed event information
-            print(f"Inserting/Updating show with parameters: "
+            print(f"Queueing show with parameters: "
                   f"Venue ID: {venue_id}, Bands: {bands}, Start: {show_start_time}, Event Link: {event_link}, Flyer Image: {flyer_image}")
 
-            # Insert or update the show in the database
-            try:
-                show_id, was_inserted = insert_show(conn, cursor, venue_id, ", ".join(bands), show_start_time, event_link, flyer_image)
-                if was_inserted:
-                    inserted_shows += 1
-                else:
-                    skipped_shows += 1  # No modification made
-            except Exception as e:
-                print(f"Error inserting or updating show: {e}")
-                skipped_shows += 1  # Count as skipped if an error occurs
-                continue
+            rows.append((", ".join(bands), show_start_time, event_link, flyer_image))
 
         except Exception as e:
             print(f"Error parsing event: {e}")
             skipped_shows += 1  # Count as skipped if an error occurs
 
+    # Insert or update every show in one statement
+    counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    mark_processed(venue_url)
+    record_fingerprint("Icehouse", fingerprint)
+    inserted_shows = counts["inserted"]
+    skipped_shows += counts["updated"] + counts["unchanged"]
+
     # Log the results
     print("\nScraping Results:")
     print(f"Total shows found: {show_count}")
     print(f"Inserted shows: {inserted_shows}")
     print(f"Skipped shows (duplicates): {skipped_shows}")
-    print(f"Total bands found: {band_count}")
-    print(f"Inserted bands: {inserted_bands}")
-    print(f"Bands linked to shows: {linked_bands}")
+    # upsert_shows links the bands of new and changed shows
+    print(f"Total bands found: {run_stats.stats.get('bands_found', 0)}")
+    print(f"Inserted bands: {run_stats.stats.get('bands_inserted', 0)}")
+    print(f"Bands linked to shows: {run_stats.stats.get('show_bands_linked', 0)}")
 
 except Exception as e:
     print(f"Error: {e}")
     conn.rollback()
 
 finally:
-    # Close the database connection
+    # Return the connection to the pool
     cursor.close()
-    conn.close()
\ No newline at end of file
+    release_connection(conn)
\ No newline at end of file
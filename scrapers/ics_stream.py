@@ -0,0 +1,168 @@
+import io
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# RFC 5545 TEXT escapes
+TEXT_ESCAPES = {'\\\\': '\\', '\\;': ';', '\\,': ',', '\\n': '\n', '\\N': '\n'}
+
+def unfold(lines):
+    """Join RFC 5545 folded lines (continuations start with a space or tab)."""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def parse_line(line):
+    """
+    Split a content line into (NAME, {PARAM: value}, value), honouring quoted
+    parameter values. Returns (None, {}, None) for a line without a value.
+    """
+    segments = []
+    start = 0
+    in_quotes = False
+    for i, char in enumerate(line):
+        if char == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes and char in ';:':
+            segments.append(line[start:i])
+            start = i + 1
+            if char == ':':
+                break
+    else:
+        return None, {}, None
+
+    params = {}
+    for segment in segments[1:]:
+        key, _, param_value = segment.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return segments[0].upper(), params, line[start:]
+
+def unescape_text(value):
+    """Undo RFC 5545 TEXT escaping in one left-to-right pass, so "\\\\n" stays a literal backslash-n."""
+    out = []
+    i = 0
+    while i < len(value):
+        pair = value[i:i + 2]
+        if pair in TEXT_ESCAPES:
+            out.append(TEXT_ESCAPES[pair])
+            i += 2
+        else:
+            out.append(value[i])
+            i += 1
+    return ''.join(out)
+
+def parse_datetime(value, params):
+    """
+    DATE-TIME/DATE value to a datetime: aware for UTC ('Z') and known TZIDs,
+    naive for floating times and all-day DATE values (at midnight).
+    """
+    value = value.strip()
+    if params.get('VALUE') == 'DATE' or len(value) == 8:
+        return datetime.strptime(value, "%Y%m%d")
+    if value.endswith('Z'):
+        return datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+    parsed = datetime.strptime(value, "%Y%m%dT%H%M%S")
+    tzid = params.get('TZID')
+    if tzid:
+        try:
+            parsed = parsed.replace(tzinfo=ZoneInfo(tzid))
+        except (ZoneInfoNotFoundError, ValueError):
+            pass  # unknown zone names are treated as floating local time
+    return parsed
+
+def local_naive(value, tz):
+    """Convert an aware datetime to wall time in `tz` without tzinfo, as the shows table stores it."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(tz).replace(tzinfo=None)
+
+def _build_event(properties):
+    def first(name):
+        values = properties.get(name)
+        return values[0] if values else (None, {})
+
+    def text(name):
+        value, _ = first(name)
+        return unescape_text(value) if value is not None else None
+
+    def when(name):
+        value, params = first(name)
+        if not value:
+            return None
+        try:
+            return parse_datetime(value, params)
+        except ValueError:
+            return None
+
+    def dates(name):
+        parsed = []
+        for value, params in properties.get(name, []):
+            for part in value.split(','):
+                try:
+                    parsed.append(parse_datetime(part, params))
+                except ValueError:
+                    continue
+        return parsed
+
+    attachments = [
+        (params.get('FMTTYPE'), value.strip())
+        for value, params in properties.get('ATTACH', [])
+    ]
+    start_value, start_params = first('DTSTART')
+    return {
+        'uid': text('UID'),
+        'summary': text('SUMMARY'),
+        'description': text('DESCRIPTION'),
+        'location': text('LOCATION'),
+        'url': (first('URL')[0] or '').strip() or None,
+        'status': text('STATUS'),
+        'start': when('DTSTART'),
+        'end': when('DTEND'),
+        'all_day': start_params.get('VALUE') == 'DATE' or len((start_value or '').strip()) == 8,
+        'rrule': first('RRULE')[0],
+        'rdate': dates('RDATE'),
+        'exdate': dates('EXDATE'),
+        'recurrence_id': when('RECURRENCE-ID'),
+        'attachments': attachments,
+        'image': next((uri for fmttype, uri in attachments if fmttype and fmttype.startswith('image/')), None),
+        'properties': properties,
+    }
+
+def iter_events(source):
+    """
+    Read an ICS feed in one pass and yield each VEVENT as a dict (uid, summary,
+    start, url, rrule, image, ...; see _build_event), with every raw property
+    under 'properties' as {NAME: [(value, params), ...]}. `source` is the feed
+    text or any iterable of lines, e.g. a streamed response's iter_lines().
+    """
+    if isinstance(source, str):
+        source = io.StringIO(source)
+
+    properties = None
+    depth = 0  # components nested inside the VEVENT (VALARM)
+    for line in unfold(source):
+        name, params, value = parse_line(line)
+        if name is None:
+            continue
+        if name == 'BEGIN':
+            if value.upper() == 'VEVENT' and properties is None:
+                properties = {}
+            elif properties is not None:
+                depth += 1
+        elif name == 'END':
+            if properties is None:
+                continue
+            if depth:
+                depth -= 1
+            elif value.upper() == 'VEVENT':
+                yield _build_event(properties)
+                properties = None
+        elif properties is not None and not depth:
+            properties.setdefault(name, []).append((value, params))
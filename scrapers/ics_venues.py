@@ -0,0 +1,138 @@
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+import httpx
+from dateutil.rrule import rrulestr
+
+from dates import VENUE_TIMEZONE
+from db_utils import db_connection, get_venue_id, upsert_shows, count_statuses
+from fetch import fetch, mark_processed
+from fingerprints import ics_fingerprint, is_unchanged, record_fingerprint
+from ics_stream import iter_events, local_naive
+from normalize import join_bands, split_bands_batch
+
+# Recurring events are expanded this far ahead
+ICS_HORIZON_DAYS = int(os.getenv('ICS_HORIZON_DAYS', '180'))
+
+# Venues with an iCal feed (most run WordPress' The Events Calendar, which
+# serves one at ?ical=1). Adding a venue is one entry here; band-splitting
+# rules live in normalize.PROFILES under the same name.
+ICS_VENUES = {
+    "White Squirrel": {
+        "feed_url": "https://whitesquirrelbar.com/calendar/?ical=1",
+        "default_flyer": "https://whitesquirrelbar.com/wp-content/uploads/klipschimage-scaled.jpg",
+    },
+    "Hook & Ladder": {
+        "feed_url": "https://thehookmpls.com/?post_type=tribe_events&ical=1&eventDisplay=list",
+        "default_flyer": None,
+    },
+}
+
+def wall_time(value):
+    """
+    The naive start the shows table stores: the wall-clock time in the event's
+    own TZID, or venue-local time for UTC values.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    if value.tzinfo is timezone.utc:
+        return local_naive(value, VENUE_TIMEZONE)
+    return value.replace(tzinfo=None)
+
+def occurrences(event, window_start, window_end):
+    """Start times of an event inside the window, expanding RRULE/RDATE and dropping EXDATEs."""
+    start = event['start']
+    if start is None:
+        return []
+    if not event['rrule'] and not event['rdate']:
+        return [start] if wall_time(start) <= wall_time(window_end) else []
+
+    # Compare in the event's own terms: aware rules against aware bounds
+    if start.tzinfo is None:
+        window_start, window_end = wall_time(window_start), wall_time(window_end)
+    starts = set(event['rdate'])
+    if event['rrule']:
+        try:
+            rule = rrulestr(event['rrule'], dtstart=start)
+            starts.update(rule.between(window_start, window_end, inc=True))
+        except (ValueError, TypeError) as e:
+            print(f"Could not expand RRULE for {event['summary']}: {e}")
+            starts.add(start)
+    excluded = {wall_time(value) for value in event['exdate']}
+    return sorted(value for value in starts if wall_time(value) not in excluded)
+
+def feed_rows(ics_content, venue, config, horizon_days=ICS_HORIZON_DAYS):
+    """(bands, start, event_link, flyer_image) rows for every show in a feed."""
+    now = datetime.now(timezone.utc)
+    window_end = now + timedelta(days=horizon_days)
+    events = list(iter_events(ics_content))
+
+    # RECURRENCE-ID events replace one instance of their recurring event
+    overridden = {(event['uid'], wall_time(event['recurrence_id'])) for event in events if event['recurrence_id']}
+
+    events = [event for event in events if (event['status'] or '').upper() != 'CANCELLED']
+    band_lists = split_bands_batch((event['summary'] or "" for event in events), venue)
+
+    rows = []
+    for event, bands in zip(events, band_lists):
+        bands = join_bands(bands)
+        flyer_image = event['image'] or config["default_flyer"]
+        for start in occurrences(event, now, window_end):
+            start = wall_time(start)
+            if not event['recurrence_id'] and (event['uid'], start) in overridden:
+                continue
+            rows.append((bands, start, event['url'], flyer_image))
+    return rows
+
+def sync_ics_venue(venue, config=None):
+    """
+    Fetch a venue's feed with a conditional GET and upsert its shows. Returns
+    the upsert counts ({} when the feed hasn't changed), or None if the feed
+    couldn't be read so the caller can fall back to scraping.
+    """
+    config = config or ICS_VENUES[venue]
+    feed_url = config["feed_url"]
+    try:
+        response = fetch(feed_url)
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Could not fetch the {venue} feed: {e}")
+        return None
+    if response.not_modified:
+        print(f"{venue} feed unchanged since the last run; nothing to do.")
+        return {}
+    if "BEGIN:VCALENDAR" not in response.text[:1024]:
+        print(f"{feed_url} is not an iCal feed.")
+        return None
+
+    ics_content = response.text
+    fingerprint = ics_fingerprint(ics_content)
+    if is_unchanged(venue, fingerprint):
+        print(f"{venue} events unchanged since the last run; nothing to do.")
+        return {}
+
+    rows = feed_rows(ics_content, venue, config)
+    print(f"Read {len(rows)} shows from the {venue} feed.")
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            venue_id = get_venue_id(cursor, venue)
+        counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    mark_processed(feed_url)
+    record_fingerprint(venue, fingerprint)
+    print(f"{venue}: Added: {counts['inserted']}, Updated: {counts['updated']}, Unchanged: {counts['unchanged']}.")
+    return counts
+
+def main(venues):
+    failed = False
+    for venue in venues or ICS_VENUES:
+        try:
+            if sync_ics_venue(venue) is None:
+                failed = True
+        except Exception as e:
+            print(f"Error processing {venue}: {e}")
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,16 +1,18 @@
 import time
-import re
 import json
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
+from parsing import make_soup
+from normalize import split_bands
 from datetime import datetime
-from db_utils import connect_to_db, insert_show, get_venue_id
+from browser_pool import open_browser
+from detail_crawler import crawl_details
+from db_utils import get_connection, release_connection, upsert_shows, count_statuses, get_venue_id
 
 # Initialize WebDriver
-driver = webdriver.Chrome()
+driver = open_browser()
 url = 'https://www.mortimerscalendar.com/'  # Replace with actual URL
 driver.get(url)
 
@@ -23,8 +25,8 @@ try:
 except:
     print("Event cards did not load in time.")
 
-# Extract page source and parse with BeautifulSoup
-soup = BeautifulSoup(driver.page_source, 'html.parser')
+# Extract page source and parse just the event list items
+soup = make_soup(driver.page_source, SoupStrainer("li", attrs={"data-hook": "event-list-item"}))
 events = soup.find_all("li", {"data-hook": "event-list-item"})
 events_data = []
 band_names = set()
@@ -38,31 +40,33 @@ bands_skipped = 0
 # Set to track already visited event links
 visited_event_links = set()
 
-# Function to split band names based on custom rules
-def split_band_names(band_string):
-    bands = re.split(r'\s*(?:,|w/|W/|&|\+)\s*', band_string)
-    return [b.strip() for b in bands if b.strip()]
-
-# Loop through each event item to click and extract details from individual event pages
+# Collect the event page behind each item's "Details" button
+event_links = []
 for event in events:
-    try:
-        # Click on the "Details" button to go to the event's page
-        details_button = event.find("a", {"data-hook": "ev-rsvp-button"})
-        event_link = details_button['href']
-        
-        # Skip this event if it has already been processed
-        if event_link in visited_event_links:
-            print(f"Skipping already processed event: {event_link}")
-            continue
-        visited_event_links.add(event_link)  # Mark this event as processed
+    details_button = event.find("a", {"data-hook": "ev-rsvp-button"})
+    if not details_button or not details_button.get('href'):
+        print("No details link found for this event item.")
+        continue
+    event_link = details_button['href']
 
-        driver.get(event_link)
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.CSS_SELECTOR, 'h1'))  # Wait for the event details page to load
-        )
+    # Skip this event if it has already been seen
+    if event_link in visited_event_links:
+        print(f"Skipping already processed event: {event_link}")
+        continue
+    visited_event_links.add(event_link)  # Mark this event as processed
+    event_links.append(event_link)
 
-        # Parse the event page with BeautifulSoup
-        event_soup = BeautifulSoup(driver.page_source, 'html.parser')
+# Done with the list; load the event pages in parallel tabs (Wix renders them client-side)
+driver.quit()
+event_pages = crawl_details(event_links, "h1", render=True)
+
+# Extract details from each individual event page
+for event_link in event_links:
+    try:
+        event_soup = event_pages.get(event_link)
+        if event_soup is None:
+            print(f"Could not load event page: {event_link}")
+            continue
         event_details = {}
 
         # Set the venue name
@@ -71,7 +75,7 @@ for event in events:
         # Extract bands
         band_tag = event_soup.find("h1", class_="lEpN4c q198bJ fKdwAf")
         if band_tag:
-            band_names_list = split_band_names(band_tag.get_text(strip=True))
+            band_names_list = split_bands(band_tag.get_text(strip=True), "Mortimer's")
             event_details['bands'] = ", ".join(band_names_list)
             band_names.update(band_names_list)
         else:
@@ -110,54 +114,37 @@ for event in events:
         # Append event details
         events_data.append(event_details.copy())
 
-        # Go back to the main event list page
-        driver.back()
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'li[data-hook="event-list-item"]'))  # Wait for the list to reload
-        )
-
     except Exception as e:
         print(f"Error processing event: {e}")
         continue
 
-# Close the driver
-driver.quit()
-
 # Connect to the PostgreSQL database
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
 # Get venue ID for Mortimer's
 venue_id = get_venue_id(cursor, "Mortimer's")
 
-# Process each event
-for event_details in events_data:
-    try:
-        # Insert or update the show
-        show_id, was_inserted = insert_show(
-            conn,  # Pass the connection object first
-            cursor,  # Pass the cursor object second
-            venue_id=venue_id,
-            bands=event_details['bands'],
-            start=event_details['start'],
-            event_link=event_details['event_link'],
-            flyer_image=event_details['flyer_image'],
-        )
-        if was_inserted:
-            shows_added += 1
-            print(f"Inserted new show with ID: {show_id}")
-        else:
-            shows_skipped += 1
-            print(f"Updated existing show with ID: {show_id}")
-
-    except Exception as e:
-        print(f"Error processing event: {event_details['bands']}. Error: {e}")
-        conn.rollback()
+# Insert or update every show in one statement
+rows = [
+    (
+        event_details['bands'],
+        event_details['start'],
+        event_details['event_link'],
+        event_details['flyer_image'],
+    )
+    for event_details in events_data
+]
+try:
+    counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    shows_added = counts['inserted']
+    shows_skipped = counts['updated'] + counts['unchanged']
+except Exception as e:
+    print(f"Error processing events: {e}")
 
-# Commit all changes and close the connection
-conn.commit()
+# Close the connection
 cursor.close()
-conn.close()
+release_connection(conn)
 
 # Print summary
 print(f"Events processed. Added: {shows_added}, Updated: {shows_skipped}.")
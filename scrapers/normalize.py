@@ -0,0 +1,174 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# Residencies and regular bills repeat every week, so results are memoized
+NORMALIZE_CACHE_SIZE = 4096
+
+def _split_on_first_connector(connectors):
+    """Split on the first of `connectors` the title contains (Cedar titles use one kind per bill)."""
+    patterns = [(connector, re.compile(re.escape(connector), re.IGNORECASE)) for connector in connectors]
+
+    def split(title):
+        for connector, pattern in patterns:
+            if connector in title.lower():
+                return pattern.split(title)
+        return [title]
+    return split
+
+STOP_WORDS_WITH_AND = frozenset({'with', 'and'})
+
+# Per-venue rules, matching what each scraper did on its own:
+#   split       separator regex, or a function returning the parts
+#   remove      patterns deleted from the title before splitting
+#   stop_words  words dropped from inside each name
+#   drop        parts discarded outright (leftover separators)
+#   default_times  (text in the title, start time) for bills the venue doesn't list a time for
+PROFILES = {
+    "default": {
+        "split": re.compile(r'\s*(?:,|w/|&|\+)\s*'),
+    },
+    "Berlin": {
+        "split": re.compile(r'\s*(?:,|w/|&|\+)\s*'),
+    },
+    "Zhora Darling": {
+        "split": re.compile(r'\s*(?:,|w/|&)\s*'),
+    },
+    "Mortimer's": {
+        "split": re.compile(r'\s*(?:,|w/|W/|&|\+)\s*'),
+    },
+    "Hook & Ladder": {
+        "split": re.compile(r',|\band\b|\bwith\b|\b&\b', re.IGNORECASE),
+    },
+    "White Squirrel": {
+        "split": re.compile(r'\s+w\.?\s+|,'),
+    },
+    "Icehouse": {
+        "remove": [re.compile(r'Brunch with')],
+        "split": re.compile(r'\s+(?:w/|and|\+|&)\s+'),
+        "drop": frozenset({'w/', 'and', '+', '&', 'with'}),
+    },
+    "Green Room": {
+        "split": re.compile(r',|\band\b|\bwith\b', re.IGNORECASE),
+        "stop_words": STOP_WORDS_WITH_AND,
+    },
+    "Pilllar Forum": {
+        "remove": [
+            re.compile(r'\$\d+(\.\d{2})?'),  # ticket prices
+            re.compile(r'\d{1,2}(:\d{2})?\s?(am|pm)', re.IGNORECASE),  # set times
+        ],
+        "split": re.compile(r',|\band\b|, and\b|with\b', re.IGNORECASE),
+        "stop_words": frozenset({'with', 'and', 'featuring'}),
+    },
+    "331 Club": {
+        # Each line of a 331 listing is already one act
+        "split": None,
+        "stop_words": STOP_WORDS_WITH_AND,
+        "default_times": [
+            ("Worker's Playtime", "06:00 PM"),
+            ("Movie Music Trivia", "06:00 PM"),
+            ("Drinkin' Spelling Bee", "06:00 PM"),
+            ("Harold's House Party", "04:00 PM"),
+            ("Dr. Sketchy", "02:00 PM"),
+            ("Conspiracy Series", "09:00 PM"),
+            (None, "10:00 PM"),  # most 331 shows start at 10
+        ],
+    },
+    "The Cedar Cultural Center": {
+        "split": _split_on_first_connector([" and ", " + ", " & ", " with ", " featuring "]),
+    },
+}
+
+def _profile(venue):
+    return PROFILES.get(venue) or PROFILES["default"]
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def clean_band_name(name, venue=None):
+    """Remove a venue's noise patterns and stop words from one band name."""
+    profile = _profile(venue)
+    for pattern in profile.get("remove", ()):
+        name = pattern.sub('', name)
+    stop_words = profile.get("stop_words")
+    if stop_words:
+        name = ' '.join(word for word in name.split() if word.lower() not in stop_words)
+    return name.strip()
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def split_bands(title, venue=None):
+    """Split a bill into a tuple of band names using the venue's rules."""
+    profile = _profile(venue)
+    for pattern in profile.get("remove", ()):
+        title = pattern.sub('', title)
+    title = title.strip()
+
+    split = profile.get("split")
+    if split is None:
+        parts = [title]
+    elif isinstance(split, re.Pattern):
+        parts = split.split(title)
+    else:
+        parts = split(title)
+
+    drop = profile.get("drop", ())
+    bands = []
+    for part in parts:
+        part = part.strip()
+        if not part or part.lower() in drop:
+            continue
+        part = clean_band_name(part, venue)
+        if part:
+            bands.append(part)
+    return tuple(dict.fromkeys(bands))
+
+def split_bands_batch(titles, venue=None):
+    """split_bands for a whole scrape at once; repeated titles are split only once."""
+    titles = list(titles)
+    results = {title: split_bands(title, venue) for title in dict.fromkeys(titles)}
+    return [results[title] for title in titles]
+
+def join_bands(bands):
+    """The comma-separated, de-duplicated string stored in shows.bands."""
+    return ", ".join(dict.fromkeys(band for band in bands if band))
+
+TIME = re.compile(r'(\d{1,2})(?:[:.](\d{2}))?\s*([ap])\.?\s*m\.?(?![a-z])', re.IGNORECASE)
+TIME_24 = re.compile(r'\b([01]?\d|2[0-3])[:.](\d{2})\b')
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_time(text, default_period=None):
+    """
+    Normalize '9pm', '9:30 PM', '9.30p.m.' and the like to 'HH:MM AM/PM'.
+    Times without am/pm get `default_period` if given, otherwise None.
+    """
+    if not text:
+        return None
+    match = TIME.search(text)
+    if match:
+        hour, minute, period = int(match.group(1)), match.group(2) or '00', match.group(3).upper() + 'M'
+    else:
+        match = TIME_24.search(text)
+        if not match:
+            return None
+        hour, minute = int(match.group(1)), match.group(2)
+        if hour > 12:
+            return datetime.strptime(f"{hour}:{minute}", "%H:%M").strftime("%I:%M %p")
+        if default_period is None:
+            return None
+        period = default_period.upper()
+    if not 1 <= hour <= 12 or int(minute) > 59:
+        return None
+    return f"{hour:02d}:{minute} {period}"
+
+def to_24_hour(text):
+    """'8:30 PM' -> '20:30'; None when the text holds no time."""
+    normalized = normalize_time(text)
+    if normalized is None:
+        return None
+    return datetime.strptime(normalized, "%I:%M %p").strftime("%H:%M")
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def default_time(venue, text):
+    """The venue's usual start time for a bill without one ('HH:MM PM'), or None."""
+    for needle, start in _profile(venue).get("default_times", ()):
+        if needle is None or needle in text:
+            return start
+    return None
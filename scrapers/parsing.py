@@ -0,0 +1,27 @@
+import re
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401  (BeautifulSoup's C-backed tree builder; several times faster than html.parser)
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+def only(*classes, tags=None):
+    """
+    A strainer for make_soup() that keeps just the elements (optionally only
+    `tags`) carrying any of the CSS `classes`, along with everything inside them.
+    """
+    # Match single class tokens: newer bs4 releases compare strainer strings
+    # against the whole class attribute, so "foo" would miss class="foo bar"
+    pattern = re.compile(r'(?:^|\s)(?:%s)(?:\s|$)' % '|'.join(map(re.escape, classes)))
+    return SoupStrainer(tags, class_=pattern)
+
+def make_soup(markup, parse_only=None):
+    """
+    Parse HTML with the fastest available parser. Pass a SoupStrainer (see
+    only()) as `parse_only` to build just the part of the tree a scraper reads;
+    queries inside those elements work exactly as on a full parse.
+    """
+    return BeautifulSoup(markup, HTML_PARSER, parse_only=parse_only)
@@ -1,13 +1,15 @@
 import re
 import datetime
 import time
-from selenium import webdriver
 from selenium.webdriver.common.by import By
-from bs4 import BeautifulSoup
-from db_utils import connect_to_db, get_venue_id, insert_show
+from parsing import make_soup, only
+from normalize import clean_band_name, join_bands, normalize_time, split_bands
+from dates import DateResolver
+from browser_pool import open_browser
+from db_utils import get_connection, release_connection, get_venue_id, upsert_shows, count_statuses
 
 # Database connection
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
 # Fetch venue ID
@@ -15,11 +17,11 @@ try:
     venue_id = get_venue_id(cursor, "Pilllar Forum")
 except ValueError as e:
     print(f"Error fetching venue ID: {e}")
-    conn.close()
+    release_connection(conn)
     exit()
 
 # Web scraper setup
-driver = webdriver.Chrome()
+driver = open_browser()
 driver.set_page_load_timeout(60)
 
 # Load the URL and handle retries if needed
@@ -32,49 +34,23 @@ try:
 except Exception as e:
     print("Error loading page:", e)
     driver.quit()
-    conn.close()
+    release_connection(conn)
     exit()
 
-# Extract page source and parse with BeautifulSoup
-soup = BeautifulSoup(driver.page_source, 'html.parser')
+# Extract page source and parse just the event rows
+soup = make_soup(driver.page_source, only('sse-row'))
 driver.quit()
 
 # Find all event blocks
 event_blocks = soup.find_all(class_='sse-row sse-clearfix')
 events_data = []
 
+# Event dates are "Dec 14"; the year is inferred
+DATES = DateResolver("Pilllar Forum", ["%b %d"])
+
 # Track the current month
 current_month = ""
 
-# Function to normalize time strings
-def normalize_time(time_str):
-    time_str = time_str.lower().replace('.', '')
-    if ':' not in time_str:
-        time_str = time_str.replace("am", ":00 am").replace("pm", ":00 pm")
-    return time_str
-
-# Function to clean band names
-def clean_band_name(name):
-    """
-    Cleans band names by removing unnecessary words and patterns.
-    """
-    stop_words = ['with', 'and', 'featuring']
-    # Remove dollar amounts (e.g., "$12") and times (e.g., "7:00pm")
-    name = re.sub(r'\$\d+(\.\d{2})?', '', name)  # Remove dollar amounts
-    name = re.sub(r'\d{1,2}(:\d{2})?\s?(am|pm)', '', name, flags=re.IGNORECASE)  # Remove times
-    return ' '.join(word for word in name.split() if word.lower() not in stop_words).strip()
-
-def normalize_time(time_str):
-    """
-    Normalize time strings to ensure compatibility with datetime parsing.
-    """
-    time_str = time_str.lower().replace('.', '').strip()
-    if ':' not in time_str:
-        time_str = time_str.replace("am", ":00 am").replace("pm", ":00 pm")
-    elif 'am' not in time_str and 'pm' not in time_str:
-        time_str += " pm"  # Assume PM for missing periods
-    return time_str.capitalize()
-
 # Loop through each event block
 for block in event_blocks:
     event_details = {"venue": "Pilllar Forum"}  # Default venue name
@@ -88,16 +64,9 @@ for block in event_blocks:
         raw_date = date_tag.get_text(strip=True)
         # Extract the month and day, handling "Dec." or similar
         cleaned_date = re.sub(r'\.', '', raw_date)  # Remove periods
-        current_year = datetime.datetime.now().year
-        # If the event is in December, keep the current year; otherwise, use the next year
-        event_year = current_year if "dec" in cleaned_date.lower() else current_year + 1
-        event_details['date'] = f"{cleaned_date} {event_year}"
-        try:
-            event_date = datetime.datetime.strptime(event_details['date'], "%b %d %Y")
-            event_details['date'] = event_date.strftime("%Y-%m-%d")  # Format as YYYY-MM-DD
-        except ValueError:
-            print(f"Error parsing date: {raw_date}")
-            event_details['date'] = None
+        # The year is inferred from today's date
+        event_date = DATES.parse(cleaned_date)
+        event_details['date'] = event_date.strftime("%Y-%m-%d") if event_date else None  # Format as YYYY-MM-DD
     else:
         event_details['date'] = None  # Ensure the 'date' key exists
 
@@ -109,14 +78,10 @@ for block in event_blocks:
             music_time = tag.get_text(strip=True).split()[-1]  # Get the last part (time)
             break
 
-    if music_time:
-        try:
-            event_details['time'] = normalize_time(music_time)  # Normalize the time
-        except ValueError:
-            print(f"Error parsing time: {music_time}")
-            event_details['time'] = None
-    else:
-        event_details['time'] = None  # Ensure the 'time' key exists
+    # Normalize the time; Pilllar's set times without am/pm are evening shows
+    event_details['time'] = normalize_time(music_time, default_period='PM') if music_time else None
+    if music_time and event_details['time'] is None:
+        print(f"Error parsing time: {music_time}")
 
     # Combine date and time into `start`
     try:
@@ -148,19 +113,17 @@ for block in event_blocks:
     if name_tag:
         primary_band = name_tag.get_text(strip=True)
         if primary_band:
-            bands.append(clean_band_name(primary_band))  # Add the primary band
+            bands.append(clean_band_name(primary_band, "Pilllar Forum"))  # Add the primary band
 
     # Extract additional bands from other <p> tags
     additional_bands_tags = block.find_all('p')
     for tag in additional_bands_tags:
         if "Music" not in tag.get_text() and "Doors" not in tag.get_text():  # Ignore time-related lines
             additional_band_text = tag.get_text(strip=True)
-            additional_bands = [clean_band_name(band.strip()) for band in re.split(r',|\band\b|, and\b|with\b', additional_band_text, flags=re.IGNORECASE) if band.strip()]
-            bands.extend(additional_bands)  # Add additional bands to the list
+            bands.extend(split_bands(additional_band_text, "Pilllar Forum"))  # Add additional bands to the list
 
-    # Deduplicate and clean band names
-    bands = list(dict.fromkeys(bands))  # Remove duplicates
-    bands_str = ", ".join(bands)  # Convert to a comma-separated string for database insertion
+    # Deduplicate and convert to a comma-separated string for database insertion
+    bands_str = join_bands(bands)
     event_details['bands'] = bands_str  # Assign to 'bands'
 
     # Debug print statement for verification
@@ -177,24 +140,19 @@ for block in event_blocks:
     # Append event details
     events_data.append(event_details)
 
-# Insert events into the database
-added_count = 0
-duplicate_count = 0
-for event in events_data:
-    if not event.get('start'):
-        continue
-
-    cursor.execute("""
-        SELECT 1 FROM shows WHERE start = %s AND venue_id = %s AND bands = %s
-    """, (event['start'], venue_id, event['bands']))
-    if not cursor.fetchone():
-        insert_show(conn, cursor, venue_id, event['bands'], event['start'], event['event_link'], event['show_flyer'])
-        added_count += 1
-    else:
-        duplicate_count += 1
+# Insert or update every event in one statement
+rows = [
+    (event['bands'], event['start'], event['event_link'], event['show_flyer'])
+    for event in events_data
+    if event.get('start')
+]
+counts = count_statuses(upsert_shows(conn, venue_id, rows))
+added_count = counts['inserted']
+updated_count = counts['updated']
+duplicate_count = counts['unchanged']
 
 # Close the database connection
 cursor.close()
-conn.close()
+release_connection(conn)
 
-print(f"All events processed. Added: {added_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
+print(f"All events processed. Added: {added_count}, Updated: {updated_count}, Duplicates skipped: {duplicate_count}.")
\ No newline at end of file
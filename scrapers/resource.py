@@ -1,8 +1,9 @@
 import re
 from datetime import datetime
-import requests
-from bs4 import BeautifulSoup
-from db_utils import connect_to_db, insert_show, get_venue_id
+from parsing import make_soup, only
+from fetch import fetch, mark_processed
+from fingerprints import html_fingerprint, is_unchanged, record_fingerprint
+from db_utils import db_connection, upsert_shows, count_statuses, get_venue_id
 
 DEFAULT_IMAGE = "https://res.cloudinary.com/dsll3ms2c/image/upload/v1734876745/Resource_guyvdn.jpg"
 
@@ -43,16 +44,16 @@ def parse_event_datetime(section):
 
 def main():
     URL = 'https://www.resource-mpls.com/calendar'
-    VENUE_ID = 39
     
-    response = requests.get(URL)
-    soup = BeautifulSoup(response.text, 'html.parser')
+    response = fetch(URL)
+    response.raise_for_status()
+    fingerprint = html_fingerprint(response.text)
+    if response.not_modified or is_unchanged("Resource", fingerprint):
+        print("Resource calendar unchanged since the last run; nothing to do.")
+        return
+    soup = make_soup(response.text, only('svelte-glom7p', tags='section'))
     
-    conn = connect_to_db()
-    cursor = conn.cursor()
-    
-    added_count = 0
-    duplicate_count = 0
+    rows = []
     
     for section in soup.find_all('section', class_='svelte-glom7p'):
         try:
@@ -66,29 +67,24 @@ def main():
                 print(f"Could not parse date/time for event: {band_name}")
                 continue
             
-            show_id, was_inserted = insert_show(
-                conn, 
-                cursor, 
-                VENUE_ID,
+            rows.append((
                 band_name,
                 start,
                 URL,
                 DEFAULT_IMAGE  # Passed to flyer_image column
-            )
-            
-            if was_inserted:
-                added_count += 1
-                print(f"Inserted event: {band_name} on {start}")
-            else:
-                duplicate_count += 1
+            ))
                 
         except Exception as e:
             print(f"Error processing event: {e}")
-            conn.rollback()
     
-    conn.commit()
-    cursor.close()
-    conn.close()
+    with db_connection() as conn:
+        with conn.cursor() as cursor:
+            venue_id = get_venue_id(cursor, "Resource")
+        counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    mark_processed(URL)
+    record_fingerprint("Resource", fingerprint)
+    added_count = counts['inserted']
+    duplicate_count = counts['updated'] + counts['unchanged']
     
     print(f"All events processed. Added: {added_count}, Duplicates skipped: {duplicate_count}.")
 
@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import shlex
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+from run_stats import SUMMARY_PREFIX
+
+SCRAPERS_DIR = Path(__file__).parent
+
+# Scrapers run by the nightly job: venue name -> script in this directory, with any arguments
+# (an iCal venue registered in ics_venues.ICS_VENUES can run as 'ics_venues.py "Venue"')
+SCRAPERS = {
+    "First Avenue": "firstavescrape_todb.py",
+    "Green Room": "grscrape_todb.py",
+    "White Squirrel": "whitesquirrel.py",
+    "331 Club": "331scrape_todb.py",
+    "Icehouse": "icehouse.py",
+    "The Cedar Cultural Center": "cedar.py",
+    "Pilllar Forum": "pilllarscrape_todb.py",
+    "Zhora Darling": "zhorascrape_todb.py",
+    "Mortimer's": "mortimersscrape_todb.py",
+    "Hook & Ladder": "hookladder.py",
+}
+
+DEFAULT_WORKERS = int(os.getenv('SCRAPER_WORKERS', '4'))
+DEFAULT_TIMEOUT = int(os.getenv('SCRAPER_TIMEOUT', '600'))  # seconds per scraper
+
+# Chrome to share between the scrapers (CHROME_BINARY overrides the search)
+CHROME_BINARY = os.getenv('CHROME_BINARY')
+CHROME_CANDIDATES = [
+    "google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+    "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+]
+CHROME_STARTUP_TIMEOUT = 30  # seconds
+
+def find_chrome():
+    for candidate in ([CHROME_BINARY] if CHROME_BINARY else CHROME_CANDIDATES):
+        path = shutil.which(candidate)
+        if path:
+            return path
+    return None
+
+def start_shared_chrome():
+    """
+    Start one headless Chrome for every scraper this run starts. Each scraper
+    is its own process, so its browser_pool can't hand warm sessions to the
+    others; instead every pool attaches to this Chrome (CHROME_DEBUGGER_ADDRESS)
+    and opens tabs in it, and only the first scraper pays for the cold start.
+    Returns (process, address), or (None, None) if Chrome can't be started.
+    """
+    chrome = find_chrome()
+    if chrome is None:
+        print("Chrome not found (set CHROME_BINARY); each scraper will start its own.")
+        return None, None
+
+    from browser_pool import CHROME_ARGUMENTS
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    address = f"127.0.0.1:{port}"
+    profile_dir = tempfile.mkdtemp(prefix="scraper_chrome_")
+    proc = subprocess.Popen(
+        [
+            chrome, *CHROME_ARGUMENTS,
+            f"--remote-debugging-port={port}",
+            f"--user-data-dir={profile_dir}",
+            # The pooled sessions' image-blocking pref, as a flag
+            "--blink-settings=imagesEnabled=false",
+            "about:blank",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    proc.profile_dir = profile_dir
+
+    deadline = time.monotonic() + CHROME_STARTUP_TIMEOUT
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            urllib.request.urlopen(f"http://{address}/json/version", timeout=1).close()
+            print(f"Shared Chrome listening on {address}.")
+            return proc, address
+        except OSError:
+            time.sleep(0.2)
+
+    print("Shared Chrome didn't start; each scraper will start its own.")
+    stop_shared_chrome(proc)
+    return None, None
+
+def stop_shared_chrome(proc):
+    if proc is None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+    shutil.rmtree(proc.profile_dir, ignore_errors=True)
+
+def parse_run_summary(output):
+    """Pull the counters a scraper printed through run_stats, if any."""
+    for line in reversed(output.splitlines()):
+        if line.startswith(SUMMARY_PREFIX):
+            try:
+                return json.loads(line[len(SUMMARY_PREFIX):])
+            except ValueError:
+                break
+    return {}
+
+def run_scraper(name, script, timeout, env=None):
+    """Run one scraper in its own process and return its result record."""
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, *shlex.split(script)],
+        cwd=SCRAPERS_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        # Own process group, so a timeout also takes down the scraper's Chrome
+        start_new_session=True,
+    )
+    try:
+        output, _ = proc.communicate(timeout=timeout)
+        status = "ok" if proc.returncode == 0 else "failed"
+    except subprocess.TimeoutExpired:
+        os.killpg(proc.pid, signal.SIGKILL)
+        output, _ = proc.communicate()
+        status = "timeout"
+
+    counters = parse_run_summary(output)
+    return {
+        "name": name,
+        "script": script,
+        "status": status,
+        "returncode": proc.returncode,
+        "wall_time": round(time.monotonic() - started, 2),
+        "events_parsed": counters.get("events_parsed", 0),
+        "inserted": counters.get("inserted", 0),
+        "updated": counters.get("updated", 0),
+        "unchanged": counters.get("unchanged", 0),
+        "counters": counters,
+        "output": output,
+    }
+
+def notify(summary_lines):
+    """Show the summary as a macOS notification when running on a Mac."""
+    if sys.platform != "darwin":
+        return
+    message = " ".join(summary_lines).replace('"', "'")
+    subprocess.run(
+        ["osascript", "-e", f'display notification "{message}" with title "Scraper Summary"'],
+        check=False,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the venue scrapers in parallel.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="number of scrapers to run at once")
+    parser.add_argument("--timeout", type=int, default=DEFAULT_TIMEOUT,
+                        help="seconds before a scraper is killed")
+    parser.add_argument("--only", nargs="+", metavar="VENUE",
+                        help="run only these venues (names as listed in SCRAPERS)")
+    parser.add_argument("--no-shared-chrome", action="store_true",
+                        help="let each scraper start its own Chrome")
+    args = parser.parse_args()
+
+    selected = SCRAPERS
+    if args.only:
+        unknown = [name for name in args.only if name not in SCRAPERS]
+        if unknown:
+            parser.error(f"unknown scraper(s): {', '.join(unknown)}")
+        selected = {name: SCRAPERS[name] for name in args.only}
+
+    timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
+    log_path = SCRAPERS_DIR / f"scraper_run_{timestamp}.log"
+    summary_path = SCRAPERS_DIR / f"scraper_run_{timestamp}.json"
+
+    # Scrapers already pointed at a Selenium Grid or a running Chrome share that
+    env = None
+    chrome = None
+    if not (args.no_shared_chrome or os.getenv('SELENIUM_REMOTE_URL') or os.getenv('CHROME_DEBUGGER_ADDRESS')):
+        chrome, address = start_shared_chrome()
+        if address:
+            env = {**os.environ, "CHROME_DEBUGGER_ADDRESS": address}
+
+    print(f"Starting {len(selected)} scrapers with {args.workers} workers...")
+    started = time.monotonic()
+    results = []
+
+    try:
+        with open(log_path, "w") as log, ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(run_scraper, name, script, args.timeout, env): name
+                for name, script in selected.items()
+            }
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+
+                stamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                line = (f"[{stamp}] {result['name']}: {result['status']} in {result['wall_time']}s "
+                        f"(parsed {result['events_parsed']}, inserted {result['inserted']}, "
+                        f"updated {result['updated']})")
+                print(line)
+                log.write(f"{line}\n")
+                if result["status"] != "ok":
+                    log.write(f"{result['output']}\n")
+                log.flush()
+    finally:
+        stop_shared_chrome(chrome)
+
+    wall_time = round(time.monotonic() - started, 2)
+    results.sort(key=lambda result: result["name"])
+    summary = {
+        "started_at": timestamp,
+        "wall_time": wall_time,
+        "workers": args.workers,
+        "scrapers": [{k: v for k, v in result.items() if k != "output"} for result in results],
+    }
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+
+    summary_lines = [
+        f"{'✔' if result['status'] == 'ok' else '❌'} {result['name']}: {result['status']}."
+        for result in results
+    ]
+    notify(summary_lines)
+
+    print("\n".join(summary_lines))
+    print(f"All scrapers finished in {wall_time}s. See {log_path.name} and {summary_path.name}.")
+
+    if any(result["status"] != "ok" for result in results):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+import atexit
+import json
+import threading
+
+# Line prefix run_scrapers.py looks for in a scraper's output
+SUMMARY_PREFIX = "[RUN_SUMMARY]"
+
+stats = {}
+_lock = threading.Lock()
+
+def incr(key, amount=1):
+    """Add `amount` to a named counter for this run."""
+    with _lock:
+        stats[key] = stats.get(key, 0) + amount
+
+def emit_summary():
+    """Print the counters as one JSON line so the runner can pick them up."""
+    if stats:
+        print(f"{SUMMARY_PREFIX} {json.dumps(stats, sort_keys=True)}", flush=True)
+
+atexit.register(emit_summary)
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Index settings, overridable from the environment
+SHOW_INDEX_ENABLED = os.getenv('SHOW_INDEX', '1') != '0'
+SHOW_INDEX_PATH = Path(os.getenv('SHOW_INDEX_PATH', Path(__file__).parent / '.show_index.sqlite3'))
+# Seconds before a show is resent anyway; a day, so edits made directly in
+# Postgres are overwritten by the next nightly run
+SHOW_INDEX_MAX_AGE = int(os.getenv('SHOW_INDEX_MAX_AGE', str(24 * 3600)))
+
+def show_fingerprint(bands, event_link, flyer_image):
+    """Stable hash of the fields upsert_shows writes for a show."""
+    return hashlib.sha1(json.dumps([bands, event_link, flyer_image]).encode()).hexdigest()
+
+class ShowIndex:
+    """
+    Local SQLite record of what was last sent to Postgres for each show, keyed
+    like the unique_show constraint (venue_id, start) plus the target (host,
+    database and schema), so unchanged shows can be left out of the upsert
+    entirely.
+    """
+
+    def __init__(self, path=SHOW_INDEX_PATH, target="", max_age=SHOW_INDEX_MAX_AGE):
+        self.target = target
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # Several scrapers run at once; WAL plus a busy timeout lets them share the file
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS shows (
+                target TEXT NOT NULL,
+                venue_id INTEGER NOT NULL,
+                start TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                synced_at REAL NOT NULL,
+                PRIMARY KEY (target, venue_id, start)
+            )
+        """)
+        self._db.commit()
+
+    def changed(self, venue_id, rows):
+        """Return the (bands, start, event_link, flyer_image) rows that differ from, or are missing in, the index."""
+        with self._lock:
+            known = {
+                start: (fingerprint, synced_at)
+                for start, fingerprint, synced_at in self._db.execute(
+                    "SELECT start, fingerprint, synced_at FROM shows WHERE target = ? AND venue_id = ?",
+                    (self.target, venue_id),
+                )
+            }
+        cutoff = time.time() - self.max_age
+        pending = []
+        for bands, start, event_link, flyer_image in rows:
+            fingerprint, synced_at = known.get(start.isoformat(), (None, 0))
+            if fingerprint != show_fingerprint(bands, event_link, flyer_image) or synced_at < cutoff:
+                pending.append((bands, start, event_link, flyer_image))
+        return pending
+
+    def record(self, venue_id, rows):
+        """Remember rows that were just committed to Postgres."""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO shows (target, venue_id, start, fingerprint, synced_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.target, venue_id, start.isoformat(), show_fingerprint(bands, event_link, flyer_image), now)
+                    for bands, start, event_link, flyer_image in rows
+                ],
+            )
+
+    def forget(self, venue_id, starts):
+        """Drop index entries, e.g. for shows deleted from Postgres."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "DELETE FROM shows WHERE target = ? AND venue_id = ? AND start = ?",
+                [(self.target, venue_id, start.isoformat()) for start in starts],
+            )
+
+    def forget_venue(self, venue_id):
+        """Drop every index entry for a venue, so its next upsert sends every show."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM shows WHERE target = ? AND venue_id = ?", (self.target, venue_id))
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,196 @@
+import json
+from urllib.parse import urljoin
+
+import httpx
+from dateutil import parser
+
+import run_stats
+from dates import VENUE_TIMEZONE
+from fetch import fetch
+from ics_stream import iter_events, local_naive
+from normalize import join_bands, split_bands
+from parsing import make_soup
+
+SCHEMA_PREFIXES = ("http://schema.org/", "https://schema.org/")
+
+def _is_event(node):
+    """schema.org has many Event subtypes (MusicEvent, ComedyEvent, ...); accept them all."""
+    types = node.get("@type", [])
+    if isinstance(types, str):
+        types = [types]
+    return any(str(t).endswith("Event") for t in types)
+
+def _walk_json_ld(node):
+    """Yield every Event object in a JSON-LD document, including ones inside @graph and ItemLists."""
+    if isinstance(node, list):
+        for item in node:
+            yield from _walk_json_ld(item)
+    elif isinstance(node, dict):
+        if _is_event(node):
+            yield node
+            return
+        for key in ("@graph", "itemListElement", "item", "event", "events"):
+            if key in node:
+                yield from _walk_json_ld(node[key])
+
+def json_ld_events(soup):
+    """schema.org Event objects from the page's <script type="application/ld+json"> blocks."""
+    events = []
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            # strict=False: CMSes often leave raw newlines inside JSON-LD strings
+            data = json.loads(script.string or script.get_text(), strict=False)
+        except ValueError:
+            continue
+        events.extend(_walk_json_ld(data))
+    return events
+
+def _microdata_value(tag):
+    if tag.has_attr("itemscope"):
+        return _microdata_item(tag)
+    for attr in ("content", "datetime", "href", "src"):
+        if tag.has_attr(attr):
+            return tag[attr]
+    return tag.get_text(" ", strip=True)
+
+def _microdata_item(scope):
+    """Collect a microdata item's properties into a JSON-LD shaped dict."""
+    item = {"@type": scope.get("itemtype", "").split("/")[-1]}
+    for tag in scope.find_all(itemprop=True):
+        # Skip properties that belong to a nested item
+        if tag.find_parent(itemscope=True) is not scope:
+            continue
+        for name in tag["itemprop"].split():
+            value = _microdata_value(tag)
+            if name in item:
+                item[name] = item[name] if isinstance(item[name], list) else [item[name]]
+                item[name].append(value)
+            else:
+                item[name] = value
+    return item
+
+def microdata_events(soup):
+    """schema.org Event items marked up with itemscope/itemtype attributes."""
+    events = []
+    for scope in soup.find_all(itemscope=True, itemtype=True):
+        if not scope["itemtype"].startswith(SCHEMA_PREFIXES) or scope.find_parent(itemscope=True):
+            continue
+        item = _microdata_item(scope)
+        if _is_event(item):
+            events.append(item)
+    return events
+
+def ics_links(soup, base_url):
+    """URLs of calendar feeds the page links to."""
+    links = []
+    for tag in soup.find_all(["a", "link"], href=True):
+        href = tag["href"]
+        if tag.get("type") == "text/calendar" or href.startswith("webcal://") or href.split("?")[0].endswith(".ics") or "ical=1" in href:
+            links.append(urljoin(base_url, href.replace("webcal://", "https://", 1)))
+    return list(dict.fromkeys(links))
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+def _names(value):
+    values = value if isinstance(value, list) else [value]
+    names = [(v.get("name") if isinstance(v, dict) else v) for v in values if v]
+    return [name.strip() for name in names if isinstance(name, str) and name.strip()]
+
+def _image_url(value):
+    value = _first(value)
+    if isinstance(value, dict):
+        value = value.get("url") or value.get("contentUrl")
+    return value or None
+
+def _local_start(value):
+    """Parse an ISO 8601 startDate into the naive venue-local datetime the shows table stores."""
+    if not value:
+        return None
+    try:
+        start = parser.isoparse(value)
+    except ValueError:
+        try:
+            start = parser.parse(value)
+        except (ValueError, OverflowError):
+            return None
+    if start.tzinfo is not None:
+        start = start.astimezone(VENUE_TIMEZONE).replace(tzinfo=None)
+    return start
+
+def to_show(event, base_url):
+    """
+    Map a schema.org Event to the upsert_shows fields. `bands` is a list: the
+    performers when the event names them, otherwise just the event name, which
+    the caller can split with its venue's own rules.
+    """
+    name = _first(event.get("name"))
+    link = _first(event.get("url"))
+    return {
+        "bands": _names(event.get("performer")) or _names(name),
+        "start": _local_start(_first(event.get("startDate"))),
+        "event_link": urljoin(base_url, link) if isinstance(link, str) else base_url,
+        "flyer_image": _image_url(event.get("image")),
+    }
+
+def ics_shows(ics_url):
+    """Shows from an ICS feed, in the same shape as to_show()."""
+    return [
+        {
+            "bands": _names(event["summary"]),
+            "start": local_naive(event["start"], VENUE_TIMEZONE),
+            "event_link": event["url"] or ics_url,
+            "flyer_image": event["image"],
+        }
+        for event in iter_events(fetch(ics_url).text)
+    ]
+
+def extract_shows(soup, base_url):
+    """
+    Shows described by the page's structured data: JSON-LD first, then
+    microdata, then any ICS feed it links to. Events without a start time
+    are dropped. Returns [] when the page has none.
+    """
+    for source, events in (("json_ld", json_ld_events), ("microdata", microdata_events)):
+        shows = [show for show in (to_show(event, base_url) for event in events(soup)) if show["start"]]
+        if shows:
+            run_stats.incr(f"structured_{source}", len(shows))
+            return shows
+
+    for ics_url in ics_links(soup, base_url):
+        try:
+            shows = [show for show in ics_shows(ics_url) if show["start"]]
+        except (httpx.HTTPError, ValueError) as e:
+            print(f"Could not read calendar feed {ics_url}: {e}")
+            continue
+        if shows:
+            run_stats.incr("structured_ics", len(shows))
+            return shows
+    return []
+
+def structured_shows(url):
+    """
+    Fetch a page over HTTP and return its structured-data shows, or [] if it
+    has none (or can't be fetched) so the caller can fall back to scraping.
+    """
+    try:
+        response = fetch(url)
+    except httpx.HTTPError as e:
+        print(f"HTTP request for {url} failed: {e}")
+        return []
+    if response.status_code != 200:
+        return []
+    shows = extract_shows(make_soup(response.text), str(response.url))
+    if shows:
+        print(f"Found {len(shows)} events in {url}'s structured data.")
+    return shows
+
+def show_row(show, venue=None):
+    """
+    The (bands, start, event_link, flyer_image) row upsert_shows takes, with
+    each band entry split by the venue's normalize profile if `venue` is given.
+    """
+    bands = show["bands"]
+    if venue is not None:
+        bands = [band for entry in bands for band in split_bands(entry, venue)]
+    return join_bands(bands), show["start"], show["event_link"], show["flyer_image"]
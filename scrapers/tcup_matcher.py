@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import sys
+import threading
+import unicodedata
+from collections import deque
+from pathlib import Path
+
+from psycopg2.extras import execute_values
+
+import run_stats
+
+# Match TCUP member bands as part of upsert_shows (TCUP_MATCHING=0 turns it off)
+TCUP_MATCHING = os.getenv('TCUP_MATCHING', '1') != '0'
+
+# The built automaton, shared by scraper processes until tcupbands changes
+TCUP_MATCHER_CACHE = Path(os.getenv('TCUP_MATCHER_CACHE', Path(__file__).parent / '.tcup_matcher.json'))
+
+# Shorter names ("A", "Oz") would match inside too many unrelated listings
+MIN_NAME_LENGTH = 3
+
+# Shows read per batch when rescanning from the command line
+RESCAN_BATCH_SIZE = 1000
+
+# Names are compared as space-separated lowercase words; '|' marks the gap
+# between two bands in a listing so a name can't match across it
+NON_WORD = re.compile(r'[^a-z0-9|]+')
+ENTRY_SEPARATORS = re.compile(r'[,;]')
+
+TCUPBANDS_SIGNATURE_QUERY = """
+    SELECT count(*), coalesce(max(id), 0), md5(coalesce(string_agg(id || ':' || name, '|' ORDER BY id), ''))
+      FROM tcupbands
+"""
+
+def _ascii_lower(text):
+    text = unicodedata.normalize('NFKD', text).encode('ascii', 'ignore').decode()
+    return text.lower().replace('&', ' and ')
+
+def normalize_name(name):
+    """A tcupbands name as the pattern the matcher looks for: ' del viles '."""
+    words = NON_WORD.sub(' ', _ascii_lower(name).replace('|', ' ')).strip()
+    return f" {words} " if len(words.replace(' ', '')) >= MIN_NAME_LENGTH else None
+
+def normalize_listing(bands):
+    """A scraped bands string in the matcher's terms, with '|' between bill entries."""
+    text = ENTRY_SEPARATORS.sub(' | ', _ascii_lower((bands or '').replace('|', ' ')))
+    return f" {NON_WORD.sub(' ', text).strip()} "
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over normalized names: find() reports every name
+    in a text in one pass over it, however many names there are. Names are
+    padded with spaces, so they only match whole words.
+    """
+
+    def __init__(self, patterns=None):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+        if patterns:
+            self._build(patterns)
+
+    def _build(self, patterns):
+        """`patterns` maps a normalized name to the ids it stands for."""
+        for pattern, ids in patterns.items():
+            node = 0
+            for char in pattern:
+                child = self.goto[node].get(char)
+                if child is None:
+                    child = len(self.goto)
+                    self.goto.append({})
+                    self.out.append([])
+                    self.goto[node][char] = child
+                node = child
+            self.out[node].extend(ids)
+
+        # Breadth-first, so every fail link points at an already finished node
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self.goto[node].items():
+                queue.append(child)
+                fallback = self.fail[node]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.out[child] = self.out[child] + self.out[self.fail[child]]
+
+    def find(self, text):
+        """The ids of every name that occurs in `text`."""
+        goto, fail, out = self.goto, self.fail, self.out
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+    def to_json(self):
+        return {"goto": self.goto, "fail": self.fail, "out": self.out}
+
+    @classmethod
+    def from_json(cls, data):
+        automaton = cls()
+        automaton.goto, automaton.fail, automaton.out = data["goto"], data["fail"], data["out"]
+        return automaton
+
+class TcupMatcher:
+    """
+    Finds TCUP member bands in scraped listings. The automaton is built from
+    tcupbands once and kept (in memory and in `cache_path`) until a cheap
+    signature of the table says it changed.
+    """
+
+    def __init__(self, cache_path=TCUP_MATCHER_CACHE):
+        self.cache_path = Path(cache_path)
+        self._signature = None
+        self._automaton = None
+        self._lock = threading.Lock()
+
+    def _read_cache(self, signature):
+        try:
+            data = json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if data.get("signature") != signature:
+            return None
+        return AhoCorasick.from_json(data["automaton"])
+
+    def _write_cache(self, signature, automaton):
+        # Write-then-rename so parallel scrapers never read half a file
+        tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps({"signature": signature, "automaton": automaton.to_json()}))
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"Could not cache the TCUP matcher: {e}")
+
+    def automaton(self, cursor):
+        """The automaton for the current tcupbands, rebuilt only if the table changed."""
+        cursor.execute(TCUPBANDS_SIGNATURE_QUERY)
+        signature = "/".join(str(value) for value in cursor.fetchone())
+        with self._lock:
+            if signature == self._signature:
+                return self._automaton
+            automaton = self._read_cache(signature)
+            if automaton is None:
+                cursor.execute("SELECT id, name FROM tcupbands")
+                patterns = {}
+                for tcupband_id, name in cursor.fetchall():
+                    pattern = normalize_name(name or '')
+                    if pattern:
+                        patterns.setdefault(pattern, []).append(tcupband_id)
+                automaton = AhoCorasick(patterns)
+                self._write_cache(signature, automaton)
+                run_stats.incr("tcup_matcher_builds")
+            self._signature, self._automaton = signature, automaton
+            return automaton
+
+_matcher = TcupMatcher()
+
+def link_tcupbands(conn, shows):
+    """
+    Record which TCUP member bands play each show in show_tcupbands. `shows`
+    is (show_id, bands) pairs with bands as stored in shows.bands; a show's
+    old matches are replaced. Returns the number of matches written.
+    """
+    listings = {show_id: bands for show_id, bands in shows if show_id is not None}
+    if not listings:
+        return 0
+
+    try:
+        with conn.cursor() as cursor:
+            automaton = _matcher.automaton(cursor)
+            links = sorted({
+                (show_id, tcupband_id)
+                for show_id, bands in listings.items()
+                for tcupband_id in automaton.find(normalize_listing(bands))
+            })
+            cursor.execute("DELETE FROM show_tcupbands WHERE show_id = ANY(%s)", (list(listings),))
+            if links:
+                execute_values(
+                    cursor,
+                    "INSERT INTO show_tcupbands (show_id, tcupband_id) VALUES %s ON CONFLICT DO NOTHING",
+                    links,
+                    page_size=len(links),
+                )
+        conn.commit()
+    except Exception as e:
+        print(f"Error matching TCUP bands for {len(listings)} shows: {e}")
+        conn.rollback()
+        raise
+
+    run_stats.incr("tcup_matches", len(links))
+    return len(links)
+
+UPCOMING_SHOWS_QUERY = """
+    SELECT id, bands
+      FROM shows
+     WHERE start >= now() - interval '1 day'
+       AND id > %s
+     ORDER BY id
+     LIMIT %s
+"""
+
+def main():
+    """
+    Rescan every upcoming show, e.g. after members join or rename their band;
+    scrapers only match the shows they add or change.
+    """
+    from db_utils import db_connection  # db_utils imports this module for link_tcupbands
+
+    shows_scanned = matches = 0
+    last_id = 0
+    with db_connection() as conn:
+        while True:
+            with conn.cursor() as cursor:
+                cursor.execute(UPCOMING_SHOWS_QUERY, (last_id, RESCAN_BATCH_SIZE))
+                shows = cursor.fetchall()
+            if not shows:
+                break
+            last_id = shows[-1][0]
+            matches += link_tcupbands(conn, shows)
+            shows_scanned += len(shows)
+    print(f"Scanned {shows_scanned} upcoming shows: {matches} TCUP band matches.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,114 +1,99 @@
-import re
 import time
-from datetime import datetime
-from dateutil import parser
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-from db_utils import connect_to_db, insert_show, get_venue_id
+from browser_pool import open_browser
+from parsing import make_soup, only
+from normalize import split_bands
+from dates import DateResolver
+from structured_data import show_row, structured_shows
+from db_utils import get_connection, release_connection, upsert_shows, count_statuses, get_venue_id
 
-CHROMEDRIVER_PATH = '/usr/local/bin/chromedriver'
+url = 'https://www.zhoradarling.com/events'
 
-# Configure Chrome options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
+DATES = DateResolver("Zhora Darling", ["%a %d %b %I:%M%p", "%a %d %b %Y %I:%M%p"])
 
-chrome_options = Options()
-chrome_options.add_argument('--headless')
-chrome_options.add_argument('--no-sandbox')
-chrome_options.add_argument('--disable-dev-shm-usage')
+def scrape_event_cards():
+    """Render the DICE event list in Chrome and parse the event cards into rows."""
+    # Borrow a headless Chrome tab from the shared pool
+    driver = open_browser()
+    driver.get(url)
 
-service = Service(CHROMEDRIVER_PATH)
-driver = webdriver.Chrome(service=service, options=chrome_options)
-url = 'https://www.zhoradarling.com/events'
-driver.get(url)
+    try:
+        WebDriverWait(driver, 20).until(
+            EC.presence_of_all_elements_located((By.CLASS_NAME, 'sc-88e0adda-0'))
+        )
+    except Exception as e:
+        print(f"Error waiting for event cards: {e}")
+        driver.quit()
+        exit()
 
-try:
-    WebDriverWait(driver, 20).until(
-        EC.presence_of_all_elements_located((By.CLASS_NAME, 'sc-88e0adda-0'))
-    )
-except Exception as e:
-    print(f"Error waiting for event cards: {e}")
+    soup = make_soup(driver.page_source, only('sc-88e0adda-0', tags='article'))
     driver.quit()
-    exit()
 
-soup = BeautifulSoup(driver.page_source, 'html.parser')
-events = soup.find_all("article", class_="sc-88e0adda-0")
+    rows = []
+    for event in soup.find_all("article", class_="sc-88e0adda-0"):
+        event_details = {}
+
+        # Extract flyer image URL - find img tag that follows an a tag
+        for link in event.find_all('a'):
+            img_tag = link.find_next('img')
+            if img_tag:
+                event_details['show_flyer'] = img_tag['src']
+                break
+        if 'show_flyer' not in event_details:
+            event_details['show_flyer'] = None
+
+        # "Fri 12 Dec ― 8:00PM", with the year only on next year's shows;
+        # resolved for the whole listing once the cards are read
+        date_time_tag = event.find("time", class_="sc-88e0adda-1")
+        if date_time_tag:
+            event_details['start'] = date_time_tag.get_text(strip=True).replace("―", " ")
+        else:
+            event_details['start'] = None
+
+        title_tag = event.find("a", class_="sc-88e0adda-3 eijtNw dice_event-title")
+        if title_tag:
+            event_details['event_link'] = title_tag['href']
+            band_names_list = split_bands(title_tag.get_text(strip=True), "Zhora Darling")
+            event_details['bands'] = ", ".join(band_names_list)
+        else:
+            event_details['event_link'] = "N/A"
+            event_details['bands'] = "N/A"
+
+        rows.append((
+            event_details['bands'],
+            event_details['start'],
+            event_details['event_link'],
+            event_details['show_flyer']
+        ))
+
+    return DATES.resolve_rows(rows)
+
+# Schema.org events in the page HTML are cheaper to read than the rendered
+# widget and don't depend on its hashed class names
+shows = structured_shows(url)
+if shows:
+    rows = [show_row(show, "Zhora Darling") for show in shows]
+else:
+    rows = scrape_event_cards()
 
-conn = connect_to_db()
+conn = get_connection()
 cursor = conn.cursor()
 
 try:
     venue_id = get_venue_id(cursor, "Zhora Darling") 
 except ValueError as e:
     print(e)
-    conn.close()
+    release_connection(conn)
     exit()
 
-def split_band_names(band_string):
-    bands = re.split(r'\s*(?:,|w/|&)\s*', band_string)
-    return [b.strip() for b in bands if b.strip()]
-
-for event in events:
-    event_details = {}
-    event_details['venue_id'] = venue_id
-
-    # Extract flyer image URL - find img tag that follows an a tag
-    for link in event.find_all('a'):
-        img_tag = link.find_next('img')
-        if img_tag:
-            event_details['show_flyer'] = img_tag['src']
-            break
-    if 'show_flyer' not in event_details:
-        event_details['show_flyer'] = None
-
-    date_time_tag = event.find("time", class_="sc-88e0adda-1")
-    if date_time_tag:
-        date_time_text = date_time_tag.get_text(strip=True)
-        try:
-            if "―" in date_time_text and len(date_time_text.split()) == 5:
-                date_part, time_part = date_time_text.split("―")
-                month = date_part.split()[2]
-                year = 2024 if month in ["Nov", "Dec"] else 2025
-                full_date_time = f"{date_part.strip()} {time_part.strip()} {year}"
-                start_datetime = datetime.strptime(full_date_time, "%a %d %b %I:%M%p %Y")
-            elif "―" in date_time_text and len(date_time_text.split()) == 6:
-                date_part, time_part = date_time_text.split("―")
-                full_date_time = f"{date_part.strip()} {time_part.strip()}"
-                start_datetime = datetime.strptime(full_date_time, "%a %d %b %Y %I:%M%p")
-            event_details['start'] = start_datetime
-        except ValueError as e:
-            print(f"Error parsing date and time for event: {date_time_text}")
-            event_details['start'] = None
-    else:
-        event_details['start'] = None
-
-    title_tag = event.find("a", class_="sc-88e0adda-3 eijtNw dice_event-title")
-    if title_tag:
-        event_details['event_link'] = title_tag['href']
-        band_names_list = split_band_names(title_tag.get_text(strip=True))
-        event_details['bands'] = ", ".join(band_names_list)
-    else:
-        event_details['event_link'] = "N/A"
-        event_details['bands'] = "N/A"
-
-    try:
-        insert_show(
-            conn, 
-            cursor, 
-            event_details['venue_id'],
-            event_details['bands'],
-            event_details['start'],
-            event_details['event_link'],
-            event_details['show_flyer']
-        )
-    except Exception as e:
-        print(f"Error processing event with bands {event_details['bands']}: {e}")
-        conn.rollback()
+# Insert or update every show in one statement
+try:
+    counts = count_statuses(upsert_shows(conn, venue_id, rows))
+    print(f"All events processed. Added: {counts['inserted']}, Updated: {counts['updated']}, Unchanged: {counts['unchanged']}.")
+except Exception as e:
+    print(f"Error processing events: {e}")
 
-conn.commit()
 cursor.close()
-conn.close()
-driver.quit()
\ No newline at end of file
+release_connection(conn)
\ No newline at end of file
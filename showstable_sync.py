@@ -1,120 +1,610 @@
+import argparse
+import json
+import re
 import psycopg2
+from psycopg2.extensions import register_adapter
+from psycopg2.extras import Json, execute_values
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv(dotenv_path='/Users/musicdaddy/Desktop/venues/backend/.env.development')
 
-# Create connections for both local and production
-local_conn = psycopg2.connect(
-    dbname=os.getenv("LOCAL_DB_NAME"),
-    user=os.getenv("LOCAL_DB_USER"),
-    password=os.getenv("LOCAL_DB_PASSWORD"),
-    host=os.getenv("LOCAL_DB_HOST"),
-    port=int(os.getenv("LOCAL_DB_PORT")),
-)
+# jsonb columns come back from the local database as dicts
+register_adapter(dict, Json)
 
-prod_conn = psycopg2.connect(
-    dbname=os.getenv("PROD_DB_NAME"),
-    user=os.getenv("PROD_DB_USER"),
-    password=os.getenv("PROD_DB_PASSWORD"),
-    host=os.getenv("PROD_DB_HOST"),
-    port=int(os.getenv("PROD_DB_PORT")),
-    sslmode="require",
-)
+# Each table syncs on its own pair of connections, so tables can run concurrently
+def connect_local():
+    return psycopg2.connect(
+        dbname=os.getenv("LOCAL_DB_NAME"),
+        user=os.getenv("LOCAL_DB_USER"),
+        password=os.getenv("LOCAL_DB_PASSWORD"),
+        host=os.getenv("LOCAL_DB_HOST"),
+        port=int(os.getenv("LOCAL_DB_PORT")),
+    )
+
+def connect_prod():
+    return psycopg2.connect(
+        dbname=os.getenv("PROD_DB_NAME"),
+        user=os.getenv("PROD_DB_USER"),
+        password=os.getenv("PROD_DB_PASSWORD"),
+        host=os.getenv("PROD_DB_HOST"),
+        port=int(os.getenv("PROD_DB_PORT")),
+        sslmode="require",
+    )
+
+# Rows read from the local database per round trip (override with --batch-size)
+BATCH_SIZE = int(os.getenv("SYNC_BATCH_SIZE", "1000"))
+# Tables synced at the same time within a dependency level (override with --workers)
+SYNC_WORKERS = int(os.getenv("SYNC_WORKERS", "4"))
+
+ROOT_DIR = Path(__file__).parent
+# Which tables to sync and how to merge them (override with --config)
+CONFIG_PATH = ROOT_DIR / "sync_tables.json"
 
 print(f"Environment: {os.getenv('ENV')}")
-print(f"Local Connection: {local_conn}")
-print(f"Production Connection: {prod_conn}")
 
-def fetch_new_records(local_cursor, table_name, batch_size=100):
+def load_sync_config(path=CONFIG_PATH):
+    """
+    Read the table sync configuration: the schema file to take foreign keys
+    from, and per table its conflict_columns, exclude_columns, (when it has
+    no id column) the key_columns used for paging and change tracking,
+    depends_on for tables it must follow that no foreign key records, and
+    remap_columns ({column: table}) for columns holding another synced
+    table's ids, which can differ between the local and production copies,
+    and soft_delete_column for tables whose deletes are propagated by
+    setting that column instead of deleting the production row.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    for table_name, settings in config["tables"].items():
+        settings.setdefault("exclude_columns", [])
+        settings.setdefault("key_columns", ["id"])
+        settings.setdefault("depends_on", [])
+        settings.setdefault("remap_columns", {})
+        settings.setdefault("soft_delete_column", None)
+        if not settings.get("conflict_columns"):
+            raise ValueError(f"No conflict_columns configured for table: {table_name}")
+    return config
+
+SYNC_CONFIG = None  # loaded from --config once arguments are parsed
+
+FOREIGN_KEY = re.compile(
+    r"ALTER TABLE ONLY (?:\w+\.)?(\w+)\s+ADD CONSTRAINT \S+ FOREIGN KEY \([^)]*\) REFERENCES (?:\w+\.)?(\w+)\(",
+)
+
+def parse_foreign_keys(schema_path):
+    """Return {table: {tables it references}} from a pg_dump schema file."""
+    references = {}
+    for table_name, referenced in FOREIGN_KEY.findall(Path(schema_path).read_text()):
+        if referenced != table_name:
+            references.setdefault(table_name, set()).add(referenced)
+    return references
+
+def table_dependencies(config):
     """
-    Fetch all records from the local database in batches using OFFSET.
+    Return {table: {tables it must sync after}}: the schema's foreign keys
+    plus each table's configured depends_on.
     """
-    offset = 0
+    dependencies = parse_foreign_keys(ROOT_DIR / config["schema_file"])
+    for table_name, settings in config["tables"].items():
+        dependencies.setdefault(table_name, set()).update(settings["depends_on"])
+    return dependencies
+
+def dependency_levels(tables, dependencies):
+    """
+    Group tables into levels so every table comes after the tables it
+    depends on. Tables within a level are independent of each other.
+    """
+    remaining = {table: dependencies.get(table, set()) & set(tables) for table in tables}
+    levels = []
+    while remaining:
+        level = sorted(table for table, deps in remaining.items() if not deps)
+        if not level:
+            raise ValueError(f"Dependency cycle between tables: {', '.join(sorted(remaining))}")
+        levels.append(level)
+        for table in level:
+            del remaining[table]
+        for deps in remaining.values():
+            deps.difference_update(level)
+    return levels
+
+def fetch_new_records(local_cursor, table_name, batch_size=BATCH_SIZE, key_columns=("id",)):
+    """
+    Fetch all records from the local database in batches using keyset pagination
+    on `key_columns`, so each batch is an index range scan and every row is read
+    exactly once, in order.
+    """
+    key_list = ', '.join(key_columns)
+    last_key = None
     while True:
-        query = f"""
-        SELECT * FROM {table_name}
-        LIMIT {batch_size} OFFSET {offset}
-        """
-        local_cursor.execute(query)
+        if last_key is None:
+            query = f"""
+            SELECT * FROM {table_name}
+            ORDER BY {key_list}
+            LIMIT %s
+            """
+            local_cursor.execute(query, (batch_size,))
+        else:
+            query = f"""
+            SELECT * FROM {table_name}
+            WHERE ({key_list}) > ({', '.join(['%s'] * len(key_columns))})
+            ORDER BY {key_list}
+            LIMIT %s
+            """
+            local_cursor.execute(query, (*last_key, batch_size))
         rows = local_cursor.fetchall()
         if not rows:
             break
-        print(f"Fetched {len(rows)} rows starting at offset {offset}.")
-        yield rows, [desc[0] for desc in local_cursor.description]
-        offset += batch_size
+        columns = [desc[0] for desc in local_cursor.description]
+        last_key = tuple(rows[-1][columns.index(col)] for col in key_columns)
+        print(f"[{table_name}] Fetched {len(rows)} rows up to {key_list} {', '.join(map(str, last_key))}.")
+        yield rows, columns
+        if len(rows) < batch_size:
+            break
+
+def merge_query(table_name, columns, conflict_columns, exclude_columns, source):
+    """
+    INSERT ... ON CONFLICT statement that upserts `source` rows into `table_name`.
+    Rows identical to the production copy are left alone, and RETURNING reports
+    (xmax = 0) so inserts can be told apart from updates.
+    """
+    column_list = ', '.join(columns)
+    update_columns = [col for col in columns if col not in exclude_columns]
+    if update_columns:
+        on_conflict = f"""DO UPDATE SET
+            {', '.join(f"{col} = EXCLUDED.{col}" for col in update_columns)}
+        WHERE ({', '.join(f"{table_name}.{col}" for col in update_columns)})
+              IS DISTINCT FROM ({', '.join(f"EXCLUDED.{col}" for col in update_columns)})"""
+    else:
+        on_conflict = "DO NOTHING"
+    return f"""
+    INSERT INTO {table_name} ({column_list})
+    {source}
+    ON CONFLICT ({', '.join(conflict_columns)}) {on_conflict}
+    RETURNING (xmax = 0) AS inserted
+    """
+
+def merge_rows_individually(prod_cursor, table_name, columns, conflict_columns, exclude_columns, rows):
+    """
+    Fallback for a batch whose bulk merge failed: upsert rows one at a time
+    under savepoints so only the bad rows are skipped.
+    """
+    query = merge_query(table_name, columns, conflict_columns, exclude_columns,
+                        f"VALUES ({', '.join(['%s'] * len(columns))})")
+    added = updated = skipped = 0
+    for row in rows:
+        prod_cursor.execute("SAVEPOINT sync_row")
+        try:
+            prod_cursor.execute(query, row)
+            result = prod_cursor.fetchone()
+        except psycopg2.Error as e:
+            prod_cursor.execute("ROLLBACK TO SAVEPOINT sync_row")
+            print(f"Error processing row {row}: {e}")
+            skipped += 1
+            continue
+        prod_cursor.execute("RELEASE SAVEPOINT sync_row")
+        if result is not None:
+            if result[0]:
+                added += 1
+            else:
+                updated += 1
+    return added, updated, skipped
+
+def remap_ids(local_cursor, prod_cursor, table_name, columns, rows):
+    """
+    Rewrite the table's remap_columns from local ids to the production ids of
+    the same rows, matched on the referenced table's conflict_columns (a show
+    is the same show at the same venue_id and start, whatever its id). Rows
+    whose referenced row isn't in production are dropped. Returns (rows,
+    number dropped).
+    """
+    dropped = 0
+    for column, referenced in SYNC_CONFIG["tables"][table_name]["remap_columns"].items():
+        if column not in columns:
+            continue
+        position = columns.index(column)
+        local_ids = sorted({row[position] for row in rows if row[position] is not None})
+        if not local_ids:
+            continue
+
+        match_columns = SYNC_CONFIG["tables"][referenced]["conflict_columns"]
+        local_cursor.execute(
+            f"SELECT id, {', '.join(match_columns)} FROM {referenced} WHERE id = ANY(%s)", (local_ids,))
+        local_keys = local_cursor.fetchall()
+        prod_ids = {}
+        if local_keys:
+            prod_ids = dict(execute_values(prod_cursor, f"""
+                SELECT k.local_id, r.id
+                  FROM (VALUES %s) AS k (local_id, {', '.join(match_columns)})
+                  JOIN {referenced} r ON {' AND '.join(f"r.{col} = k.{col}" for col in match_columns)}
+            """, local_keys, page_size=len(local_keys), fetch=True))
+
+        remapped = []
+        for row in rows:
+            if row[position] is not None:
+                if row[position] not in prod_ids:
+                    dropped += 1
+                    continue
+                row = (*row[:position], prod_ids[row[position]], *row[position + 1:])
+            remapped.append(row)
+        rows = remapped
+
+    if dropped:
+        print(f"[{table_name}] Skipped {dropped} rows whose referenced row isn't in production.")
+    return rows, dropped
 
-def sync_table(table_name):
+def sync_batch(prod_cursor, table_name, columns, conflict_columns, exclude_columns, rows):
+    """
+    Stage one batch in a temp table and merge it with a single statement, in
+    one production transaction. Returns (added, updated, unchanged, skipped).
+    """
+    column_list = ', '.join(columns)
+    prod_cursor.execute(f"CREATE TEMP TABLE sync_stage (LIKE {table_name} INCLUDING DEFAULTS) ON COMMIT DROP")
+    execute_values(prod_cursor, f"INSERT INTO sync_stage ({column_list}) VALUES %s", rows, page_size=len(rows))
+
+    prod_cursor.execute("SAVEPOINT sync_batch")
+    try:
+        prod_cursor.execute(merge_query(table_name, columns, conflict_columns, exclude_columns,
+                                        f"SELECT {column_list} FROM sync_stage"))
+        results = prod_cursor.fetchall()
+    except psycopg2.Error as e:
+        prod_cursor.execute("ROLLBACK TO SAVEPOINT sync_batch")
+        print(f"Batch merge into {table_name} failed ({e.pgerror or e}); retrying row by row.")
+        added, updated, skipped = merge_rows_individually(
+            prod_cursor, table_name, columns, conflict_columns, exclude_columns, rows)
+        return added, updated, len(rows) - added - updated - skipped, skipped
+
+    added = sum(1 for (inserted,) in results if inserted)
+    updated = len(results) - added
+    return added, updated, len(rows) - len(results), 0
+
+def table_settings(table_name):
+    """Return (conflict_columns, exclude_columns) for a synced table."""
+    settings = SYNC_CONFIG["tables"].get(table_name)
+    if settings is None:
+        raise ValueError(f"Unknown table: {table_name}")
+    return settings["conflict_columns"], settings["exclude_columns"]
+
+def sync_table(local_conn, prod_conn, table_name, batch_size=BATCH_SIZE):
     print(f"Syncing table: {table_name}")
     local_cursor = local_conn.cursor()
     prod_cursor = prod_conn.cursor()
 
-    if table_name == "shows":
-        conflict_columns = ["venue_id", "start"]
-        exclude_columns = ["venue_id", "start", "created_at"]
-    elif table_name == "venues":
-        conflict_columns = ["id"]  # Use id as the conflict column
-        exclude_columns = ["created_at"]
-    else:
-        raise ValueError(f"Unknown table: {table_name}")
+    conflict_columns, exclude_columns = table_settings(table_name)
+    key_columns = SYNC_CONFIG["tables"][table_name]["key_columns"]
 
     added_rows = 0
     updated_rows = 0
+    unchanged_rows = 0
     skipped_rows = 0
 
-    for rows, columns in fetch_new_records(local_cursor, table_name):
-        for row in rows:
-            try:
-                # Start a new transaction for each row
-                prod_conn.rollback()  # Clear any previous failed transaction
-                
-                insert_query = f"""
-                INSERT INTO {table_name} ({', '.join(columns)}) 
-                VALUES ({', '.join(['%s'] * len(row))})
-                ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET
-                    {', '.join([f"{col} = EXCLUDED.{col}" for col in columns if col not in exclude_columns])};
-                """
-                prod_cursor.execute(insert_query, row)
-                prod_conn.commit()  # Commit each row individually
-
-                if prod_cursor.statusmessage.startswith("INSERT"):
-                    added_rows += 1
-                elif prod_cursor.statusmessage.startswith("UPDATE"):
-                    updated_rows += 1
-
-            except psycopg2.Error as e:
-                prod_conn.rollback()  # Rollback on any error
-                print(f"Error processing row {row}: {e}")
-                skipped_rows += 1
-                continue
+    for rows, columns in fetch_new_records(local_cursor, table_name, batch_size, key_columns):
+        try:
+            rows, dropped = remap_ids(local_cursor, prod_cursor, table_name, columns, rows)
+            added, updated, unchanged, skipped = sync_batch(
+                prod_cursor, table_name, columns, conflict_columns, exclude_columns, rows) if rows else (0, 0, 0, 0)
+            skipped += dropped
+            prod_conn.commit()  # One transaction per batch
+        except psycopg2.Error as e:
+            prod_conn.rollback()
+            print(f"Error syncing batch of {len(rows)} rows: {e}")
+            skipped_rows += len(rows)
+            continue
+
+        added_rows += added
+        updated_rows += updated
+        unchanged_rows += unchanged
+        skipped_rows += skipped
 
     print(f"Summary for {table_name}:")
     print(f"  Added rows: {added_rows}")
     print(f"  Updated rows: {updated_rows}")
+    print(f"  Unchanged rows: {unchanged_rows}")
     print(f"  Skipped rows: {skipped_rows}")
 
     local_cursor.close()
     prod_cursor.close()
 
-    return added_rows, updated_rows, skipped_rows
+    return added_rows, updated_rows, unchanged_rows, skipped_rows
+
 
+# Seconds a change must be committed before the incremental sync ships it. Change ids
+# come from a sequence, so a slow transaction can commit a lower id after a higher one.
+CDC_SETTLE_SECONDS = int(os.getenv("SYNC_CDC_SETTLE_SECONDS", "5"))
 
-# Tables to sync
-tables = ["venues", "shows"]
+CHANGE_LOG_SQL = """
+CREATE TABLE IF NOT EXISTS sync_changes (
+    id bigserial PRIMARY KEY,
+    table_name text NOT NULL,
+    op char(1) NOT NULL,          -- I, U or D
+    row_key jsonb NOT NULL,       -- key columns of the changed row
+    old_row jsonb,                -- row before an UPDATE or DELETE
+    changed_at timestamptz NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS sync_changes_table_id_idx ON sync_changes (table_name, id);
+
+CREATE OR REPLACE FUNCTION log_sync_change() RETURNS trigger AS $$
+DECLARE
+    row_data jsonb := to_jsonb(CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END);
+    key jsonb;
+BEGIN
+    SELECT jsonb_object_agg(k, row_data -> k) INTO key FROM unnest(TG_ARGV) AS k;
+    INSERT INTO sync_changes (table_name, op, row_key, old_row)
+    VALUES (TG_TABLE_NAME, left(TG_OP, 1), key,
+            CASE WHEN TG_OP = 'INSERT' THEN NULL ELSE to_jsonb(OLD) END);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+def ensure_change_log(local_conn):
+    """Create the local change-log table and trigger function (idempotent)."""
+    with local_conn.cursor() as cursor:
+        cursor.execute(CHANGE_LOG_SQL)
+    local_conn.commit()
+
+def ensure_change_trigger(local_conn, table_name, key_columns):
+    """Install the trigger that logs changes to `table_name` (idempotent)."""
+    with local_conn.cursor() as cursor:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table_name}_sync_changes ON {table_name}")
+        cursor.execute(f"""
+            CREATE TRIGGER {table_name}_sync_changes
+            AFTER INSERT OR UPDATE OR DELETE ON {table_name}
+            FOR EACH ROW EXECUTE FUNCTION log_sync_change({', '.join(key_columns)})
+        """)
+    local_conn.commit()
+
+def ensure_sync_state(prod_conn):
+    """Create the production table that holds each table's sync watermark."""
+    with prod_conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                table_name text PRIMARY KEY,
+                last_change_id bigint NOT NULL,
+                synced_at timestamptz NOT NULL DEFAULT now()
+            )
+        """)
+    prod_conn.commit()
+
+def get_watermark(prod_cursor, table_name):
+    prod_cursor.execute("SELECT last_change_id FROM sync_state WHERE table_name = %s", (table_name,))
+    row = prod_cursor.fetchone()
+    return row[0] if row else None
+
+def set_watermark(prod_cursor, table_name, change_id):
+    prod_cursor.execute("""
+        INSERT INTO sync_state (table_name, last_change_id) VALUES (%s, %s)
+        ON CONFLICT (table_name) DO UPDATE
+        SET last_change_id = EXCLUDED.last_change_id, synced_at = now()
+    """, (table_name, change_id))
+
+def fetch_changes(local_cursor, table_name, after_id, batch_size):
+    """Yield settled change-log entries for `table_name` after `after_id`, in batches."""
+    while True:
+        local_cursor.execute("""
+            SELECT id, op, row_key, old_row
+              FROM sync_changes
+             WHERE table_name = %s
+               AND id > %s
+               AND changed_at < now() - make_interval(secs => %s)
+             ORDER BY id
+             LIMIT %s
+        """, (table_name, after_id, CDC_SETTLE_SECONDS, batch_size))
+        changes = local_cursor.fetchall()
+        if not changes:
+            break
+        yield changes
+        after_id = changes[-1][0]
+        if len(changes) < batch_size:
+            break
+
+def conflict_key(row, conflict_columns):
+    """Conflict-column values of a row, in the form to_jsonb gives them (timestamps as ISO strings)."""
+    return tuple(
+        row.get(col).isoformat() if hasattr(row.get(col), "isoformat") else row.get(col)
+        for col in conflict_columns
+    )
+
+def sync_changes_batch(local_cursor, prod_cursor, table_name, key_columns, changes):
+    """
+    Apply one batch of change-log entries to production: upsert the current
+    local version of every row that still exists and delete the rest. Returns
+    (added, updated, unchanged, skipped, deleted).
+    """
+    conflict_columns, exclude_columns = table_settings(table_name)
+
+    # Collapse the batch to one action per row. Production holds the row as it
+    # was before the batch's first change, which is the first old_row seen.
+    final_op = {}
+    prod_row = {}
+    for _, op, row_key, old_row in changes:
+        key = tuple(row_key[col] for col in key_columns)
+        final_op[key] = op
+        if old_row is not None:
+            prod_row.setdefault(key, old_row)
+
+    upsert_keys = [dict(zip(key_columns, key)) for key, op in final_op.items() if op != "D"]
+    rows, columns = [], None
+    if upsert_keys:
+        local_cursor.execute(f"""
+            SELECT t.* FROM {table_name} t
+              JOIN jsonb_populate_recordset(NULL::{table_name}, %s) k USING ({', '.join(key_columns)})
+             ORDER BY {', '.join(f"t.{col}" for col in key_columns)}
+        """, (Json(upsert_keys),))
+        rows = local_cursor.fetchall()
+        columns = [desc[0] for desc in local_cursor.description]
+
+    # Rows deleted locally, plus old versions whose conflict key has since changed
+    current_keys = {
+        tuple(row[columns.index(col)] for col in key_columns): conflict_key(dict(zip(columns, row)), conflict_columns)
+        for row in rows
+    }
+    stale = []
+    for key, old_row in prod_row.items():
+        if final_op[key] == "D" or (key in current_keys and current_keys[key] != conflict_key(old_row, conflict_columns)):
+            stale.append(old_row)
+
+    # Stale rows are matched in production by conflict key, with ids remapped too
+    if stale:
+        stale_rows, _ = remap_ids(local_cursor, prod_cursor, table_name, conflict_columns,
+                                        [tuple(row.get(col) for col in conflict_columns) for row in stale])
+        stale = [dict(zip(conflict_columns, row)) for row in stale_rows]
+
+    deleted = 0
+    if stale:
+        column_list = ', '.join(conflict_columns)
+        soft_delete_column = SYNC_CONFIG["tables"][table_name]["soft_delete_column"]
+        if soft_delete_column:
+            statement = f"UPDATE {table_name} SET {soft_delete_column} = TRUE"
+        else:
+            statement = f"DELETE FROM {table_name}"
+        # A delete production refuses (e.g. a row other tables still reference)
+        # is logged and left, so the watermark keeps moving
+        prod_cursor.execute("SAVEPOINT sync_delete")
+        try:
+            prod_cursor.execute(f"""
+                {statement}
+                 WHERE ({column_list}) IN (
+                    SELECT {column_list} FROM jsonb_populate_recordset(NULL::{table_name}, %s)
+                 )
+            """, (Json(stale),))
+            deleted = prod_cursor.rowcount
+            prod_cursor.execute("RELEASE SAVEPOINT sync_delete")
+        except psycopg2.Error as e:
+            prod_cursor.execute("ROLLBACK TO SAVEPOINT sync_delete")
+            print(f"[{table_name}] Could not delete {len(stale)} rows from production ({e.pgerror or e}); "
+                  f"left in place: {[tuple(row[col] for col in conflict_columns) for row in stale]}")
+
+    added = updated = unchanged = skipped = 0
+    if rows:
+        rows, skipped_rows = remap_ids(local_cursor, prod_cursor, table_name, columns, rows)
+        if rows:
+            added, updated, unchanged, skipped = sync_batch(
+                prod_cursor, table_name, columns, conflict_columns, exclude_columns, rows)
+        skipped += skipped_rows
+    return added, updated, unchanged, skipped, deleted
+
+def sync_table_incremental(local_conn, prod_conn, table_name, batch_size=BATCH_SIZE, key_columns=("id",)):
+    """
+    Ship only the rows changed locally since the last successful run. The
+    watermark is stored in production and moves in the same transaction as
+    the rows it covers, so an interrupted run simply resumes.
+    """
+    print(f"Syncing table incrementally: {table_name}")
+    ensure_change_trigger(local_conn, table_name, key_columns)
+    local_cursor = local_conn.cursor()
+    prod_cursor = prod_conn.cursor()
+
+    watermark = get_watermark(prod_cursor, table_name)
+    prod_conn.rollback()
+    if watermark is None:
+        # First incremental run: everything logged from here on gets replayed,
+        # so a full sync now brings production up to the starting watermark.
+        local_cursor.execute("SELECT COALESCE(max(id), 0) FROM sync_changes")
+        start_id = local_cursor.fetchone()[0]
+        local_conn.commit()
+        print(f"No watermark for {table_name}; running a full sync first.")
+        sync_table(local_conn, prod_conn, table_name, batch_size)
+        set_watermark(prod_cursor, table_name, start_id)
+        prod_conn.commit()
+        watermark = start_id
+
+    totals = {"added": 0, "updated": 0, "unchanged": 0, "skipped": 0, "deleted": 0}
+    for changes in fetch_changes(local_cursor, table_name, watermark, batch_size):
+        last_change_id = changes[-1][0]
+        try:
+            counts = sync_changes_batch(local_cursor, prod_cursor, table_name, key_columns, changes)
+            set_watermark(prod_cursor, table_name, last_change_id)
+            prod_conn.commit()
+        except psycopg2.Error as e:
+            prod_conn.rollback()
+            print(f"Error syncing changes up to {last_change_id} for {table_name}: {e}")
+            break
+        for name, count in zip(totals, counts):
+            totals[name] += count
+        print(f"[{table_name}] Applied {len(changes)} changes up to change {last_change_id}.")
+
+        # Production has everything up to the watermark, so the local log can be trimmed
+        local_cursor.execute("DELETE FROM sync_changes WHERE table_name = %s AND id <= %s",
+                             (table_name, last_change_id))
+        local_conn.commit()
+
+    print(f"Summary for {table_name}:")
+    print(f"  Added rows: {totals['added']}")
+    print(f"  Updated rows: {totals['updated']}")
+    print(f"  Unchanged rows: {totals['unchanged']}")
+    print(f"  Skipped rows: {totals['skipped']}")
+    print(f"  Deleted rows: {totals['deleted']}")
+
+    local_cursor.close()
+    prod_cursor.close()
+
+    return totals["added"], totals["updated"], totals["unchanged"], totals["skipped"]
+
+
+def sync_one_table(table_name, mode, batch_size):
+    """Sync one table on its own local and production connections."""
+    local_conn = connect_local()
+    prod_conn = connect_prod()
+    try:
+        if mode == "incremental":
+            key_columns = SYNC_CONFIG["tables"][table_name]["key_columns"]
+            return sync_table_incremental(local_conn, prod_conn, table_name, batch_size, key_columns)
+        return sync_table(local_conn, prod_conn, table_name, batch_size)
+    finally:
+        local_conn.close()
+        prod_conn.close()
+
+parser = argparse.ArgumentParser(description="Sync local tables to production.")
+parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                    help="rows fetched from the local database per batch")
+parser.add_argument("--mode", choices=["full", "incremental"], default="full",
+                    help="full re-sends every row; incremental ships only rows changed since the last run")
+parser.add_argument("--workers", type=int, default=SYNC_WORKERS,
+                    help="tables synced at the same time")
+parser.add_argument("--tables", nargs="+", metavar="TABLE",
+                    help="sync only these tables (default: every table in the config)")
+parser.add_argument("--config", default=CONFIG_PATH,
+                    help="table sync configuration file")
+args = parser.parse_args()
+
+SYNC_CONFIG = load_sync_config(args.config)
+
+tables = args.tables or list(SYNC_CONFIG["tables"])
+unknown = [table for table in tables if table not in SYNC_CONFIG["tables"]]
+if unknown:
+    parser.error(f"unknown table(s): {', '.join(unknown)}")
+
+if args.mode == "incremental":
+    conn = connect_local()
+    ensure_change_log(conn)
+    conn.close()
+    conn = connect_prod()
+    ensure_sync_state(conn)
+    conn.close()
+
+# Parents before children; tables in the same level sync concurrently
+levels = dependency_levels(tables, table_dependencies(SYNC_CONFIG))
 
 # Overall summary
 overall_summary = {}
 
-# Sync each table and collect the summary
-for table in tables:
-    added, updated, skipped = sync_table(table)
-    overall_summary[table] = {
-        "added": added,
-        "updated": updated,
-        "skipped": skipped,
-    }
+with ThreadPoolExecutor(max_workers=args.workers) as executor:
+    for level in levels:
+        print(f"Syncing {', '.join(level)}...")
+        futures = {table: executor.submit(sync_one_table, table, args.mode, args.batch_size) for table in level}
+        for table, future in futures.items():
+            added, updated, unchanged, skipped = future.result()
+            overall_summary[table] = {
+                "added": added,
+                "updated": updated,
+                "unchanged": unchanged,
+                "skipped": skipped,
+            }
 
 # Print overall summary
 print("\n=== Sync Summary ===")
@@ -122,4 +612,5 @@ for table, summary in overall_summary.items():
     print(f"Table: {table}")
     print(f"  Added: {summary['added']}")
     print(f"  Updated: {summary['updated']}")
-    print(f"  Skipped: {summary['skipped']}")
\ No newline at end of file
+    print(f"  Unchanged: {summary['unchanged']}")
+    print(f"  Skipped: {summary['skipped']}")